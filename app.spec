@@ -6,7 +6,14 @@ a = Analysis(['bin/app'],
              pathex=['.'],
              binaries=None,
              datas=[],
-             hiddenimports=['PySide2.QtXml'],
+             # The views are imported on first use (see VIEWS in
+             # app/__main__.py)
+             hiddenimports=['PySide2.QtXml',
+                            'app.package.views.MainWindow',
+                            'app.package.views.NewProjectView',
+                            'app.package.views.DataAcquisitionView',
+                            'app.package.views.DisplayResultsView',
+                            'app.package.views.Calibrate_view'],
              hookspath=None,
              runtime_hooks=None,
              excludes=None,
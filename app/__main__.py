@@ -1,35 +1,49 @@
 # This Python file uses the following encoding: utf-8
-from app.package.views.Calibrate_view import CalibrateView
-from app.package.controllers.Calibrate_controller import CalibrateController
-from app.package.models.Calibrate_model import CalibrateModel
 import sys
-import matplotlib
+import importlib
+import multiprocessing
 
 from PySide2.QtWidgets import QApplication
 from PySide2 import QtCore
 
-from .package.models.NewProjectModel import NewProjectModel
-from .package.models.DataAcquisitionModel import DataAcquisitionModel
-from .package.models.DisplayResultsModel import DisplayResultsModel
-
 from .package.controllers.Navigator import Navigator
-from .package.controllers.NewProjectController import NewProjectController
-from .package.controllers.DataAcquisitionController import (
-    DataAcquisitionController)
-from .package.controllers.DisplayResultsController import (
-    DisplayResultsController)
 
-from .package.views.MainWindow import MainWindow
-from .package.views.NewProjectView import NewProjectView
-from .package.views.DataAcquisitionView import DataAcquisitionView
-from .package.views.DisplayResultsView import DisplayResultsView
+# Diccionario que mapea nombres con Vistas: name => (view, model,
+# controller) classes, as 'module:Class' paths relative to app.package.
+# They are imported when the view is opened for the first time, so the
+# heavy dependencies of a view (OpenCV, Matplotlib, SciPy...) are not
+# loaded before the first window appears. A model None => the view only
+# takes the navigator.
+VIEWS = {
+    'main_view': ('views.MainWindow:MainWindow', None, None),
+    'new_project': (
+        'views.NewProjectView:NewProjectView',
+        'models.NewProjectModel:NewProjectModel',
+        'controllers.NewProjectController:NewProjectController'),
+    'data_acquisition': (
+        'views.DataAcquisitionView:DataAcquisitionView',
+        'models.DataAcquisitionModel:DataAcquisitionModel',
+        'controllers.DataAcquisitionController:DataAcquisitionController'),
+    'display_results': (
+        'views.DisplayResultsView:DisplayResultsView',
+        'models.DisplayResultsModel:DisplayResultsModel',
+        'controllers.DisplayResultsController:DisplayResultsController'),
+    'calibrate': (
+        'views.Calibrate_view:CalibrateView',
+        'models.Calibrate_model:CalibrateModel',
+        'controllers.Calibrate_controller:CalibrateController'),
+}
+
+
+def load_class(path: str):
+    """Imports a 'module:Class' path relative to app.package."""
+    module, name = path.split(':')
+    return getattr(importlib.import_module(f'.package.{module}', __package__),
+                   name)
 
 
 class App(QApplication):
 
-    # Diccionario que mapea nombres con Vistas
-    views = {}
-
     @staticmethod
     def log(msg: str) -> None:
         print(f'[App] {msg}')
@@ -40,51 +54,47 @@ class App(QApplication):
         self.navigator = Navigator()
         self.navigator.navigator.connect(self.change_view)
 
-        # MODELS
-        self.new_project_model = NewProjectModel()
-        self.data_acquisition_model = DataAcquisitionModel()
-        self.display_results_model = DisplayResultsModel()
-        self.calibrate_model = CalibrateModel()
-
-        # CONTROLLERS
-        self.new_project_controller = NewProjectController(
-            self.new_project_model, self.navigator)
-        self.data_acquisition_controller = DataAcquisitionController(
-            self.data_acquisition_model, self.navigator)
-        self.display_results_controller = DisplayResultsController(
-            self.display_results_model, self.navigator)
-        self.calibrate_controller = CalibrateController(
-            self.calibrate_model, self.navigator)
-
-        # VIEWS
-        self.main_view = MainWindow(None, self.navigator)
-        self.new_project_view = NewProjectView(
-            self.new_project_model, self.new_project_controller)
-        self.data_acquisition_view = DataAcquisitionView(
-            self.data_acquisition_model, self.data_acquisition_controller)
-        self.display_results_view = DisplayResultsView(
-            self.display_results_model, self.display_results_controller)
-        self.calibrate_view = CalibrateView(
-            self.calibrate_model, self.calibrate_controller)
-
-        self.views['main_view'] = self.main_view
-        self.views['new_project'] = self.new_project_view
-        self.views['data_acquisition'] = self.data_acquisition_view
-        self.views['display_results'] = self.display_results_view
-        self.views['calibrate'] = self.calibrate_view
+        # Views (and their models and controllers) built so far. See
+        # VIEWS and get_view
+        self.views = {}
+        self.models = {}
+        self.controllers = {}
 
         self.change_view('new_project')
 
-    @QtCore.Slot(str)
-    def change_view(self, name_view, closeOthers=True):
-        self.log(f'Navigating to {name_view}')
+    def get_view(self, name_view: str):
+        """View registered as name_view, built on first use."""
         _view = self.views.get(name_view)
+        if _view is not None:
+            return _view
 
-        if _view is None:
+        if name_view not in VIEWS:
             raise Exception(f'{name_view} is not part of Views dictionary.')
 
+        view, model, controller = VIEWS[name_view]
+        self.log(f'Loading {name_view}...')
+
+        if model is None:
+            _view = load_class(view)(None, self.navigator)
+        else:
+            _model = load_class(model)()
+            _controller = load_class(controller)(_model, self.navigator)
+            _view = load_class(view)(_model, _controller)
+
+            self.models[name_view] = _model
+            self.controllers[name_view] = _controller
+
+        self.views[name_view] = _view
+        return _view
+
+    @QtCore.Slot(str)
+    def change_view(self, name_view, closeOthers=True):
+        self.log(f'Navigating to {name_view}')
+        _view = self.get_view(name_view)
+
         if closeOthers:
             self.log('closing other views...')
+            # Only the views built so far can be open
             for view in self.views:
                 if view != name_view:
                     self.views.get(view).close()
@@ -105,13 +115,14 @@ sys.excepthook = exception_hook
 
 
 def main():
+    # DspThread analyzes the grid in 'spawn' worker processes, which also
+    # have to work in the frozen (PyInstaller) app
+    multiprocessing.freeze_support()
     QtCore.QCoreApplication.setAttribute(QtCore.Qt.AA_ShareOpenGLContexts)
     app = App([])
     sys.exit(app.exec_())
 
 
-matplotlib.use('tkagg')
-
 if __name__ == "__main__":
     main()
 
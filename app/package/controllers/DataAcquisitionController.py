@@ -1,5 +1,7 @@
 from PySide2.QtCore import QObject, Slot
 from app.package.models.DataAcquisitionModel import DataAcquisitionModel
+from app.package.models.ActualProjectModel import ActualProjectModel
+from app.package.services.live import LiveSpectrum, calibration_gain
 
 
 def log(msg: str) -> None:
@@ -44,12 +46,27 @@ class DataAcquisitionController(QObject):
             self._model.micWorker.stop_rec()
             self._model.camThread.stop_rec()
         else:
+            self.start_live_analysis()
             self._model.micWorker.rec()
             self._model.camThread.rec()
 
         self._model.mic_recording = not rec
         self._model.cam_recording = not rec
 
+    def start_live_analysis(self):
+        """Shares a LiveSpectrum between the mic worker (audio) and the
+        camera thread (position), for the live level map."""
+        mic = self._model.micWorker
+        live = LiveSpectrum(mic.fs,
+                            [ActualProjectModel.low_freq,
+                             ActualProjectModel.high_freq],
+                            self._model.rows, self._model.cols,
+                            calibration_gain(mic.channels))
+
+        self._model.live = live
+        mic.live = live
+        self._model.camThread.live = live
+
     def change_rows(self, value):
         self._model.rows = value
         self._model.camThread.setRows(value)
@@ -42,6 +42,7 @@ class DisplayResultsController(QObject):
     def set_data(self, value):
         self._model.data_x = value[0]
         self._model.data_y = value[1]
+        self._model.data_t = value[2] if len(value) > 2 else np.array([])
 
     @Slot(list)
     def set_freq_range(self, value):
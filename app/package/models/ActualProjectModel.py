@@ -22,6 +22,7 @@ class ActualProjectModel(object):
 
     data_x = np.array([])
     data_y = np.array([])
+    data_t = np.array([])
     grid = []
 
     def __init__(self):
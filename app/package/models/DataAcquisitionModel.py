@@ -4,6 +4,7 @@ from PySide2.QtCore import QObject, QThread, Signal
 
 from app.package.services.MicWorker import MicWorker
 from app.package.services.CameraThread import CameraThread
+from app.package.services.live import LiveSpectrum
 
 
 class DataAcquisitionModel(QObject):
@@ -30,6 +31,7 @@ class DataAcquisitionModel(QObject):
         self.micWorker: MicWorker = None
         self.micThread: QThread = None
         self.camThread: CameraThread = None
+        self.live: LiveSpectrum = None
         self._bg_img: np.ndarray = None
 
     def get_grid_as_list(self):
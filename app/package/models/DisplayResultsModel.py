@@ -3,6 +3,7 @@ import numpy as np
 from PySide2.QtCore import QObject, Signal
 # from ..services.DspThread import DspThread
 from ..services.grid import Grid
+from ..services.cube import spectrum_cube, band_limits
 
 
 class DisplayResultsModel(QObject):
@@ -29,17 +30,32 @@ class DisplayResultsModel(QObject):
     def clear_state(self):
         self._data_x = np.array([])
         self._data_y = np.array([])
+        # Capture time of every frame and (first sample, time) of every
+        # audio block. Empty / None for projects without timestamps
+        self.data_t = np.array([])
+        self.audio_times = None
+        self.frame_starts = None
         self._grid: Grid = None
         self._audio_data = []
         self._audio_fs = -1
         self._fps = -1
         self._image = np.array([])
         self.dsp_thread = None
-        self._spectrum = []
+        self.frame_energy = None
         self._freq = []
         self._row = -1
         self._col = -1
-        self._full_band_spec = []
+        # Results: float32 (rows x cols x bands) cube and (rows x cols) map,
+        # NaN for the cells without audio (see services.cube)
+        self._spectrum = np.empty((0, 0, 0), dtype=np.float32)
+        self._full_band_spec = np.empty((0, 0), dtype=np.float32)
+        # Cells with audio
+        self.valid = np.empty((0, 0), dtype=bool)
+        # Lowest and highest level of every band, and of the full band
+        self.band_min = np.empty(0, dtype=np.float32)
+        self.band_max = np.empty(0, dtype=np.float32)
+        self.full_band_min = np.nan
+        self.full_band_max = np.nan
         self.min_db = 40
         self.max_db = 90
 
@@ -171,9 +187,11 @@ class DisplayResultsModel(QObject):
 
     @spectrum.setter
     def spectrum(self, value):
-        self._spectrum = value
+        self._spectrum = spectrum_cube(value, len(self._freq))
+        self.valid = np.isfinite(self._spectrum).any(axis=2)
+        self.band_min, self.band_max = band_limits(self._spectrum)
         self.check_max_min()
-        self.on_spectrum_changed.emit(value)
+        self.on_spectrum_changed.emit(self._spectrum)
 
     # --- --- --- --- --- --- --- --- --- ---
 
@@ -183,27 +201,32 @@ class DisplayResultsModel(QObject):
 
     @full_band_spec.setter
     def full_band_spec(self, value):
-        self._full_band_spec = value
+        self._full_band_spec = np.asarray(value, dtype=np.float32)
+        self.full_band_min, self.full_band_max = band_limits(
+            self._full_band_spec)
         self.check_max_min()
-        self.on_full_band_spec_changed.emit(value)
+        self.on_full_band_spec_changed.emit(self._full_band_spec)
 
     # --- --- --- --- --- --- --- --- --- ---
 
-    def check_max_min(self):
+    def band(self, index: int) -> np.ndarray:
+        """Levels of every cell in a band, (rows x cols): 0 => full band,
+        i => band i-1 of the spectrum. A view, not a copy."""
+        if index == 0:
+            return self._full_band_spec
+        return self._spectrum[:, :, index-1]
+
+    # --- --- --- --- --- --- --- --- --- ---
 
-        if len(self._full_band_spec) > 0:
-            self.min_db = np.min([self.min_db,
-                                 np.array(self._full_band_spec).min()])
-            self.max_db = np.max([self.max_db,
-                                 np.array(self._full_band_spec).max()])
+    def check_max_min(self):
+        """Widens [min_db, max_db] to the levels of the results."""
 
-        if len(self._spectrum) > 0:
-            self.min_db = np.min([self.min_db,
-                                 np.array(self._spectrum).min()])
-            self.max_db = np.max([self.max_db,
-                                 np.array(self._spectrum).max()])
+        # The bands without levels are NaN: fmin / fmax ignore them
+        levels = np.concatenate([[self.min_db, self.max_db,
+                                  self.full_band_min, self.full_band_max],
+                                 self.band_min, self.band_max])
 
-        self.min_db = int(np.floor(self.min_db))
-        self.max_db = int(np.ceil(self.max_db))
+        self.min_db = int(np.floor(np.fmin.reduce(levels)))
+        self.max_db = int(np.ceil(np.fmax.reduce(levels)))
 
     # endregion
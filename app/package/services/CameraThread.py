@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 
+import queue
+import threading
+
 import cv2
 import numpy as np
-from time import time
+from time import perf_counter
 
 from PySide2.QtCore import QThread, Signal
 
@@ -10,12 +13,21 @@ from ..models.ActualProjectModel import ActualProjectModel
 
 from .grid import Grid
 from . import imbasic as imb
-from .mask import get_mask, get_circles
+from .mask import MarkerTracker
+from .overlay import CoverageOverlay
 
 
 class CameraThread(QThread):
     """Thread that provides the functionality to capture image from the Camera.
 
+    It is a pipeline of two stages, so the processing does not slow down
+    the capture. A capture thread grabs and timestamps the frames into a
+    small bounded buffer, and this thread processes them. While recording,
+    every frame is tracked (no position sample is lost: the capture waits
+    if the buffer is full), but the preview of a frame is only drawn and
+    sent to the UI if no newer frame is waiting. While not recording,
+    the frames that do not fit in the buffer are dropped.
+
     Attributes:
         update_frame (QtCore.Signal): send a new frame to the UI
         on_stop_recording (QtCore.Signal): Event triggered when the main
@@ -28,6 +40,11 @@ class CameraThread(QThread):
             functions.
         close_size (Literal[int]): configuration for the color segmenting
             functions.
+        min_dist (Literal[int]): configuration for the circle detection.
+        detector (Literal[str]): detector of the microphone marker, 'hough'
+            or 'blobs' (see mask.MarkerTracker).
+        buffer_size (Literal[int]): frames between the capture and the
+            processing.
     """
 
     update_frame = Signal(np.ndarray)
@@ -38,6 +55,11 @@ class CameraThread(QThread):
     # Mic location estimation
     open_size = 1
     close_size = 25
+    min_dist = 350
+    detector = 'hough'
+
+    # Pipeline
+    buffer_size = 8
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -48,6 +70,8 @@ class CameraThread(QThread):
         """
         self.x_data = []
         self.y_data = []
+        # Capture time of every recorded frame (time.perf_counter)
+        self.t_data = []
         self.x = -1
         self.y = -1
         self.min_time_rec = -1
@@ -55,9 +79,17 @@ class CameraThread(QThread):
         self.cols = -1
         self.padding = -1
         self.last_frame = None
+        self.live = None
+        self.last_capture_time = None
+        self.circles = None
+        self.grid_pos = None
+        self.overlay = None
+        self.tracker = MarkerTracker(self.open_size, self.close_size,
+                                     dp=3, minDist=self.min_dist,
+                                     detector=self.detector)
 
     def run(self):
-        """Thread's main loop of execution.
+        """Thread's main loop of execution: the processing stage.
         """
 
         print('[CAM] Running!')
@@ -67,46 +99,110 @@ class CameraThread(QThread):
         cap = self.setup_camera()
 
         self.times = None
+        self.frames = queue.Queue(self.buffer_size)
+        self.capture_stalls = 0
+        self.dropped_previews = 0
 
-        t1 = time()
-        rec_frames = 0
+        capture = threading.Thread(target=self.capture, args=(cap,),
+                                   daemon=True)
+        capture.start()
 
-        while self._running:
-            ret, frame = cap.read()
-            processed_frame = None
+        rec_frames = 0
+        skipped_previews = 0
+        tracking_time = 0
 
-            if not ret:
+        while True:
+            item = self.frames.get()
+            if item is None:
+                # The capture has finished
                 break
 
-            if self._rec:
+            frame, capture_time, rec = item
+            # A newer frame is waiting => do not draw this one
+            preview = self.frames.empty()
+
+            if rec:
                 if self.times is None:
                     # This code will only execute once!
                     # At the start of the recording process
-                    t1 = time()
                     self.times = np.zeros((self.rows, self.cols))
 
-                processed_frame = self.process_frame(frame)
+                t = perf_counter()
+                self.track(frame, capture_time)
+                tracking_time += perf_counter() - t
                 rec_frames += 1
 
+                if not preview:
+                    skipped_previews += 1
+                    continue
+                processed_frame = self.process_frame(frame)
+
             else:
                 self._grid.config(self.rows, self.cols, pad=self.padding)
+                if not preview:
+                    skipped_previews += 1
+                    continue
                 processed_frame = self.bypass(frame)
-                self.time = time()
 
             self.update_frame.emit(processed_frame)
 
-        if rec_frames != 0:
-            fps = 1/((time()-t1)/rec_frames)
+        capture.join()
+
+        if rec_frames > 1:
+            # Frame rate of the camera, from the capture timestamps
+            fps = (rec_frames - 1) / (self.t_data[-1] - self.t_data[0])
             cam_setup = (self.frame_size[0], self.frame_size[1], fps)
             self.on_camera_caracteristics_detected.emit(cam_setup)
 
+            print(f' -> Capture: {round(fps, 2)} fps')
+            print(f' -> Tracking: {round(rec_frames/tracking_time, 2)} fps')
+            print(f' -> Previews skipped: {skipped_previews}, ' +
+                  f'dropped: {self.dropped_previews}')
+            print(f' -> Capture stalls (buffer full): {self.capture_stalls}')
+
         if self.x_data is not None:
-            location_data = {"x_data": self.x_data, "y_data": self.y_data}
+            location_data = {"x_data": self.x_data, "y_data": self.y_data,
+                             "t_data": self.t_data}
 
         self.on_stop_recording.emit(location_data)
-        cv2.destroyAllWindows()
         cap.release()
 
+    def capture(self, cap):
+        """Capture stage: grabs the frames into the buffer.
+
+        Every frame is queued with its capture time and whether it is
+        recorded. None marks the end of the capture.
+
+        Args:
+            cap (VideoCapture): the camera.
+        """
+
+        while self._running:
+            # Timestamp as close to the capture as possible: before
+            # decoding the frame
+            ret = cap.grab()
+            capture_time = perf_counter()
+            if ret:
+                ret, frame = cap.retrieve()
+
+            if not ret:
+                break
+
+            rec = self._rec
+            if rec:
+                # Position samples are never dropped: wait for the
+                # processing
+                if self.frames.full():
+                    self.capture_stalls += 1
+                self.frames.put((frame, capture_time, rec))
+            else:
+                try:
+                    self.frames.put_nowait((frame, capture_time, rec))
+                except queue.Full:
+                    self.dropped_previews += 1
+
+        self.frames.put(None)
+
     def setup_camera(self):
         """Settin up the camera
 
@@ -132,32 +228,73 @@ class CameraThread(QThread):
 
         return cap
 
-    def process_circles(self, frame, circles):
-        """Appends data to the arrays and draws circles in the frame
+    def track(self, frame: np.ndarray, capture_time: float) -> None:
+        """Locates the microphone in a recorded frame, and appends its
+        position to the data.
+
+        It also updates the time recorded in its region, and the region of
+        the live analysis.
 
         Args:
             frame (np.ndarray): the image
-            circles (np.ndarray): Circles in array format, as they come
-                from Hough Circles.
+            capture_time (float): time.perf_counter of the capture.
         """
 
-        if circles is None:
+        self.circles = self.tracker.locate(frame)
+
+        if self.circles is None:
             self.x_data.append(np.nan)
             self.y_data.append(np.nan)
         else:
-            circles = np.round(circles[0, :]).astype("int")
-
-            x, y, r = circles[0]
+            x, y, _ = np.round(self.circles[0, 0]).astype("int")
             self.x_data.append(x)
             self.y_data.append(y)
             self.x = x
             self.y = y
+        self.t_data.append(capture_time)
+
+        # Time between captures, not between processed frames
+        delta = 0
+        if self.last_capture_time is not None:
+            delta = capture_time - self.last_capture_time
+        self.last_capture_time = capture_time
+
+        # Same vectorized lookup as the offline analysis
+        # (DspThread.cell_of_frames), for the last known position
+        self.grid_pos = None
+        if self.x != -1 and self.y != -1:
+            rows, cols = self._grid.locate_points([self.x], [self.y])
+            if rows[0] != Grid.OUTSIDE:
+                self.grid_pos = (rows[0], cols[0])
+                self.times[self.grid_pos] += delta
+
+        if self.live is not None:
+            # The audio from the capture on belongs to this cell, however
+            # late the frame is processed
+            if self.grid_pos is None:
+                self.live.set_cell(None, None, capture_time)
+            else:
+                self.live.set_cell(*self.grid_pos, capture_time)
+
+    def process_circles(self, frame, circles):
+        """Draws circles in the frame
+
+        Args:
+            frame (np.ndarray): the image
+            circles (np.ndarray): Circles in array format, as they come
+                from Hough Circles.
+        """
+
+        if circles is not None:
+            circles = np.round(circles[0, :]).astype("int")
+
+            x, y, r = circles[0]
             frame = cv2.circle(frame, (x, y), r, (0, 255, 0), 4)
             frame = cv2.rectangle(
                 frame, (x - 5, y - 5), (x + 5, y + 5), (0, 128, 255), -1)
 
     def process_frame(self, frame: np.ndarray) -> np.ndarray:
-        """Process each frame
+        """Draws the preview of the last tracked frame
 
         Args:
             frame (np.ndarray): the image
@@ -166,24 +303,19 @@ class CameraThread(QThread):
             np.ndarray: the image with all the necessary changes.
         """
 
-        self.process_circles(frame, get_circles(get_mask(frame,
-                                                         self.open_size,
-                                                         self.close_size),
-                                                dp=3,
-                                                minDist=350))
+        self.process_circles(frame, self.circles)
 
         self.draw_rec_indicator(frame)
 
         color_frame = self.draw_color_display(frame, self.times, self._grid)
 
-        delta = time() - self.time
-        self.time = time()
+        if self.grid_pos is not None:
+            imb.draw_text(frame, f'{self.grid_pos[0], self.grid_pos[1]}',
+                          15, 15)
 
-        if self.x != -1 and self.y != -1:
-            grid = self._grid.locate_point((self.x, self.y))
-            if grid is not None:
-                self.times[grid[0]][grid[1]] += delta
-                imb.draw_text(frame, f'{grid[0], grid[1]}', 15, 15)
+        if self.live is not None:
+            self.draw_live_levels(color_frame, self.live.full_band(),
+                                  self._grid)
 
         return color_frame
 
@@ -204,7 +336,8 @@ class CameraThread(QThread):
         """Function to draw the color overlay to the image.
 
         It is usefull to know how much time left of recording we have, per
-        region.
+        region. The overlay (see overlay.CoverageOverlay) is only redrawn in
+        the regions whose coverage changed, and blended in one go.
 
         Args:
             frame (np.ndarray): the image.
@@ -222,42 +355,35 @@ class CameraThread(QThread):
         if (alpha == 1).all():
             self.on_handle_all_regions_rec.emit()
 
-        for irow, row in enumerate(alpha):
-            for icol, a in enumerate(row):
-                pt1, pt2 = grid.get_region([irow, icol])
-                self.draw_rectangle(frame, a, pt1, pt2)
-
-        return frame
+        if self.overlay is None or self.overlay.grid is not grid:
+            self.overlay = CoverageOverlay(grid)
+        self.overlay.update(alpha)
 
-    def draw_rectangle(self, frame: np.ndarray,
-                       t: float, pt1: list, pt2: list
-                       ) -> np.ndarray:
-        """Function to draw the color rectangle on top of a region of the img.
+        return self.overlay.apply(frame)
 
-        The rectangle will be one shade of red if if doesnt have half of the
-        recording time, or blue if it has more than 50%.
+    def draw_live_levels(self,
+                         frame: np.ndarray,
+                         levels: np.ndarray,
+                         grid: Grid
+                         ) -> np.ndarray:
+        """Function to draw the live level of every region on the image.
 
         Args:
-            frame (np.ndarray): the image
-            t (np.ndarary): the time matrix, same size as the grid (rows, cols)
-            pt1 (list): upper-left corner
-            pt2 (list): lower-right corner
+            frame (np.ndarray): the image.
+            levels (np.ndarray): the full band level of every region, in
+                dB. NaN for the regions without audio yet.
+                Size: [rows, cols]
+            grid (Grid): the Grid object needed to know where the grid region
+                starts.
 
         Returns:
-            np-ndarray: the image with the overlay drown on-top.
+            np.ndarray: the image, with the levels.
         """
 
-        if t < 0.5:
-            # Degradado rojo -> transparente
-            alpha = 0.5 - t
-            imb.draw_filled_rectangle(
-                frame, pt1, pt2, (0, 0, 255), alpha)
-
-        else:
-            # Degradado transparente -> verde
-            alpha = t - 0.5
-            imb.draw_filled_rectangle(
-                frame, pt1, pt2, (255, 0, 0), alpha)
+        for irow, icol in zip(*np.nonzero(np.isfinite(levels))):
+            pt1, pt2 = grid.get_region([irow, icol])
+            imb.draw_text(frame, f'{levels[irow, icol]:.1f} dB',
+                          pt1[0] + 5, pt2[1] - 8)
 
         return frame
 
@@ -1,5 +1,8 @@
 import os
+import multiprocessing
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
 
 from PySide2.QtCore import QObject, Signal
 
@@ -8,49 +11,121 @@ from ..models.ActualProjectModel import ActualProjectModel
 
 from ..services import file as fileutils
 from ..services.path import interpolate_coords
+from ..services.grid import Grid
 from ..services import dsp
+from ..services import results_cache
 
 
 class DspThread(QObject):
+    """Worker that runs the whole DSP analysis of a project.
+
+    The recording is analyzed block by block into the band energies of
+    every video frame (see analyze_streaming), and the levels of every
+    cell are derived from them, so a new grid only has to re-bin them (see
+    regrid).
+
+    Args:
+        workers (int, optional): Maximum number of processes used by the
+            cell by cell analysis (see analyze). The pool is never larger
+            than the number of cells with audio. 1 analyzes them one after
+            the other in this thread. Defaults to None => one per CPU.
+        cache (bool, optional): Load the results and the band energies of
+            the frames from the project's results cache when none of the
+            inputs changed (see results_cache). They are saved there after
+            every analysis anyway. Defaults to True.
+
+    Attributes:
+        block_size (int): Samples read at once (see frame_energies).
+    """
     update_status = Signal(int)
     finished = Signal()
 
+    block_size = 2**16
+
+    def __init__(self, workers: int = None, cache: bool = True):
+        super().__init__()
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache
+
     @staticmethod
     def log(msg: str) -> None:
         print(f'[DSP Thread] {msg}')
 
     def process(self, model: DisplayResultsModel):
         self.log('Running!')
+        model.frame_energy = None
+        model.frame_starts = None
+
+        # The keys depend on the inputs as they were loaded. Once for both
+        audio = results_cache.audio_id(model.audio_data,
+                                       ActualProjectModel.project_location)
+        key = results_cache.results_key(
+            model, ActualProjectModel.calibration, audio)
+        frames_key = results_cache.frames_key(
+            model, ActualProjectModel.calibration, audio)
 
         self.calibrate_audio(model)
 
         # Shift and trim are in audio samples
         model.audio_data = self.trim_audio(model)
         shift, trim = self.clean_data_position(model)
-        model.audio_data = model.audio_data[shift:-trim]
+        model.audio_data = model.audio_data[
+            shift:len(model.audio_data)-trim]
 
         self.log(f'Trimming the first {round(shift/model.audio_fs,2)}s')
         self.log(f'Trimming the last {round(trim/model.audio_fs,2)}s')
 
-        spatial_segmentation = self.segment_video(model)
-        audio_segments = self.segment_audio(model, spatial_segmentation)
+        location = ActualProjectModel.project_location
+        cached = None
+        if self.cache:
+            cached = results_cache.load_results(location, key)
+            model.frame_energy = results_cache.load_frames(location,
+                                                           frames_key)
+
+        # Frame stage: every analysis leaves the band energies of the
+        # frames in the project, and the model maps them from there
+        if model.frame_energy is None:
+            frames = self.frame_energies(model)
+            results_cache.save_frames(location, frames_key, frames)
+            model.frame_energy = results_cache.load_frames(location,
+                                                           frames_key)
+            if model.frame_energy is None:
+                model.frame_energy = frames
+
+        if cached is not None:
+            self.log(f'Loading results from cache: {key}')
+            model.freq, model.spectrum, model.full_band_spec = cached
+            self.update_status.emit(
+                model.grid.number_of_rows * model.grid.number_of_cols - 1)
+        else:
+            model.freq, model.spectrum, model.full_band_spec = \
+                self.analyze_streaming(model)
+            results_cache.save_results(location, key, model.freq,
+                                       model.spectrum, model.full_band_spec)
 
-        model.freq, model.spectrum = self.analyze(model, audio_segments)
-        model.full_band_spec = self.get_full_band(model, audio_segments)
         self.log(f'Full band Spectrum: {model.full_band_spec}')
 
         self.finished.emit()
 
     def calibrate_audio(self, model):
+        """Mixes the audio down to mono and applies the calibration.
+
+        model.audio_data is a WavAudio: both operations only change how the
+        samples will be read, nothing is loaded here.
+        """
         audio = model.audio_data
 
         # Check number of channels
         channels = audio.shape[1]
         if channels == 2:
             # Convert to mono
-            audio = np.sum(audio, axis=1) * np.power(10, -6/20)
+            audio = audio.to_mono(np.power(10, -6/20))
         elif channels > 2:
             raise Exception('We do not other than mono and stereo')
+        else:
+            audio = audio.to_mono()
+
+        model.audio_data = audio
 
         expected = ActualProjectModel.calibration['expected']
         actual = ActualProjectModel.calibration['actual']
@@ -63,28 +138,87 @@ class DspThread(QObject):
         calibration_factor = np.power(10, calibration_db/20)
         print(f'Calibration dB: {calibration_db}')
 
-        model.audio_data = audio*calibration_factor
+        model.audio_data = audio.scaled(calibration_factor)
+
+    @staticmethod
+    def frame_starts(frames: int, fs: int, fps: float,
+                     frame_times: np.ndarray = None,
+                     audio_times: tuple = None) -> np.ndarray:
+        """First audio sample of every video frame.
+
+        With timestamps, every frame is mapped to the audio through the
+        clock shared by the camera and the audio blocks, so jitter in the
+        frame rate does not accumulate. Without them (e.g., old
+        projects), a constant frame rate is assumed.
+
+        Args:
+            frames (int): Number of frames.
+            fs (int): Sampling rate of the audio.
+            fps (float): Average frame rate.
+            frame_times (np.ndarray, optional): Capture time of every
+                frame, in seconds.
+            audio_times (tuple, optional): (first sample, time of that
+                sample) of the timestamped audio blocks, as two arrays.
+                Same clock as frame_times.
+
+        Returns:
+            np.ndarray: frames + 1 sample indexes. The last one is the end
+                of the last frame. Never decreasing, never negative.
+        """
+        if (frame_times is None or len(frame_times) != frames or
+                frames == 0 or audio_times is None or
+                len(audio_times[0]) == 0):
+            return (np.arange(frames + 1) * fs / fps).astype(int)
+
+        samples, times = map(np.asarray, audio_times)
+        frame_times = np.asarray(frame_times, dtype=float)
+
+        # The last frame lasts as long as a typical one
+        duration = np.median(np.diff(frame_times)) if frames > 1 else 1/fps
+        t = np.append(frame_times, frame_times[-1] + duration)
+
+        # Interpolated between blocks, extrapolated at fs outside them
+        starts = np.interp(t, times, samples)
+        starts = np.where(t < times[0],
+                          samples[0] + (t - times[0]) * fs, starts)
+        starts = np.where(t > times[-1],
+                          samples[-1] + (t - times[-1]) * fs, starts)
+
+        starts = np.maximum(np.round(starts), 0).astype(int)
+        return np.maximum.accumulate(starts)
+
+    def get_frame_starts(self, model) -> np.ndarray:
+        """model.frame_starts, computed (see frame_starts) if it is not
+        up to date with the position data."""
+        frames = len(model.data_x)
+        if (model.frame_starts is None or
+                len(model.frame_starts) != frames + 1):
+            model.frame_starts = self.frame_starts(
+                frames, model.audio_fs, model.fps, model.data_t,
+                model.audio_times)
+        return model.frame_starts
 
     def trim_audio(self, model) -> np.ndarray:
         audio_len = len(model.audio_data)
-        video_len = len(model.data_x)
-        fs = model.audio_fs
-        fps = model.fps
+        starts = self.get_frame_starts(model)
 
-        if (audio_len/fs < video_len/fps):
+        # Frames whose audio is complete
+        complete = np.searchsorted(starts[1:], audio_len, side='right')
+
+        if complete < len(model.data_x):
             # raise Exception('ERROR: Audio is shorter than needed...')
             self.log('Audio is shorter than needed. ' +
                      'Deleting the last position data')
-            diff_in_samples = video_len / fps*fs - audio_len
-            self.log(f'diff_in_audio_samples: {int(diff_in_samples)}')
-
-            position_data_to_remove = int(diff_in_samples/fs*fps)+1
+            position_data_to_remove = len(model.data_x) - complete
             self.log(f'position_data_to_remove: {position_data_to_remove}')
 
-            model.data_x = model.data_x[:-position_data_to_remove]
-            model.data_y = model.data_y[:-position_data_to_remove]
+            model.data_x = model.data_x[:complete]
+            model.data_y = model.data_y[:complete]
+            if len(model.data_t) > 0:
+                model.data_t = model.data_t[:complete]
+            model.frame_starts = starts = starts[:complete+1]
 
-        max_audio_len = int(video_len * model.audio_fs / model.fps)
+        max_audio_len = starts[-1]
 
         self.log(f'Trimming the last {abs(audio_len-max_audio_len)} ' +
                  'samples from audio')
@@ -96,112 +230,100 @@ class DspThread(QObject):
             self.log('ERROR: There is no localization data to analyze')
             raise Exception('...')
 
+        starts = self.get_frame_starts(model)
+        frames = len(model.data_x)
+
         model.data_x, shift, trim = interpolate_coords(
             model.data_x)
         model.data_y, _, _ = interpolate_coords(model.data_y)
+        if len(model.data_t) > 0:
+            model.data_t = model.data_t[shift:frames-trim]
 
-        sample_shift = int(shift/model.fps*model.audio_fs)
-        sample_trim = int(trim/model.fps*model.audio_fs)
+        sample_shift = starts[shift]
+        sample_trim = starts[-1] - starts[frames-trim]
+        model.frame_starts = starts[shift:frames-trim+1] - sample_shift
 
         return sample_shift, sample_trim
 
     @staticmethod
-    def index_of_grid(data, id):
-        ocurrences = []
-        for index, d in enumerate(data):
-            if d is None:
-                continue
-            if (id == d).all():
-                ocurrences.append(index)
+    def cell_of_frames(grid, data_x, data_y) -> np.ndarray:
+        """Integer id (row * cols + col) of the grid cell of every frame.
+        Frames outside the grid (or without position) get -1."""
+        rows, cols = grid.locate_points(data_x, data_y)
 
-        return ocurrences
+        ids = rows * grid.number_of_cols + cols
+        ids[rows == grid.OUTSIDE] = -1
+        return ids
 
     @staticmethod
-    def group_consecutives(array):
-        if not len(array) > 0:
-            return
-
-        if len(array) == 1:
-            return array*2
-
-        ranges = []
-
-        start = array[0]
-        end = array[0]
-        prev_int = -1
-
-        for ii, value in enumerate(array):
-            if ii == 0:
-                prev_int = value
-                continue
-
-            if value == prev_int+1:
-                end = value
-                if ii == len(array)-1:
-                    ranges.append([start, end])
-            else:
-                ranges.append([start, end])
-                start = value
-                end = value
-
-            prev_int = value
-
-        return ranges
+    def run_lengths(ids: np.ndarray) -> tuple:
+        """Run-length encoding of an array of ids.
+
+        Returns:
+            tuple: (value, first index, last index) of every run of
+                consecutive equal values, as three arrays.
+        """
+        if len(ids) == 0:
+            empty = np.array([], dtype=int)
+            return empty, empty, empty
+
+        changes = np.flatnonzero(np.diff(ids)) + 1
+        starts = np.concatenate(([0], changes))
+        ends = np.concatenate((changes - 1, [len(ids) - 1]))
+        return ids[starts], starts, ends
 
     def segment_video(self,
                       model: DisplayResultsModel
                       ) -> dict[tuple, list[tuple]]:
         self.log('Segmenting video')
 
-        data_pts = np.transpose([model.data_x, model.data_y])
-
-        data_grids = np.array(
-            list(map(model.grid.locate_point, data_pts)),
-            dtype=object)
-
         cols = model.grid.number_of_cols
         rows = model.grid.number_of_rows
 
-        grids = []
-        for i in range(rows):
-            for j in range(cols):
-                grids.append([i, j])
+        ids = self.cell_of_frames(model.grid, model.data_x, model.data_y)
+        values, starts, ends = self.run_lengths(ids)
 
-        d = {}
-        for id in grids:
-            d[tuple(id)] = self.index_of_grid(data_grids, id)
+        # Group the runs by cell, keeping them in temporal order
+        order = np.argsort(values, kind='stable')
+        counts = np.bincount(values[values >= 0], minlength=rows*cols)
+        first = np.searchsorted(values[order], 0)
+        bounds = np.cumsum(np.concatenate(([first], counts)))
 
-        # print('SPATIAL SEGMENTATION: ')
+        d = {}
+        for id in range(rows*cols):
+            runs = order[bounds[id]:bounds[id+1]]
+            d[divmod(id, cols)] = np.transpose(
+                [starts[runs], ends[runs]]).tolist()
 
         for key in [*d]:
-            self.log(f'Grid: {key}')
-            cons = self.group_consecutives(d[key])
-            d[key] = cons
-            if cons:
-                for c in cons:
-                    start = round(c[0]/model.fps, 2)
-                    end = round(c[1]/model.fps, 2)
-                    self.log(f' -> from: {start} - to: {end} seconds')
+            frames = sum(end - start + 1 for start, end in d[key])
+            self.log(f'Grid: {key} -> {len(d[key])} segments, ' +
+                     f'{round(frames/model.fps, 2)} seconds')
 
         return d
 
     def segment_audio(self, model,
                       segmentation: dict[tuple, list[tuple]]
                       ) -> dict[tuple, list[tuple]]:
+        """Converts the frame ranges of every cell into sample ranges (see
+        get_frame_starts).
+
+        The audio is not copied: every cell gets a list of (start, end)
+        sample ranges (end excluded) over model.audio_data.
+        """
         self.log(' ***  ***  ***  ***  *** Segmenting audio...')
-        fps = model.fps
-        fs = model.audio_fs
-        conversion_ratio = fs / fps
+        starts = self.get_frame_starts(model)
+        len_audio = len(model.audio_data)
 
         audio_segments: dict[tuple, list[tuple]] = {}
         for grid_id in [*segmentation]:
             audio_segments[grid_id] = []
 
             for range in segmentation[grid_id]:
-                start = int(range[0] * conversion_ratio)
-                end = int((range[1]+1) * conversion_ratio)-1
-                audio_segment = model.audio_data[start:end]
-                audio_segments[grid_id].extend(audio_segment)
+                start = int(starts[range[0]])
+                end = int(min(starts[range[1]+1], len_audio))
+                if end > start:
+                    audio_segments[grid_id].append((start, end))
 
         return audio_segments
 
@@ -218,17 +340,29 @@ class DspThread(QObject):
 
         self.log(f'Limits: {limits}')
 
-        for index, key in enumerate([*audio_segments]):
+        # Starting a process costs more than analyzing a small cell
+        workers = min(self.workers,
+                      sum(len(ranges) > 0 for ranges in
+                          audio_segments.values()))
+
+        if workers > 1:
+            self.log(f'Analyzing with {workers} processes')
+            results = self.analyze_parallel(
+                model.audio_data, audio_segments, fs, limits, workers)
+        else:
+            results = self.analyze_serial(
+                model.audio_data, audio_segments, fs, limits)
+
+        # Results arrive in completion order
+        for index, (key, result) in enumerate(results):
             # self.log(f'Processing grid: {key}')
             self.update_status.emit(index)
 
-            audio = np.array(audio_segments[key])
-
-            if len(audio) == 0:
+            if result is None:
                 self.log('Len audio == 0. Continuing...')
                 continue
 
-            _spl, _freq = dsp.get_spectrum(audio, fs, limits)
+            _spl, _freq = result
             freq = _freq
             spectrum[key[0]][key[1]] = _spl
 
@@ -238,6 +372,186 @@ class DspThread(QObject):
 
         return np.array(freq), np.array(spectrum, dtype=object)
 
+    def analyze_serial(self, audio, audio_segments, fs, limits):
+        """Yields (grid, spectrum) for each grid cell, one after the other.
+        The spectrum is None for the cells without audio."""
+        for key in [*audio_segments]:
+            if len(audio_segments[key]) == 0:
+                yield key, None
+                continue
+
+            yield key, dsp.get_spectrum(audio, fs, limits,
+                                        ranges=audio_segments[key])
+
+    def analyze_parallel(self, audio, audio_segments, fs, limits,
+                         workers: int = None):
+        """Yields (grid, spectrum) for each grid cell as soon as a worker
+        process finishes it. The spectrum is None for the cells without
+        audio.
+
+        In-memory audio is copied once into a shared memory block, so the
+        workers only receive the sample ranges of their cell.
+
+        Args:
+            workers (int, optional): Processes of the pool. Defaults to
+                None => self.workers.
+        """
+        shm = None
+        if isinstance(audio, np.ndarray):
+            shm = shared_memory.SharedMemory(create=True,
+                                             size=max(audio.nbytes, 1))
+            shared = np.ndarray(audio.shape, dtype=audio.dtype,
+                                buffer=shm.buf)
+            shared[:] = audio
+            del shared
+            task = (dsp.get_spectrum_shared, shm.name, audio.shape,
+                    audio.dtype.str)
+        else:
+            # File-backed audio (WavAudio): every worker maps the file
+            # itself, so the pages are shared through the OS cache
+            task = (dsp.get_spectrum, audio)
+
+        try:
+            # 'spawn': forking a process that runs Qt threads is not safe
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(workers or self.workers,
+                                     mp_context=context) as executor:
+                futures = {}
+                for key in [*audio_segments]:
+                    if len(audio_segments[key]) == 0:
+                        yield key, None
+                        continue
+
+                    future = executor.submit(*task, fs, limits,
+                                             audio_segments[key])
+                    futures[future] = key
+
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+    def analyze_streaming(self, model) -> tuple:
+        """Spectrum and full band level of every cell, reading the audio in
+        blocks of block_size samples.
+
+        The band energies of every video frame are computed first (see
+        frame_energies) and kept in model.frame_energy, then they are
+        summed per cell (see bin_frames). If the model already has them
+        (e.g., from the results cache) the audio is not read at all. The
+        audio is never held in memory as a whole: memory is
+        O(block + frames x bands).
+
+        The levels are not identical to the ones of analyze:
+         - The band level is that of the mean power over the whole time
+           in the cell, not the mean of the levels of its windows.
+         - The filters see the recording as one continuous signal, so
+           after every change of cell they still carry the audio of the
+           previous one. Those frames are left out of each band for its
+           settling time (see dsp.settling_time): about 1 s in the
+           20 Hz band, 30 ms at 1 kHz. A cell visited for less than that
+           falls back to all of its frames in that band, transient
+           included.
+        For cells 20 dB apart, the bands above 100 Hz are within 0.75 dB
+        of analyze (see tests/test_analysis.py).
+
+        Returns:
+            tuple: freq, spectrum (rows x cols x bands) and full band
+                spectrum (rows x cols), as arrays. The cells without audio
+                are NaN.
+        """
+        if model.frame_energy is None:
+            model.frame_energy = self.frame_energies(model)
+        freq, spectrum, full_band_spec = self.bin_frames(model)
+
+        self.save(spectrum, freq)
+
+        return freq, spectrum, full_band_spec
+
+    def frame_energies(self, model) -> dsp.FrameEnergy:
+        """Band energies of every video frame.
+
+        Every sample is routed to the frame it was recorded in (see
+        get_frame_starts), and the band energies of each frame are updated
+        incrementally (dsp.BandEnergy). The samples after the last frame
+        are counted in it, the ones before the first one are left out.
+
+        Returns:
+            dsp.FrameEnergy: One row per frame.
+        """
+        audio = model.audio_data
+        frames = len(model.data_x)
+        starts = self.get_frame_starts(model)
+        energy = dsp.BandEnergy(model.audio_fs, model.freq_range, frames)
+        cells = model.grid.number_of_rows * model.grid.number_of_cols
+
+        self.log(f'Streaming {len(audio)} samples in blocks of ' +
+                 f'{self.block_size}')
+
+        for start in range(0, len(audio), self.block_size):
+            block = np.asarray(audio[start:start+self.block_size])
+
+            labels = np.searchsorted(
+                starts, np.arange(start, start + len(block)),
+                side='right') - 1
+            energy.add(block, np.minimum(labels, frames-1))
+
+            self.update_status.emit(
+                int((start + len(block)) / len(audio) * cells) - 1)
+
+        return dsp.FrameEnergy.from_band_energy(energy)
+
+    def bin_frames(self, model) -> tuple:
+        """Spectrum and full band level of every cell of model.grid, from
+        the band energies of the frames (model.frame_energy).
+
+        No filtering is involved: the energies of the frames are summed
+        per cell, so the grid can be changed at a low cost.
+
+        Returns:
+            tuple: freq, spectrum and full band spectrum, like
+                analyze_streaming.
+        """
+        cols = model.grid.number_of_cols
+        rows = model.grid.number_of_rows
+
+        ids = self.cell_of_frames(model.grid, model.data_x, model.data_y)
+        # Leave out the filter transient after every change of cell
+        settle = np.ceil(dsp.settling_time(model.audio_fs, model.freq_range)
+                         * model.fps).astype(int)
+        energy = model.frame_energy.regroup(ids, rows*cols, settle)
+
+        spectrum = energy.spl().reshape(rows, cols, -1)
+        full_band_spec = energy.full_band().reshape(rows, cols)
+
+        return np.array(energy.freq), spectrum, full_band_spec
+
+    def regrid(self, model, grid_info: list) -> None:
+        """Analyzes the project again with another grid.
+
+        The band energies of the frames (model.frame_energy) are re-binned
+        (see bin_frames): the audio is only read again if they are not in
+        the model (e.g., the results came from the results cache, without
+        them). Run it after process.
+
+        Args:
+            model (DisplayResultsModel): The model, after process.
+            grid_info (list): Rows, cols and padding of the new grid.
+        """
+        self.log(f'New grid: {grid_info}')
+
+        model.grid = Grid(model.frame_size, *map(int, grid_info))
+
+        if model.frame_energy is None:
+            model.frame_energy = self.frame_energies(model)
+
+        model.freq, model.spectrum, model.full_band_spec = \
+            self.bin_frames(model)
+
+        self.finished.emit()
+
     def get_full_band(self, model, audio_segments):
         cols = model.grid.number_of_cols
         rows = model.grid.number_of_rows
@@ -247,22 +561,19 @@ class DspThread(QObject):
 
         for key in [*audio_segments]:
             self.log(f'Processing grid: {key}')
-            spl = 20 * np.log10(np.std(audio_segments[key]) / 2e-5)
+            std = dsp.std_of_ranges(model.audio_data, audio_segments[key])
+            spl = 20 * np.log10(std / 2e-5)
             spectrum[key[0]][key[1]] = spl
 
         return spectrum
 
     def save(self, sp, freq):
-        row, col, ii = np.array(sp).shape
-
-        spectrum = np.reshape(sp, (row*col, ii))
-
-        # spectrum = []
-        # for row in sp:
-        # for col in row:
-        # spectrum.append(col)
-
-        fileutils.save_np_to_txt(spectrum, os.path.join(
-            ActualProjectModel.project_location, 'Results'), 'results.spec')
-        fileutils.save_np_to_txt(freq, os.path.join(
-            ActualProjectModel.project_location, 'Results'), 'resutls.freq')
+        # One row per cell. The cells without audio are saved as NaN
+        spectrum = np.array([cell if len(cell) > 0 else [np.nan]*len(freq)
+                             for row in sp for cell in row], dtype=float)
+
+        fileutils.save_bundle({'spectrum': spectrum,
+                               'freq': np.asarray(freq, dtype=float)},
+                              os.path.join(ActualProjectModel.project_location,
+                                           'Results'),
+                              'results')
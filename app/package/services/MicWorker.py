@@ -1,7 +1,8 @@
 import os
-import queue
 import sys
-from time import time
+from time import time, perf_counter
+
+import numpy as np
 
 import sounddevice as sd
 import soundfile as sf
@@ -9,32 +10,80 @@ from PySide2.QtCore import QObject, Signal
 
 from ..models.ActualProjectModel import ActualProjectModel as actual_project
 from . import file as fileutils
+from .ringbuffer import RingBuffer
 
 
 class MicWorker(QObject):
+    """Worker that records the microphone to 'Audio Files/audio.wav'.
+
+    The audio callback copies the recorded blocks into a preallocated ring
+    buffer, and the worker writes them to the file in large contiguous
+    chunks. While not recording, the blocks are ignored in the callback.
+
+    The time of the recorded audio is saved in 'Audio Files' (bundle
+    'timestamps'), in the clock of the frame timestamps of CameraThread,
+    to align audio and video: one block every timestamp_interval seconds,
+    and the first one after every dropped block. The live analysis gets
+    the time of every chunk from them.
+
+    Attributes:
+        buffer_overrun (Signal): Total blocks dropped because the ring
+            buffer was full (the disk could not keep up).
+        input_overflow (Signal): Total input overflows reported by the
+            audio device.
+        buffer_seconds (int): Audio the ring buffer can hold.
+        write_chunk (int): Frames written to the file at once.
+        timestamp_interval (float): Seconds of audio between timestamps.
+        max_timestamps (int): Timestamps kept (preallocated). Beyond them,
+            the audio is assumed to be recorded at fs.
+    """
     update_volume = Signal(object)
     finished = Signal(bool)
+    buffer_overrun = Signal(int)
+    input_overflow = Signal(int)
+
+    buffer_seconds = 10
+    write_chunk = 2**15
+    timestamp_interval = 1.0
+    max_timestamps = 24 * 3600
 
     @staticmethod
     def log(msg):
         print(f'[MicWorker] {msg}')
 
-    def config_mic(self, input_device, buffer=0):
+    def config_mic(self, input_device, buffer=0, channels=None):
         """[summary]
 
         Args:
             input_device ([type]): index of the actual input mic.
             fs (int, optional): Sampling frequency 44.1 kHz.
             buffer (int, optional): Defaults to 0 => automatic blocksize
+            channels (int, optional): Channels recorded. Defaults to None
+                => stereo, or mono if the device only has one input.
         """
         self.io = (input_device, sd.default.device[1])
-        self.fs = int(sd.query_devices()[input_device]['default_samplerate'])
+        device = sd.query_devices()[input_device]
+        self.fs = int(device['default_samplerate'])
+        # The analysis supports mono and stereo (DspThread.calibrate_audio)
+        self.channels = channels or min(2, device['max_input_channels'])
         self.buffer = buffer
-        self.q = queue.Queue()
+        self.ring = RingBuffer(self.buffer_seconds * self.fs, self.channels)
+        self.input_overflows = 0
+
+        # (first sample in the file, time.perf_counter of that sample) of
+        # the timestamped blocks. Allocated here, not in the callback
+        self.block_times = np.zeros((self.max_timestamps, 2))
+        self._timestamps = 0
+        self._next_timestamp = 0
+        self._recorded = 0
+        self._written = 0
 
         self._running = False
         self._rec = False
 
+        # LiveSpectrum fed with the recorded blocks. Optional
+        self.live = None
+
     def rec(self):
         self.log("Start recording!")
         self.start_time = time()
@@ -47,7 +96,7 @@ class MicWorker(QObject):
 
     def stop(self):
         self.error = True
-        self._running = False  # to raise the Exception
+        self._running = False  # to end the loop of run
 
     def run(self):
         self.error = False
@@ -56,9 +105,10 @@ class MicWorker(QObject):
         self._running = True
 
         self.stream = sd.Stream(device=self.io,
-                                channels=2,
+                                channels=(self.channels, 2),
                                 samplerate=self.fs,
                                 blocksize=self.buffer,
+                                dtype='float32',
                                 callback=self.callback)
 
         path = os.path.join(actual_project.project_location, 'Audio Files')
@@ -67,23 +117,37 @@ class MicWorker(QObject):
         self.file_stream = sf.SoundFile(os.path.join(path, 'audio.wav'),
                                         mode='w',
                                         samplerate=self.fs,
-                                        channels=2)
+                                        channels=self.channels)
+        overruns, overflows = 0, 0
         try:
             with self.file_stream as file:
                 with self.stream:
                     while self._running:
-                        if self._rec:
-                            file.write(self.q.get())
-                        else:
-                            self.q.get()
+                        if self.ring.wait(self.write_chunk, timeout=0.1):
+                            self.write(file, self.write_chunk)
+
+                        if self.ring.overruns != overruns:
+                            overruns = self.ring.overruns
+                            self.log(f'Buffer overrun! ({overruns})')
+                            self.buffer_overrun.emit(overruns)
 
-                        if not self._running:
-                            raise KeyboardInterrupt("Recording stopped!")
+                        if self.input_overflows != overflows:
+                            overflows = self.input_overflows
+                            self.input_overflow.emit(overflows)
+
+                self.log("Recording stopped!")
+
+                # The stream is closed: the rest of the recording is in
+                # the buffer
+                if not self.error:
+                    self.write(file)
+                    self.save_block_times(path)
 
-        except KeyboardInterrupt as e:
-            self.log(e)
         except Exception as e:
-            self.log("Unexpected Exception:", e)
+            self.log(f"Unexpected Exception: {e}")
+
+        if self.live is not None:
+            self.live.stop()
 
         if not self.error:
             elapsed = time()-self.start_time
@@ -91,15 +155,74 @@ class MicWorker(QObject):
             print(f' -> fs = {self.fs}')
             print(
                 f' -> Theoretical num of samples => {round(elapsed*self.fs)}')
+            print(f' -> Buffer overruns: {self.ring.overruns} ' +
+                  f'({self.ring.dropped} samples dropped)')
+            if self.live is not None:
+                print(' -> Samples left out of the live analysis: ' +
+                      f'{self.live.dropped}')
 
         self.finished.emit(self.error)
 
+    def write(self, file, max_frames: int = None):
+        """Writes the recorded frames in the ring buffer to the file (and
+        to the queue of the live analysis), straight from the buffer."""
+        for chunk in self.ring.peek(max_frames):
+            file.write(chunk)
+            if self.live is not None:
+                # Analyzed in its own thread: a slow analysis drops its
+                # blocks, never the ones of the file
+                self.live.put(chunk, self.sample_time(self._written))
+            self._written += len(chunk)
+            self.ring.advance(len(chunk))
+
+    def sample_time(self, sample: int) -> float:
+        """time.perf_counter of a sample of the file, from the timestamp
+        before it. None if there are no timestamps yet."""
+        count = self._timestamps
+        if count == 0:
+            return None
+
+        samples = self.block_times[:count, 0]
+        index = max(np.searchsorted(samples, sample, side='right') - 1, 0)
+        return (self.block_times[index, 1] +
+                (sample - samples[index]) / self.fs)
+
+    def save_block_times(self, path: str):
+        times = self.block_times[:self._timestamps]
+        fileutils.save_bundle({'sample': times[:, 0].astype(np.int64),
+                               'time': times[:, 1]},
+                              path, 'timestamps', fs=self.fs)
+
     def callback(self, indata, outdata, frames, time, status):
         """This is called (from a separate thread) for each audio block."""
         if status:
+            if status.input_overflow:
+                self.input_overflows += 1
             print(status, file=sys.stderr)
 
         # outdata[:] = indata
         # self.update_volume.emit(indata.copy())
-        # print(indata)
-        self.q.put(indata.copy())
+        if not self._rec:
+            return
+
+        if not self.ring.write(indata):
+            # Dropped: the next block starts a new stretch of the file
+            self._next_timestamp = self._recorded
+            return
+
+        if (self._recorded >= self._next_timestamp and
+                self._timestamps < self.max_timestamps):
+            # ADC time of the block in the stream clock => perf_counter.
+            # Some host APIs do not provide it: use the callback time
+            now = perf_counter()
+            if time.inputBufferAdcTime > 0:
+                adc_time = time.inputBufferAdcTime + now - time.currentTime
+            else:
+                adc_time = now - frames / self.fs
+
+            self.block_times[self._timestamps] = (self._recorded, adc_time)
+            self._timestamps += 1
+            self._next_timestamp = (self._recorded +
+                                    int(self.timestamp_interval * self.fs))
+
+        self._recorded += frames
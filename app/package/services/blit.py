@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Fast updates of a Matplotlib bar chart with blitting.
+
+A full draw of a figure renders the axes, the ticks, the labels and the
+grid again, although only the height of the bars changes when another
+cell is selected. :class:`BarBlitter` marks the bars as animated, so a
+full draw leaves them out, and keeps a copy of the rendered axes (the
+background). An update restores the background and renders only the
+bars on top of it.
+"""
+
+__all__ = ['BarBlitter']
+
+
+class BarBlitter:
+    """Updates the heights of the bars of a bar chart with blitting.
+
+    The background is captured after every full draw of the canvas (the
+    first one, a resize, new limits...), so it is never stale. Until
+    then, an update falls back to a full draw.
+
+    Args:
+        canvas (FigureCanvasAgg): Canvas of the figure. Any Agg based
+            canvas (FigureCanvasQTAgg...).
+        ax (Axes): Axes of the bars.
+        bars (BarContainer): Bars, as returned by ax.bar.
+
+    Attributes:
+        blits (int): Updates done with blitting.
+        draws (int): Updates done with a full draw.
+    """
+
+    def __init__(self, canvas, ax, bars):
+        self.canvas = canvas
+        self.ax = ax
+        self.bars = bars
+        self._background = None
+
+        for patch in bars.patches:
+            patch.set_animated(True)
+
+        self._cid = canvas.mpl_connect('draw_event', self._on_draw)
+
+        self.blits = 0
+        self.draws = 0
+
+    def disconnect(self) -> None:
+        """Stops capturing the background. Call it before the bars are
+        removed from the axes."""
+        self.canvas.mpl_disconnect(self._cid)
+        self._background = None
+
+    def _on_draw(self, event) -> None:
+        # The animated bars are not in the full draw: capture the
+        # background and draw them on top
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_bars()
+
+    def _draw_bars(self) -> None:
+        for patch in self.bars.patches:
+            self.ax.draw_artist(patch)
+
+    def update(self, heights) -> None:
+        """Sets the heights of the bars and shows them.
+
+        Args:
+            heights: One height per bar. NaN => no bar.
+        """
+        for patch, height in zip(self.bars.patches, heights):
+            patch.set_height(height)
+
+        if self._background is None:
+            self.draws += 1
+            self.canvas.draw()
+            return
+
+        self.blits += 1
+        self.canvas.restore_region(self._background)
+        self._draw_bars()
+        self.canvas.blit(self.ax.bbox)
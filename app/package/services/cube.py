@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Dense (rows x cols x bands) cube of the results of the analysis.
+
+The analysis may give the spectrum of every grid cell as nested lists,
+with the cells without audio empty (DspThread.analyze) or NaN. Stored as
+a float32 cube, with NaN for the cells without audio, any band of every
+cell is a NumPy view, and the limits of the levels are reductions.
+"""
+
+import numpy as np
+
+__all__ = ['spectrum_cube', 'band_limits', 'plot_limits']
+
+
+def spectrum_cube(spectrum, bands: int = None) -> np.ndarray:
+    """Dense version of the spectrum of every cell.
+
+    Args:
+        spectrum: Spectrum of every cell: (rows x cols x bands) array, or
+            (rows x cols) nested lists / object array. The cells without
+            audio are NaN or empty.
+        bands (int, optional): Bands of the spectrum. Needed only if every
+            cell is empty.
+
+    Returns:
+        np.ndarray: float32 (rows x cols x bands) cube, NaN for the cells
+            without audio.
+    """
+
+    try:
+        cube = np.asarray(spectrum, dtype=np.float32)
+        # (Every cell empty => 0 bands)
+        if cube.ndim == 3 and (cube.shape[2] > 0 or not bands):
+            return cube
+    except (ValueError, TypeError):
+        # Ragged: empty cells
+        pass
+
+    rows = len(spectrum)
+    cols = len(spectrum[0]) if rows > 0 else 0
+    if bands is None:
+        bands = max((len(cell) for row in spectrum for cell in row),
+                    default=0)
+
+    cube = np.full((rows, cols, bands), np.nan, dtype=np.float32)
+    for irow, row in enumerate(spectrum):
+        for icol, cell in enumerate(row):
+            if cell is not None and len(cell) > 0:
+                cube[irow, icol] = cell
+
+    return cube
+
+
+def band_limits(levels: np.ndarray) -> tuple:
+    """Minimum and maximum level of every band, ignoring NaN.
+
+    Args:
+        levels (np.ndarray): (rows x cols x bands) cube or (rows x cols)
+            map.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Per band (scalars for a map). NaN
+            for the bands without any level.
+    """
+
+    levels = np.asarray(levels, dtype=np.float32)
+    rows, cols = levels.shape[:2]
+    flat = levels.reshape(rows * cols, *levels.shape[2:])
+
+    if len(flat) == 0:
+        nan = np.full(levels.shape[2:], np.nan, dtype=np.float32)
+        return nan, nan
+
+    # fmin / fmax ignore NaN (without the warnings of nanmin for all-NaN)
+    return np.fmin.reduce(flat, axis=0), np.fmax.reduce(flat, axis=0)
+
+
+def plot_limits(band_min: np.ndarray, band_max: np.ndarray,
+                default: tuple) -> tuple:
+    """Limits of the level axis of the spectrum plot: 10 % below the
+    lowest level and 10 % above the highest one (see band_limits).
+
+    Args:
+        band_min (np.ndarray): Minimum level of every band.
+        band_max (np.ndarray): Maximum level of every band.
+        default (tuple): (low, high) if no band has any level (no cell
+            with audio).
+
+    Returns:
+        tuple[float, float]: (low, high).
+    """
+
+    band_min = np.asarray(band_min, dtype=float)
+    band_max = np.asarray(band_max, dtype=float)
+    low = band_min[np.isfinite(band_min)]
+    high = band_max[np.isfinite(band_max)]
+
+    if len(low) == 0 or len(high) == 0:
+        return default
+    return low.min() * 0.9, high.max() * 1.1
@@ -6,9 +6,23 @@ region for the Scan&Paint method and to actualy get the spectrum
 analysis for a single audio signal.
 """
 
+from functools import lru_cache
+from multiprocessing import shared_memory
+
 from . import PyOctaveBand
+from . import file as fileutils
 import numpy as np
-from scipy import signal
+
+# Windows filtered at once by get_spectrum. Bounds the memory of the
+# batch (each window is 2^16 samples) for long recordings.
+WINDOWS_PER_BATCH = 32
+
+# Mean power of the Hann window used by get_spectrum. Levels computed
+# without windowing are scaled by it, so they are comparable with the
+# ones of get_spectrum. np.hanning is the same (symmetric) window as
+# scipy.signal.windows.hann: SciPy is only imported when the audio is
+# filtered, not for get_time_of_recording (the NewProject screen).
+WINDOW_POWER = np.mean(np.hanning(2**16)**2)
 
 
 def _getTime(B, e=0.1):
@@ -80,14 +94,57 @@ def _get_num_of_windows(len_audio, win_size, overlap):
     return int(np.ceil(N))
 
 
+def gather(audio: np.ndarray, ranges: list[tuple]) -> np.ndarray:
+    """Concatenation of several sample ranges of an audio signal.
+
+    The output is allocated once and the ranges are copied straight from
+    the audio buffer.
+
+    Args:
+        audio (np.ndarray): Audio signal.
+        ranges (list[tuple]): (start, end) sample ranges, end excluded.
+
+    Returns:
+        np.ndarray: The samples of every range, one after the other.
+    """
+    if len(ranges) == 0:
+        return np.empty(0, dtype=audio.dtype)
+
+    return np.concatenate([audio[start:end] for start, end in ranges])
+
+
+def std_of_ranges(audio: np.ndarray, ranges: list[tuple]) -> float:
+    """Standard deviation of several sample ranges of an audio signal, as
+    if they were concatenated, but without concatenating them.
+
+    Args:
+        audio (np.ndarray): Audio signal.
+        ranges (list[tuple]): (start, end) sample ranges, end excluded.
+
+    Returns:
+        float: Standard deviation. NaN if there are no samples.
+    """
+    n = sum(end - start for start, end in ranges)
+    if n == 0:
+        return np.nan
+
+    mean = sum(np.sum(np.asarray(audio[start:end]), dtype=float)
+               for start, end in ranges) / n
+    var = sum(np.sum((np.asarray(audio[start:end]) - mean)**2, dtype=float)
+              for start, end in ranges) / n
+    return np.sqrt(var)
+
+
 def get_spectrum(audio: np.ndarray,
                  fs: int,
-                 limits=[12, 20000]
+                 limits=[12, 20000],
+                 ranges: list[tuple] = None
                  ) -> tuple[list, list]:
     """Function that returns one third-octave spectrum analysis of a signal
 
     It does so while windowing the signal with a Hannin window of size
-    2^15 samples, with an overlap of 50%
+    2^15 samples, with an overlap of 50%. Windows are processed in batches
+    of WINDOWS_PER_BATCH, filtering all of them in a single call.
 
     Args:
         audio (np.ndarray): Audio two-dimensional array. First dimension:
@@ -95,37 +152,365 @@ def get_spectrum(audio: np.ndarray,
         fs (int): sampling rate
         limits (list, optional): Limits for the frequency
         spectrum analysis. Defaults to None.
+        ranges (list[tuple], optional): (start, end) sample ranges of the
+            audio to analyze, as if they were one signal. Defaults to None
+            => the whole audio.
 
     Returns:
         tuple[list, list]: Returns the spectrum values and the frequency array.
     """
-    print(f'Get Spectrum. Audio.shape = {audio.shape}')
+    from scipy import signal
+
+    if ranges is not None:
+        audio = gather(audio, ranges)
 
     win_size = 2**16
     overlap = 0.5
     len_audio = audio.shape[0]
     fraction = 3
     window = signal.windows.hann(win_size)
+    hop = round(win_size-win_size*overlap)
 
-    i = 0
-    index = 0
-
-    freq, _, _ = PyOctaveBand._genfreqs(limits, fraction, fs)
-    num_of_win = _get_num_of_windows(len_audio, win_size, overlap)
+    # The filter bank is designed once per configuration and shared by
+    # every window (and every call)
+    bank = PyOctaveBand.get_filterbank(fs, fraction, 6, limits)
+    freq = bank.freq
+    num_of_win = max(_get_num_of_windows(len_audio, win_size, overlap), 0)
     spls = np.zeros([num_of_win, len(freq)])
 
-    while i+win_size < len_audio:
-        start, end = i, i+win_size
+    if num_of_win > 0:
+        # All the overlapping windows as a strided (num_of_win, win_size)
+        # view of the audio: no data is copied until they are windowed
+        windows = np.lib.stride_tricks.sliding_window_view(
+            audio, win_size)[::hop][:num_of_win]
 
-        audio_windowed = audio[start:end] * window
+        for start in range(0, num_of_win, WINDOWS_PER_BATCH):
+            end = start + WINDOWS_PER_BATCH
+            spls[start:end] = bank.spl(windows[start:end] * window, axis=-1)
 
-        _spl, f = PyOctaveBand.octavefilter(
-            audio_windowed, fs, fraction, 6, limits, False)
+    spl = np.mean(spls, 0)
+    return spl, freq
 
-        spls[index] = _spl
 
-        index += 1
-        i += round(win_size-win_size*overlap)
+def get_spectrum_shared(name: str,
+                        shape: tuple,
+                        dtype: str,
+                        fs: int,
+                        limits=[12, 20000],
+                        ranges: list[tuple] = None
+                        ) -> tuple[list, list]:
+    """Same as get_spectrum, but for an audio array that lives in shared
+    memory.
 
-    spl = np.mean(spls, 0)
-    return spl, freq
+    It is meant to be run in a worker process: the audio is not pickled,
+    only the name of the shared memory block and the ranges to analyze.
+
+    Args:
+        name (str): Name of the multiprocessing.shared_memory block.
+        shape (tuple): Shape of the audio array in the block.
+        dtype (str): dtype of the audio array in the block.
+        fs (int): sampling rate
+        limits (list, optional): Limits for the frequency
+        spectrum analysis. Defaults to [12, 20000].
+        ranges (list[tuple], optional): (start, end) sample ranges to
+            analyze. Defaults to None => the whole audio.
+
+    Returns:
+        tuple[list, list]: Returns the spectrum values and the frequency array.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        audio = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        spectrum = get_spectrum(audio, fs, limits, ranges)
+        # The view must be released before closing the block
+        del audio
+    finally:
+        shm.close()
+
+    return spectrum
+
+
+@lru_cache(maxsize=16)
+def _settling_time(fs: int, limits: tuple, fraction: int,
+                   tail: float) -> np.ndarray:
+    bank = PyOctaveBand.get_filterbank(fs, fraction, 6, limits)
+    stream = PyOctaveBand.OctaveFilterStream(bank)
+
+    # Energy of the impulse response of every band, in 1 ms steps. The
+    # lowest bands ring for a few hundred milliseconds
+    hop = max(fs // 1000, 1)
+    length = 4 * fs
+    impulse = np.zeros(length)
+    impulse[0] = 1
+    energy, _ = stream.energy(impulse, np.arange(length) // hop,
+                              length // hop)
+
+    arrived = np.cumsum(energy, axis=0) / energy.sum(axis=0)
+    steps = np.argmax(arrived >= 1 - tail, axis=0) + 1
+    return steps * hop / fs
+
+
+def settling_time(fs: int, limits: list, fraction=3,
+                  tail=1e-3) -> np.ndarray:
+    """Time every band of the streaming analysis (see BandEnergy) takes to
+    forget the signal before a change.
+
+    The filters are causal and their state is carried over, so after the
+    microphone enters a cell the output of every band still contains the
+    audio of the previous one for a while: the group delay of the
+    decimation stages and the ringing of the band filter. It is the time
+    the impulse response of the band takes to deliver all but tail of its
+    energy: about 1 s in the 20 Hz band, 30 ms at 1 kHz.
+
+    Args:
+        fs (int): sampling rate
+        limits (list): Limits for the frequency spectrum analysis.
+        fraction (int, optional): Fraction for the 1/x octave spectrum
+            analysis. Defaults to 3.
+        tail (float, optional): Fraction of the energy of the impulse
+            response left. Defaults to 1e-3 (-30 dB).
+
+    Returns:
+        np.ndarray: Seconds per band.
+    """
+    return _settling_time(int(fs), tuple(limits), fraction, tail).copy()
+
+
+class BandEnergy:
+    """Running band energies of a signal that arrives in blocks, split by
+    labels.
+
+    Every sample of a block has an integer label (a grid cell, a video
+    frame...) and the energy of every one third-octave band is accumulated
+    per label, so the memory used is O(block + labels x bands) no matter
+    how long the signal is. Samples with a negative label are filtered
+    (the filters see a continuous signal) but not accumulated.
+
+    Because the filters see a continuous signal, the first samples of a
+    label still carry the energy of the previous one for the settling time
+    of every band (see settling_time). BandEnergy does not correct it:
+    FrameEnergy.regroup leaves those frames out.
+
+    Args:
+        fs (int): sampling rate
+        limits (list): Limits for the frequency spectrum analysis.
+        num_of_labels (int): Number of labels.
+        fraction (int, optional): Fraction for the 1/x octave spectrum
+            analysis. Defaults to 3.
+
+    Attributes:
+        freq (list): Center frequency of the bands.
+        energy (np.ndarray): Sum of the squared band samples, per label
+            and band.
+        samples (np.ndarray): Number of band samples, per label and band.
+        count (np.ndarray): Number of samples (full rate), per label.
+    """
+
+    def __init__(self, fs: int, limits: list, num_of_labels: int,
+                 fraction=3):
+        bank = PyOctaveBand.get_filterbank(fs, fraction, 6, limits)
+        self.freq = bank.freq
+        self._stream = PyOctaveBand.OctaveFilterStream(bank)
+
+        self.energy = np.zeros((num_of_labels, len(bank)))
+        self.samples = np.zeros((num_of_labels, len(bank)))
+        self.count = np.zeros(num_of_labels)
+        self._sum = np.zeros(num_of_labels)
+        self._sum_sq = np.zeros(num_of_labels)
+
+    def add(self, block: np.ndarray, labels: np.ndarray) -> None:
+        """Accumulates the next block of the signal.
+
+        Args:
+            block (np.ndarray): The samples (1-D).
+            labels (np.ndarray): Label of every sample.
+        """
+        labels = np.asarray(labels)
+        valid = labels >= 0
+
+        if not valid.any():
+            # Keep the filters running
+            self._stream.energy(block, np.zeros(len(block), dtype=int), 1)
+            return
+
+        # Only the labels in this block: local label 0 gathers the samples
+        # that are not accumulated
+        low = labels[valid].min()
+        high = labels[valid].max() + 1
+        local = np.where(valid, labels - low + 1, 0)
+        n = high - low + 1
+
+        energy, samples = self._stream.energy(block, local, n)
+        self.energy[low:high] += energy[1:]
+        self.samples[low:high] += samples[1:]
+
+        block = np.asarray(block, dtype=float)
+        self.count[low:high] += np.bincount(local, minlength=n)[1:]
+        self._sum[low:high] += np.bincount(local, block, n)[1:]
+        self._sum_sq[low:high] += np.bincount(local, block**2, n)[1:]
+
+    def spl(self) -> np.ndarray:
+        """Band levels per label, in dB, scaled by WINDOW_POWER to be
+        comparable with get_spectrum. NaN for the labels without samples.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            power = self.energy / self.samples * WINDOW_POWER
+            return 10 * np.log10(power / 2e-5**2)
+
+    def full_band(self) -> np.ndarray:
+        """Full band level (standard deviation of the signal) per label,
+        in dB. NaN for the labels without samples."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = self._sum / self.count
+            var = self._sum_sq / self.count - mean**2
+            return 10 * np.log10(np.maximum(var, 0) / 2e-5**2)
+
+
+class FrameEnergy:
+    """Band energies of a recording, one row per video frame.
+
+    It is the output of the frame stage of the streaming analysis: a
+    (frames x bands) float32 matrix with the mean power of every band
+    during every frame, plus the number of samples, their sum and their
+    sum of squares per frame (full band level). Cell maps, re-gridding and
+    time-limited views are reductions of it: no filtering is involved.
+
+    Slicing it (with a step of 1) returns the frames of a time interval,
+    and regroup sums frames into groups (e.g., the cells of a grid). The
+    matrix can be saved to and memory-mapped from a bundle (see
+    fileutils.save_bundle).
+
+    Args:
+        freq (list): Center frequency of the bands.
+        power (np.ndarray): Mean band power, (frames x bands). 0 for the
+            frames without samples.
+        count (np.ndarray): Number of samples per frame.
+        sum (np.ndarray): Sum of the samples per frame.
+        sum_sq (np.ndarray): Sum of the squared samples per frame.
+    """
+
+    def __init__(self, freq, power, count, sum, sum_sq):
+        self.freq = freq
+        self.power = power
+        self.count = count
+        self.sum = sum
+        self.sum_sq = sum_sq
+
+    @classmethod
+    def from_band_energy(cls, energy: BandEnergy):
+        """Frame energies from the energies accumulated per frame (one
+        label per frame)."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            power = np.nan_to_num(energy.energy / energy.samples)
+
+        return cls(list(energy.freq), power.astype(np.float32),
+                   energy.count.copy(), energy._sum.copy(),
+                   energy._sum_sq.copy())
+
+    def __len__(self):
+        return len(self.count)
+
+    def __getitem__(self, key: slice):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError('FrameEnergy only supports slices with step 1')
+
+        return FrameEnergy(self.freq, self.power[key], self.count[key],
+                           self.sum[key], self.sum_sq[key])
+
+    def regroup(self, groups: np.ndarray, num_of_groups: int,
+                settle: np.ndarray = None):
+        """Sums the frames into groups.
+
+        Args:
+            groups (np.ndarray): Group of every frame (e.g., its grid
+                cell). Frames with a negative group are left out.
+            num_of_groups (int): Number of groups.
+            settle (np.ndarray, optional): Frames per band to leave out of
+                the band power after every change of group, while the
+                filters still carry the audio of the previous one (see
+                settling_time). If that leaves a group without frames in a
+                band, all of them are used. Defaults to None => every frame
+                is used.
+
+        Returns:
+            FrameEnergy: One row per group.
+        """
+        groups = np.asarray(groups)
+        valid = groups >= 0
+        index = groups[valid]
+        count = np.asarray(self.count)[valid]
+        power = np.asarray(self.power)[valid]
+
+        def total(values):
+            result = np.zeros((num_of_groups,) + values.shape[1:])
+            np.add.at(result, index, values)
+            return result
+
+        counts = total(count)
+        weighted = total(power * count[:, None])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = weighted / counts[:, None]
+
+            if settle is not None:
+                # Frames since the last change of group
+                first = np.zeros(len(groups), dtype=int)
+                changes = np.flatnonzero(np.diff(groups)) + 1
+                first[changes] = changes
+                since = np.arange(len(groups)) - \
+                    np.maximum.accumulate(first)
+
+                weights = count[:, None] * (since[valid, None] >=
+                                            np.asarray(settle)[None, :])
+                settled = total(weights)
+                mean = np.where(settled > 0,
+                                total(power * weights) / settled, mean)
+
+        return FrameEnergy(self.freq, np.nan_to_num(mean).astype(np.float32),
+                           counts, total(np.asarray(self.sum)[valid]),
+                           total(np.asarray(self.sum_sq)[valid]))
+
+    def spl(self) -> np.ndarray:
+        """Band levels per row, in dB, scaled by WINDOW_POWER to be
+        comparable with get_spectrum. NaN for the rows without samples."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            power = np.where(np.asarray(self.count)[:, None] > 0,
+                             self.power * WINDOW_POWER, np.nan)
+            return 10 * np.log10(power / 2e-5**2)
+
+    def full_band(self) -> np.ndarray:
+        """Full band level (standard deviation of the signal) per row, in
+        dB. NaN for the rows without samples."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = self.sum / self.count
+            var = self.sum_sq / self.count - mean**2
+            return 10 * np.log10(np.maximum(var, 0) / 2e-5**2)
+
+    def save(self, path: str, name: str, **header) -> None:
+        """Saves the frame energies as a bundle (see fileutils.save_bundle).
+        """
+        fileutils.save_bundle({'power': self.power,
+                               'count': self.count,
+                               'sum': self.sum,
+                               'sum_sq': self.sum_sq},
+                              path, name, freq=list(map(float, self.freq)),
+                              **header)
+
+    @classmethod
+    def load(cls, path: str, name: str, mmap=True):
+        """Loads frame energies saved with save.
+
+        Args:
+            path (str): the path to the folder
+            name (str): the name of the bundle
+            mmap (bool, optional): Memory-map the arrays. Defaults to True.
+
+        Returns:
+            FrameEnergy: None if there is no such bundle.
+        """
+        bundle = fileutils.load_bundle(path, name, mmap)
+        if bundle is None:
+            return None
+
+        data, header = bundle
+        return cls(header['freq'], data['power'], data['count'],
+                   data['sum'], data['sum_sq'])
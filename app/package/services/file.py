@@ -2,6 +2,7 @@
 """
 
 import os
+import json
 import numpy as np
 from . import file as fileutils
 
@@ -24,6 +25,60 @@ def save_np_to_txt(data: np.ndarray, path: str, file_name="data.txt"):
     np.savetxt(file_path, data)
 
 
+def save_bundle(data: dict, path: str, name: str, **header) -> None:
+    """Save a set of NumPy ndarrays to disk, in binary form.
+
+    Every array is written as a .npy file ('name.key.npy') and a small
+    JSON header ('name.json') lists them, along with any other value
+    passed in header. The header is written last, so a bundle without it
+    is incomplete.
+
+    Args:
+        data (dict): the arrays to save, by name
+        path (str): the path to the folder
+        name (str): the name of the bundle
+        **header: JSON serializable values to save in the header
+    """
+
+    fileutils.mkdir(path)
+
+    for key, array in data.items():
+        np.save(os.path.join(path, f'{name}.{key}.npy'), np.asarray(array))
+
+    header = dict(header, arrays=list(data))
+    with open(os.path.join(path, f'{name}.json'), 'w') as f:
+        json.dump(header, f)
+
+
+def load_bundle(path: str, name: str, mmap=False):
+    """Load a bundle saved with save_bundle.
+
+    Args:
+        path (str): the path to the folder
+        name (str): the name of the bundle
+        mmap (bool, optional): Memory-map the arrays (read only) instead
+            of reading them. Defaults to False.
+
+    Returns:
+        tuple[dict, dict]: the arrays and the header. None if there is no
+            such bundle in the folder.
+    """
+
+    header_path = os.path.join(path, f'{name}.json')
+    if not os.path.isfile(header_path):
+        return None
+
+    with open(header_path) as f:
+        header = json.load(f)
+
+    data = {}
+    for key in header.pop('arrays'):
+        data[key] = np.load(os.path.join(path, f'{name}.{key}.npy'),
+                            mmap_mode='r' if mmap else None)
+
+    return data, header
+
+
 def check_for_existance(path) -> tuple:
     """Checks for existance of a file or a dir
 
@@ -27,8 +27,11 @@ class Grid:
             divisions in the grid system
         ver_div (np.ndarray): List containing the values for vertical
             divisions in the grid system
+        OUTSIDE (int): Row and column given to the points out of the grid.
     """
 
+    OUTSIDE = -1
+
     def __init__(self,
                  size_of_frame: np.ndarray,
                  number_of_rows: int,
@@ -101,21 +104,39 @@ class Grid:
             np.ndarray: Grid the point is at, in the form of a np.ndarray
         """
 
-        point_grid_coords = np.array([point[1], point[0]])
-        point_grid_coords -= self.padding_coords
-
-        result = np.floor(point_grid_coords / self.region_size).astype(int)
+        rows, cols = self.locate_points([point[0]], [point[1]])
 
-        # TODO: this can be simplified => using boolean indexes to acces
-        # TODO: the array.
-        if result[0] >= self.number_of_rows:
-            return None
-        if result[1] >= self.number_of_cols:
-            return None
-        if (result < 0).any():
+        if rows[0] == self.OUTSIDE:
             return None
 
-        return result
+        return np.array([rows[0], cols[0]])
+
+    def locate_points(self, xs: np.ndarray, ys: np.ndarray) -> tuple:
+        """Vectorized version of locate_point, for arrays of points.
+
+        Args:
+            xs (np.ndarray): Horizontal coordinates of the points.
+            ys (np.ndarray): Vertical coordinates of the points.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Row and column of every point.
+                Both are Grid.OUTSIDE for the points out of the grid
+                (padding zone included) and for NaN coordinates.
+        """
+
+        rows = np.floor((np.asarray(ys, dtype=float) - self.padding_coords[0])
+                        / self.region_size[0])
+        cols = np.floor((np.asarray(xs, dtype=float) - self.padding_coords[1])
+                        / self.region_size[1])
+
+        # Comparisons with NaN are False => NaN points are outside
+        inside = ((rows >= 0) & (rows < self.number_of_rows) &
+                  (cols >= 0) & (cols < self.number_of_cols))
+
+        rows = np.where(inside, rows, self.OUTSIDE).astype(int)
+        cols = np.where(inside, cols, self.OUTSIDE).astype(int)
+
+        return rows, cols
 
     def get_region(self, region):
         """Returns the points that define a region in the grid.
@@ -173,3 +194,29 @@ class Grid:
             cv2.line(_big_frame, start_point, end_point, color, thickness)
 
         return resize(_big_frame, width=w)
+
+    def draw_scaled_grid(self, frame, color=(180, 180, 180), thickness=1):
+        """Draws the grid in a resized image, at its resolution (without
+        resizing it back to the size of the frame, as draw_grid does).
+
+        Args:
+            frame (np.ndarray): Image, resized from the frame.
+            color (tuple, optional): COlor in rgb. Defaults to (180, 180, 180).
+            thickness (int, optional): Thickness of the lines. Defaults to 1.
+
+        Returns:
+            np.ndarray: The image with the grid on it.
+        """
+        scale = frame.shape[1] / self.size_of_frame[1]
+        pad = int(self.padding * scale)
+        h, w = frame.shape[:2]
+
+        for div in self.hor_div:
+            div = int(div * scale)
+            cv2.line(frame, (pad, div), (w - 1 - pad, div), color, thickness)
+
+        for div in self.ver_div:
+            div = int(div * scale)
+            cv2.line(frame, (div, pad), (div, h - 1 - pad), color, thickness)
+
+        return frame
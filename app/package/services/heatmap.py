@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""Rendering of the level map of the results over the background image.
+
+Every cell of the grid is tinted with the color of its level, with a
+single LUT lookup for the whole grid. The (rows x cols) color image is
+then upsampled to the resolution of the image (nearest neighbour, with
+the regions of Grid.get_region) and blended in one go, so the cost does
+not depend on the number of cells.
+
+MapRenderer caches what does not change between renders: the background
+with the grid, at the size it is displayed, and the map of every band.
+"""
+
+import cv2
+import numpy as np
+
+from .grid import Grid
+from .imbasic import resize
+
+__all__ = ['create_color_map', 'color_index', 'pixel_cells', 'upsample',
+           'draw_map', 'MapRenderer']
+
+NO_COLOR = -1
+
+
+def create_color_map(color0=(255, 0, 0), color1=(0, 0, 255), n=100):
+    """LUT from color0 (lowest level) to color1 (highest), in BGR."""
+    return np.linspace(color0, color1, n, dtype=np.uint8)
+
+
+def color_index(spl, min_db: float, max_db: float, n: int) -> np.ndarray:
+    """Index in a LUT of n colors of every level.
+
+    Args:
+        spl (np.ndarray): Levels of the cells, in dB. NaN for the cells
+            without audio. Size: [rows, cols]
+        min_db (float): Level of the first color.
+        max_db (float): Level of the last color.
+        n (int): Colors of the LUT.
+
+    Returns:
+        np.ndarray: Index of every cell, NO_COLOR for the NaN ones.
+    """
+
+    spl = np.asarray(spl, dtype=float)
+    valid = np.isfinite(spl)
+
+    index = np.zeros(spl.shape, dtype=int)
+    # int() truncates towards 0
+    index[valid] = np.trunc((spl[valid] - min_db) * n / (max_db - min_db))
+    index = np.clip(index - 1, 0, n - 1)
+
+    return np.where(valid, index, NO_COLOR)
+
+
+def pixel_cells(grid: Grid, shape: tuple) -> tuple:
+    """Cell of every row and column of pixels of an image of the frame of
+    the grid (it may be resized).
+
+    The cells are those of Grid.get_region, in full resolution. A pixel of
+    a resized image belongs to the cell of its center.
+
+    Args:
+        grid (Grid): the grid.
+        shape (tuple): Shape of the image, (height, width, ...).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Row of every row of pixels and
+            column of every column of pixels, Grid.OUTSIDE for the pixels
+            out of the grid.
+    """
+
+    cells = []
+    for axis, (n, size) in enumerate(zip([grid.number_of_rows,
+                                          grid.number_of_cols],
+                                         shape[:2])):
+        edges = (grid.region_size[axis] * np.arange(n + 1) +
+                 grid.padding_coords[axis]).astype(int)
+        centers = (np.arange(size) + 0.5) * grid.size_of_frame[axis] / size
+
+        cell = np.searchsorted(edges, centers, side='right') - 1
+        cells.append(np.where((cell >= 0) & (cell < n), cell, Grid.OUTSIDE))
+
+    return tuple(cells)
+
+
+def upsample(cells: np.ndarray, rows: np.ndarray, cols: np.ndarray):
+    """Image with the value of its cell in every pixel (see pixel_cells)."""
+    # Columns first: the rows are then copied whole
+    return np.take(np.take(cells, cols, axis=1), rows, axis=0)
+
+
+def draw_map(img: np.ndarray, spl, grid: Grid, lut: np.ndarray,
+             min_db: float, max_db: float, alpha: float = 0.6,
+             cells: tuple = None) -> np.ndarray:
+    """Blends the color of the level of every cell into an image, in place.
+
+    Args:
+        img (np.ndarray): Image of the frame of the grid, at any size.
+        spl (np.ndarray): Levels of the cells, in dB. NaN for the cells
+            without audio (they are not drawn). Size: [rows, cols]
+        grid (Grid): the grid.
+        lut (np.ndarray): Colors, from the lowest level to the highest.
+        min_db (float): Level of the first color.
+        max_db (float): Level of the last color.
+        alpha (float, optional): Opacity of the colors. Defaults to 0.6.
+        cells (tuple, optional): pixel_cells of the image, if known.
+
+    Returns:
+        np.ndarray: the image, with the map.
+    """
+
+    if cells is None:
+        cells = pixel_cells(grid, img.shape)
+
+    color, mask = map_layer(spl, lut, min_db, max_db, cells)
+    return blend(img, color, mask, alpha)
+
+
+def map_layer(spl, lut: np.ndarray, min_db: float, max_db: float,
+              cells: tuple) -> tuple:
+    """Color of every pixel of the map, and where it is drawn (see
+    draw_map).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The colors and the mask (uint8).
+    """
+
+    rows, cols = cells
+
+    index = color_index(spl, min_db, max_db, len(lut))
+    # One more row and column (the last ones) for the pixels outside
+    index = np.pad(index, ((0, 1), (0, 1)), constant_values=NO_COLOR)
+
+    # Cell images => image size (nearest neighbour)
+    color = upsample(lut[index], rows, cols)
+    mask = upsample((index != NO_COLOR).astype(np.uint8), rows, cols)
+
+    return color, mask
+
+
+def blend(img: np.ndarray, color: np.ndarray, mask: np.ndarray,
+          alpha: float) -> np.ndarray:
+    """Blends color into img where mask is set, in place."""
+    blended = cv2.addWeighted(img, 1 - alpha, color, alpha, 0.0)
+    cv2.copyTo(blended, mask, img)
+
+    return img
+
+
+class MapRenderer:
+    """Render cache of the map of the results over the background image.
+
+    The base layer (the background resized to the display width, with the
+    grid) is only rebuilt when the background, the width or the grid
+    change. The map of every band is computed once, at display size, and
+    kept until the levels change (see clear_maps). Rendering is then a
+    copy of the base layer and one blend.
+
+    Args:
+        lut (np.ndarray): Colors, from the lowest level to the highest.
+        alpha (float, optional): Opacity of the map. Defaults to 0.6.
+
+    Attributes:
+        scale_factor (float): Display size / size of the background.
+    """
+
+    def __init__(self, lut: np.ndarray, alpha: float = 0.6):
+        self.lut = lut
+        self.alpha = alpha
+        self.scale_factor = -1
+
+        self._background = None
+        self._base = None
+        self._base_key = None
+        self._cells = None
+        self._maps = {}
+
+    def set_background(self, img: np.ndarray) -> None:
+        self._background = img
+        self._base_key = None
+
+    def clear_maps(self) -> None:
+        """Forgets the maps of the bands: call it when the levels change."""
+        self._maps = {}
+
+    def base(self, grid: Grid, width: int) -> np.ndarray:
+        """Background at the display width, with the grid (cached). Do not
+        modify it."""
+
+        key = (int(width), *grid.size_of_frame, grid.number_of_rows,
+               grid.number_of_cols, grid.padding)
+        if key != self._base_key:
+            self._base, self.scale_factor = resize(
+                self._background, width=int(width), return_scale_factor=True)
+            grid.draw_scaled_grid(self._base)
+            self._cells = pixel_cells(grid, self._base.shape)
+            self._base_key = key
+            self._maps = {}
+
+        return self._base
+
+    def render(self, grid: Grid, width: int, band, spl,
+               min_db: float, max_db: float) -> np.ndarray:
+        """Image of the map of a band over the background.
+
+        Args:
+            grid (Grid): the grid.
+            width (int): Display width.
+            band: Key of the map of spl (the index of the band), to reuse
+                it. None to not draw any map.
+            spl (np.ndarray): Levels of the cells, in dB (see draw_map).
+            min_db (float): Level of the first color.
+            max_db (float): Level of the last color.
+
+        Returns:
+            np.ndarray: a new image, of the display width.
+        """
+
+        img = self.base(grid, width).copy()
+        if band is None or spl is None:
+            return img
+
+        key = (band, min_db, max_db)
+        if key not in self._maps:
+            self._maps[key] = map_layer(spl, self.lut, min_db, max_db,
+                                        self._cells)
+
+        return blend(img, *self._maps[key], self.alpha)
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""Real-time analysis of the recording, per grid cell.
+
+While scanning, the microphone worker feeds every audio block to a
+:class:`LiveSpectrum`, and the camera thread tells it which grid cell the
+microphone is in. The band energies of each cell are accumulated as the
+audio arrives (see dsp.BandEnergy), so a level map is available during
+the recording, long before the offline analysis of DspThread.
+"""
+
+import queue
+import threading
+import numpy as np
+from time import perf_counter
+
+from ..models.ActualProjectModel import ActualProjectModel
+from . import dsp
+
+__all__ = ['LiveSpectrum', 'calibration_gain']
+
+
+def calibration_gain(channels: int) -> float:
+    """Gain applied to the sum of the channels of the recording, as
+    DspThread.calibrate_audio does: -6 dB for stereo, and the calibration
+    of the project, if any.
+
+    Args:
+        channels (int): Channels of the recording (see
+            MicWorker.config_mic).
+    """
+
+    gain = np.power(10, -6/20) if channels == 2 else 1.0
+
+    expected = ActualProjectModel.calibration['expected']
+    actual = ActualProjectModel.calibration['actual']
+    if expected != -1 and actual != -1:
+        gain *= np.power(10, (expected - actual)/20)
+
+    return gain
+
+
+class LiveSpectrum:
+    """Running spectrum and level of every grid cell.
+
+    It is shared by two threads: the one that produces the audio (add)
+    and the one that knows the position of the microphone (set_cell).
+    Both are timestamped in the same clock (time.perf_counter): the
+    position thread records the cell of the microphone at every time, and
+    every audio sample goes to the cell at its own time, no matter how
+    late each thread delivers its data. The samples are filtered in
+    batches of at least min_block samples, which keeps the cost per
+    sample low enough for real time with the small blocks of the audio
+    device.
+
+    The recorder should not filter the audio itself: put queues the blocks
+    for a thread of the analysis (see start), and drops them if it falls
+    behind. The blocks keep their time, so the rest are still assigned to
+    their cells.
+
+    Args:
+        fs (int): sampling rate
+        limits (list): Limits for the frequency spectrum analysis.
+        rows (int): Rows of the grid.
+        cols (int): Columns of the grid.
+        gain (float, optional): Applied to the sum of the channels.
+            Defaults to 1.
+
+    Attributes:
+        cell (int): Last grid cell (row * cols + col) of the microphone,
+            -1 if it is unknown or outside the grid.
+        min_block (int): Samples filtered at once.
+        max_lag (float): Seconds of audio held back waiting for the
+            positions of its time. Beyond that, it is assigned to the last
+            known cell. The pending audio is kept in a buffer of that size,
+            allocated once.
+        queue_size (int): Blocks queued for the thread of the analysis.
+        dropped (int): Samples not analyzed because the queue was full.
+    """
+
+    min_block = 4096
+    max_lag = 1.0
+    queue_size = 64
+
+    def __init__(self, fs: int, limits: list, rows: int, cols: int,
+                 gain: float = 1.0):
+        self.fs = fs
+        self.rows = rows
+        self.cols = cols
+        self.gain = gain
+        self.cell = -1
+
+        self._energy = dsp.BandEnergy(fs, limits, rows*cols)
+        self._lock = threading.Lock()
+
+        # Cell of the microphone from every time on, in time order. Only
+        # the entries the pending audio may need are kept
+        self._cell_lock = threading.Lock()
+        self._cell_times = []
+        self._cells = []
+
+        # Pending audio (mono, with the gain), and the time of its first
+        # sample: consecutive samples are 1/fs apart. None => added
+        # without time, with the cell of every sample in _labels
+        self._capacity = max(int(self.max_lag * fs), self.min_block)
+        self._buffer = np.empty(self._capacity)
+        self._labels = np.empty(self._capacity, dtype=int)
+        self._pending = 0
+        self._start = None
+
+        self._queue = None
+        self._thread = None
+        self.dropped = 0
+
+    @property
+    def freq(self) -> list:
+        return self._energy.freq
+
+    def set_cell(self, row: int, col: int, time: float = None) -> None:
+        """Sets the cell of the microphone. None => outside the grid.
+
+        Args:
+            row (int): Row of the cell.
+            col (int): Column of the cell.
+            time (float, optional): time.perf_counter from which the
+                microphone is in the cell (e.g., the capture time of the
+                frame). Never earlier than the one of the previous call.
+                Defaults to None => now.
+        """
+        if row is None or col is None:
+            cell = -1
+        else:
+            cell = int(row) * self.cols + int(col)
+
+        if time is None:
+            time = perf_counter()
+
+        self.cell = cell
+        with self._cell_lock:
+            self._cell_times.append(time)
+            self._cells.append(cell)
+
+    def cells_at(self, times: np.ndarray) -> np.ndarray:
+        """Cell of the microphone at every time (see set_cell). -1 before
+        the first position."""
+        with self._cell_lock:
+            cell_times = np.array(self._cell_times)
+            cells = np.array(self._cells, dtype=int)
+
+        index = np.searchsorted(cell_times, times, side='right') - 1
+        if len(cells) == 0:
+            return np.full(len(index), -1)
+        return np.where(index >= 0, cells[np.maximum(index, 0)], -1)
+
+    def start(self) -> None:
+        """Starts the thread that analyzes the blocks of put."""
+        self._queue = queue.Queue(self.queue_size)
+        self._thread = threading.Thread(target=self._consume, daemon=True,
+                                        name='LiveSpectrum')
+        self._thread.start()
+
+    def put(self, block: np.ndarray, time: float = None) -> bool:
+        """Queues a copy of a block for the thread of the analysis (see
+        add), which is started if it is not running. Never waits.
+
+        Returns:
+            bool: False if the queue was full: the block is dropped.
+        """
+        if self._thread is None:
+            self.start()
+
+        try:
+            self._queue.put_nowait((np.array(block), time))
+        except queue.Full:
+            self.dropped += len(block)
+            return False
+        return True
+
+    def stop(self) -> None:
+        """Analyzes the queued blocks and the pending audio, and ends the
+        thread of the analysis."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _consume(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            self.add(*item)
+
+    def add(self, block: np.ndarray, time: float = None) -> None:
+        """Adds the next audio block, (frames x channels) or 1-D.
+
+        Args:
+            block (np.ndarray): The samples.
+            time (float, optional): time.perf_counter of the first sample.
+                Every sample goes to the cell of the microphone at its time
+                (see set_cell). Defaults to None => the whole block goes to
+                the current cell.
+        """
+        timed = time is not None
+        if self._pending > 0 and timed != (self._start is not None):
+            # Either every pending sample has a time or none has
+            self.flush()
+
+        length = len(block)
+        if length > self._capacity:
+            for first in range(0, length, self._capacity):
+                self.add(block[first:first+self._capacity],
+                         time + first / self.fs if timed else None)
+            return
+
+        if self._pending + length > self._capacity:
+            # More than max_lag waiting
+            self.flush()
+        if self._pending == 0:
+            self._start = time
+
+        end = self._pending + length
+        pending = self._buffer[self._pending:end]
+        if np.ndim(block) == 2:
+            np.sum(block, axis=1, out=pending)
+        else:
+            pending[:] = block
+        pending *= self.gain
+        if not timed:
+            self._labels[self._pending:end] = self.cell
+        self._pending = end
+
+        if self._pending >= self.min_block:
+            self._release(wait=True)
+
+    def flush(self) -> None:
+        """Filters all the pending audio, with the cells known so far."""
+        self._release(wait=False)
+
+    def _release(self, wait: bool) -> None:
+        """Filters the pending audio whose cell is known.
+
+        Args:
+            wait (bool): Keep pending the audio later than the last
+                position, unless there are at least min_block samples
+                known. False => filter all of it.
+        """
+        pending = self._pending
+        if pending == 0:
+            return
+
+        ready = pending
+        if wait and self._start is not None:
+            with self._cell_lock:
+                last = self._cell_times[-1] if self._cell_times else None
+            # Samples up to the last position: start + i / fs <= last
+            known = (0 if last is None or last < self._start else
+                     int((last - self._start) * self.fs) + 1)
+            ready = min(known, pending)
+            if ready < self.min_block:
+                return
+
+        if self._start is None:
+            labels = self._labels[:ready]
+        else:
+            # Only the released samples are looked up
+            labels = self.cells_at(self._start +
+                                   np.arange(ready) / self.fs)
+
+        with self._lock:
+            self._energy.add(self._buffer[:ready], labels)
+
+        # The rest moves to the front of the buffer
+        rest = pending - ready
+        self._buffer[:rest] = self._buffer[ready:pending]
+        if self._start is None:
+            self._labels[:rest] = self._labels[ready:pending]
+        else:
+            released = self._start + (ready - 1) / self.fs
+            self._start += ready / self.fs
+            self._forget(released)
+        self._pending = rest
+
+    def _forget(self, time: float) -> None:
+        """Drops the positions before time, but the one at time."""
+        with self._cell_lock:
+            first = np.searchsorted(self._cell_times, time,
+                                    side='right') - 1
+            if first > 0:
+                del self._cell_times[:first]
+                del self._cells[:first]
+
+    def spl(self) -> np.ndarray:
+        """Band levels of every cell so far, (rows x cols x bands), in dB.
+        NaN for the cells without audio."""
+        with self._lock:
+            spl = self._energy.spl()
+        return spl.reshape(self.rows, self.cols, -1)
+
+    def full_band(self) -> np.ndarray:
+        """Full band level of every cell so far, (rows x cols), in dB. NaN
+        for the cells without audio."""
+        with self._lock:
+            full_band = self._energy.full_band()
+        return full_band.reshape(self.rows, self.cols)
+
+    def seconds(self) -> np.ndarray:
+        """Time of audio analyzed in every cell, (rows x cols)."""
+        with self._lock:
+            count = self._energy.count.copy()
+        return count.reshape(self.rows, self.cols) / self.fs
@@ -1,7 +1,6 @@
 import os
 import numpy as np
 import cv2
-from scipy.io import wavfile
 
 from PySide2.QtCore import QObject, Signal
 
@@ -10,6 +9,7 @@ from ..models.DisplayResultsModel import DisplayResultsModel
 
 
 from ..services import file as fileutils
+from ..services.wav import WavAudio
 
 
 class LoadFilesWorker(QObject):
@@ -44,7 +44,8 @@ class LoadFilesWorker(QObject):
             # We have to move data from 'ActualProjectModel' to the
             # DisplayResultsModel.
             self.send_data.emit((ActualProjectModel.data_x,
-                                ActualProjectModel.data_y))
+                                ActualProjectModel.data_y,
+                                ActualProjectModel.data_t))
             self.send_grid.emit(ActualProjectModel.grid)
 
         self.send_freq_range.emit(
@@ -66,15 +67,10 @@ class LoadFilesWorker(QObject):
         if not isFile:
             raise Exception('Path exists but is not a file.')
 
-        fs, data = wavfile.read(file_path)
-
-        if not type(data) == np.ndarray:
-            raise Exception('Empty file!')
-
-        if (data.dtype == np.int16):
-            data = data.astype(np.float32) / 2**(16-1)
-        else:
-            raise Exception('Wav file format error!')
+        # Memory-mapped: samples are converted to float32 only when the
+        # DSP pipeline reads them
+        data = WavAudio(file_path)
+        fs = data.fs
 
         print(data.shape)
 
@@ -84,23 +80,40 @@ class LoadFilesWorker(QObject):
         model.audio_data = data
         model.audio_fs = fs
 
+        # Time of the audio blocks: not in older projects
+        bundle = fileutils.load_bundle(
+            os.path.join(project_path, 'Audio Files'), 'timestamps')
+        if bundle is not None:
+            times, _ = bundle
+            model.audio_times = (times['sample'], times['time'])
+        else:
+            model.audio_times = None
+
     def load_position_data(self, project_path: str):
         self.log('Loading position from file...')
 
         data_dir = os.path.join(project_path, 'Position Data')
-        files_path = [os.path.join(data_dir, 'data.x'),
-                      os.path.join(data_dir, 'data.y'),
-                      os.path.join(data_dir, 'grid.config')]
 
         try:
-            _x = np.loadtxt(files_path[0])
-            _y = np.loadtxt(files_path[1])
-            rows, cols, padding = np.loadtxt(files_path[2])
+            bundle = fileutils.load_bundle(data_dir, 'position')
+
+            # Capture time of the frames: not in older projects
+            _t = np.array([])
+
+            if bundle is not None:
+                data, header = bundle
+                _x, _y = data['x'], data['y']
+                _t = data.get('t', _t)
+                rows, cols, padding = header['grid']
+            else:
+                # Projects saved as text files
+                _x, _y, (rows, cols, padding) = \
+                    self.load_position_data_txt(data_dir)
 
             if len(_x) == 0 or len(_y) == 0:
                 raise FileNotFoundError('File is empty')
 
-            self.send_data.emit((_x, _y))
+            self.send_data.emit((_x, _y, _t))
             self.send_grid.emit([rows, cols, padding])
 
         except FileNotFoundError:
@@ -108,14 +121,33 @@ class LoadFilesWorker(QObject):
         except Exception as e:
             raise Exception(f'Could not read position from files: {e}')
 
+    @staticmethod
+    def load_position_data_txt(data_dir: str) -> tuple:
+        files_path = [os.path.join(data_dir, 'data.x'),
+                      os.path.join(data_dir, 'data.y'),
+                      os.path.join(data_dir, 'grid.config')]
+
+        return (np.loadtxt(files_path[0]),
+                np.loadtxt(files_path[1]),
+                np.loadtxt(files_path[2]))
+
     def load_frame_size(self, project_path: str, model: DisplayResultsModel):
         self.log('Loading frame size from file...')
 
         data_dir = os.path.join(project_path, 'Position Data')
-        files_path = os.path.join(data_dir, 'camera.data')
 
         try:
-            width, height, fps = np.loadtxt(files_path)
+            bundle = fileutils.load_bundle(data_dir, 'camera')
+
+            if bundle is not None:
+                _, header = bundle
+                width, height = header['frame_size']
+                fps = header['fps']
+            else:
+                # Projects saved as text files
+                width, height, fps = np.loadtxt(
+                    os.path.join(data_dir, 'camera.data'))
+
             model.frame_size = [width, height]
             model.fps = fps
         except FileNotFoundError:
@@ -6,7 +6,8 @@ Created on Fri Feb 26 13:06:42 2021
 """
 
 import cv2
-from . import ColorSegmentation as cs
+import numpy as np
+from . import colorSegmentation as cs
 from .imbasic import resize
 
 # TODO: move to own config file
@@ -21,17 +22,213 @@ def improve_mask(mask, operation, morph_type=cv2.MORPH_ELLIPSE, size=(3, 3)):
     return opened
 
 
-def get_mask(frame, openSize=3, closeSize=15):
-    w = frame.shape[1]
-    frame = resize(frame, width=700)
+def get_scaled_mask(frame, scale, openSize=3, closeSize=15):
+    """Mask of the tracking color of a frame, downscaled by scale.
+
+    The morphology sizes are in pixels of the downscaled frame.
+    """
+    frame = cv2.resize(frame, None, fx=scale, fy=scale)
     mask = cs.getColorMask(frame, BOTTOM_HSV_THRES, TOP_HSV_THRES)
     mask = improve_mask(mask, cv2.MORPH_OPEN,
                         cv2.MORPH_ELLIPSE, (openSize, openSize))
     mask = improve_mask(mask, cv2.MORPH_CLOSE,
                         cv2.MORPH_ELLIPSE, (closeSize, closeSize))
 
+    return mask
+
+
+def get_mask(frame, openSize=3, closeSize=15):
+    w = frame.shape[1]
+    mask = get_scaled_mask(frame, 700/w, openSize, closeSize)
+
     return resize(mask, width=w)
 
 
-def get_circles(mask, dp=3, minDist=150):
-    return cv2.HoughCircles(mask, cv2.HOUGH_GRADIENT, dp=dp, minDist=minDist)
+def get_circles(mask, dp=3, minDist=150, votes=100, minRadius=0,
+                maxRadius=0):
+    return cv2.HoughCircles(mask, cv2.HOUGH_GRADIENT, dp=dp, minDist=minDist,
+                            param2=votes, minRadius=minRadius,
+                            maxRadius=maxRadius)
+
+
+def get_blobs(mask, minArea=10):
+    """Circles of the blobs of a mask, from its connected components.
+
+    Much cheaper than get_circles: a single pass over the mask. The center
+    of each blob is its centroid, with sub-pixel precision, and the radius
+    is that of a disc with the same area.
+
+    Args:
+        mask (np.ndarray): Binary mask, as getColorMask returns.
+        minArea (int, optional): Smaller blobs are ignored (noise).
+            Defaults to 10.
+
+    Returns:
+        tuple: Circles in the format of get_circles, the largest first, and
+            the confidence of each one, from 0 to 1: the area of the blob
+            over the area of the circle around its bounding box (1 for a
+            disc). (None, None) if there are no blobs.
+    """
+    _, _, stats, centroids = cv2.connectedComponentsWithStats(mask)
+
+    # Label 0 is the background
+    stats, centroids = stats[1:], centroids[1:]
+    area = stats[:, cv2.CC_STAT_AREA]
+    keep = np.flatnonzero(area >= minArea)
+    if len(keep) == 0:
+        return None, None
+
+    keep = keep[np.argsort(area[keep])[::-1]]
+    area = area[keep].astype(np.float32)
+    side = np.maximum(stats[keep, cv2.CC_STAT_WIDTH],
+                      stats[keep, cv2.CC_STAT_HEIGHT])
+
+    circles = np.empty((1, len(keep), 3), dtype=np.float32)
+    circles[0, :, :2] = centroids[keep]
+    circles[0, :, 2] = np.sqrt(area / np.pi)
+    confidence = np.clip(area / (np.pi * (side / 2)**2), 0, 1)
+
+    return circles, confidence
+
+
+class MarkerTracker:
+    """Locates the microphone marker frame after frame.
+
+    get_mask and get_circles search the whole frame, and run Hough over a
+    full resolution mask. The tracker runs both on a downscaled copy (the
+    full frame scaled to work_width, as get_mask does) and maps the
+    circles back to full resolution. The votes a circle needs scale with
+    the mask, since its edges are shorter. Once the marker is found, only
+    a region of interest around its last position is searched, for
+    circles of a similar radius. If the marker is not there (it is lost),
+    the whole frame is searched again.
+
+    The circles come from one of two detectors: 'hough' (get_circles) or
+    'blobs' (get_blobs, faster, and with a confidence for every circle).
+
+    Args:
+        openSize (int, optional): See get_mask. Defaults to 3.
+        closeSize (int, optional): See get_mask. Defaults to 15.
+        dp (int, optional): See get_circles. Defaults to 3.
+        minDist (int, optional): See get_circles, in full resolution
+            pixels. Defaults to 150.
+        votes (int, optional): See get_circles, for a full resolution
+            mask. Defaults to 100.
+        detector (str, optional): 'hough' or 'blobs'. Defaults to 'hough'.
+        minArea (int, optional): See get_blobs, in full resolution pixels.
+            Defaults to 100.
+
+    Attributes:
+        work_width (int): Width of the full frame once downscaled.
+        roi_factor (float): Half the side of the region of interest, in
+            radii of the last circle.
+        min_roi (int): Minimum half side of the region of interest, in full
+            resolution pixels.
+        radius_range (tuple): Radii searched in the region of interest,
+            relative to the radius of the last circle.
+        position (np.ndarray): Last circle found (x, y, r), in full
+            resolution. None if the marker is lost.
+        confidence (np.ndarray): Confidence of the last circles found (see
+            get_blobs). None for the 'hough' detector.
+    """
+
+    work_width = 700
+    roi_factor = 3
+    min_roi = 64
+    radius_range = (0.5, 1.5)
+    detectors = ('hough', 'blobs')
+
+    def __init__(self, openSize=3, closeSize=15, dp=3, minDist=150,
+                 votes=100, detector='hough', minArea=100):
+        if detector not in self.detectors:
+            raise ValueError(f'Unknown detector: {detector}. '
+                             f'Use one of {self.detectors}')
+
+        self.open_size = openSize
+        self.close_size = closeSize
+        self.dp = dp
+        self.min_dist = minDist
+        self.votes = votes
+        self.detector = detector
+        self.min_area = minArea
+        self.position = None
+        self.confidence = None
+
+    def reset(self) -> None:
+        """Forgets the last position: the next search covers the whole
+        frame."""
+        self.position = None
+        self.confidence = None
+
+    def get_roi(self, shape) -> tuple:
+        """Region of interest around the last position, (x0, y0, x1, y1),
+        clipped to a frame of the given shape."""
+        x, y, r = self.position
+        half = max(self.roi_factor * r, self.min_roi)
+        h, w = shape[:2]
+
+        return (int(max(x - half, 0)), int(max(y - half, 0)),
+                int(min(x + half, w)), int(min(y + half, h)))
+
+    def search(self, frame, scale, x0=0, y0=0, radius=None):
+        """Circles in frame, in its coordinates plus (x0, y0). If radius is
+        given, only circles of a similar radius."""
+        mask = get_scaled_mask(frame, scale, self.open_size, self.close_size)
+
+        if self.detector == 'hough':
+            radii = (0, 0)
+            if radius is not None:
+                radii = [max(int(f * radius * scale), 1)
+                         for f in self.radius_range]
+
+            self.confidence = None
+            circles = get_circles(mask, self.dp, self.min_dist * scale,
+                                  self.votes * scale, *radii)
+        else:
+            circles, self.confidence = get_blobs(mask,
+                                                 self.min_area * scale**2)
+            if circles is not None and radius is not None:
+                low, high = [f * radius * scale for f in self.radius_range]
+                r = circles[0, :, 2]
+                similar = (r >= low) & (r <= high)
+                circles = circles[:, similar] if similar.any() else None
+                self.confidence = self.confidence[similar]
+
+        if circles is None:
+            return None
+
+        # Pixel centers of the downscaled mask => full resolution
+        circles = circles / scale
+        circles[..., :2] += (0.5 / scale - 0.5)
+        circles[..., 0] += x0
+        circles[..., 1] += y0
+        return circles
+
+    def locate(self, frame: np.ndarray):
+        """Circles of the marker in a frame.
+
+        Args:
+            frame (np.ndarray): the image, in full resolution.
+
+        Returns:
+            np.ndarray: Circles in the format of get_circles (the first one
+                is the best), in full resolution. None if the marker is not
+                found.
+        """
+        scale = self.work_width / frame.shape[1]
+        circles = None
+
+        if self.position is not None:
+            x0, y0, x1, y1 = self.get_roi(frame.shape)
+            circles = self.search(frame[y0:y1, x0:x1], scale, x0, y0,
+                                  radius=self.position[2])
+
+        if circles is None:
+            # Lost (or never found): search the whole frame
+            circles = self.search(frame, scale)
+
+        if circles is None:
+            self.position, self.confidence = None, None
+        else:
+            self.position = circles[0, 0]
+        return circles
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""Color overlay of the recording coverage of a grid.
+
+While recording, every region of the grid is tinted with the fraction of
+the required time recorded in it: red (from half transparent to
+transparent) until it has half of the time, then blue (from transparent to
+half transparent). The overlay is a full frame layer, premultiplied by its
+alpha, that is only updated in the regions whose (quantized) coverage
+changed. Applying it is a single blend, whatever the size of the grid.
+"""
+
+import cv2
+import numpy as np
+
+from .grid import Grid
+
+__all__ = ['CoverageOverlay', 'coverage_colors']
+
+RED = (0, 0, 255)  # BGR
+BLUE = (255, 0, 0)  # BGR
+
+
+def coverage_colors(coverage: np.ndarray) -> tuple:
+    """Color and alpha of the regions of the grid.
+
+    Args:
+        coverage (np.ndarray): Fraction of the time recorded in every region,
+            between 0 and 1.
+
+    Returns:
+        tuple: Colors (..., 3), in BGR, and alphas, between 0 and 0.5.
+    """
+
+    coverage = np.asarray(coverage, dtype=float)
+    low = coverage < 0.5
+
+    colors = np.where(low[..., None], RED, BLUE)
+    alphas = np.where(low, 0.5 - coverage, coverage - 0.5)
+
+    return colors, alphas
+
+
+class CoverageOverlay:
+    """Coverage overlay of the frames of a grid.
+
+    Args:
+        grid (Grid): Grid of the frames.
+        levels (int, optional): Levels the coverage is quantized to.
+            Defaults to 50.
+
+    Attributes:
+        keep (np.ndarray): Weight of the frame in every pixel (1 - alpha),
+            scaled to 255. Size: [height, width, 3]
+        layer (np.ndarray): Color of every pixel premultiplied by its alpha.
+            Size: [height, width, 3]
+    """
+
+    def __init__(self, grid: Grid, levels: int = 50):
+        self.grid = grid
+        self.levels = levels
+        self.reset()
+
+    def geometry(self) -> tuple:
+        """The parameters of the grid the overlay depends on."""
+        return (*self.grid.size_of_frame, self.grid.number_of_rows,
+                self.grid.number_of_cols, self.grid.padding)
+
+    def reset(self) -> None:
+        """Clears the overlay, for the current configuration of the grid."""
+        h, w = self.grid.size_of_frame
+        self.keep = np.full((h, w, 3), 255, dtype=np.uint8)
+        self.layer = np.zeros((h, w, 3), dtype=np.uint8)
+        self._geometry = self.geometry()
+        self._levels = None
+
+    def update(self, coverage: np.ndarray) -> bool:
+        """Updates the regions whose quantized coverage changed.
+
+        Args:
+            coverage (np.ndarray): Fraction of the time recorded in every
+                region, between 0 and 1. Size: [rows, cols]
+
+        Returns:
+            bool: Whether the overlay changed.
+        """
+
+        if self.geometry() != self._geometry:
+            self.reset()
+
+        levels = np.round(np.clip(coverage, 0, 1) * self.levels).astype(int)
+        if self._levels is None:
+            changed = np.ones(levels.shape, dtype=bool)
+        else:
+            changed = levels != self._levels
+        self._levels = levels
+
+        regions = np.argwhere(changed)
+        if len(regions) == 0:
+            return False
+
+        colors, alphas = coverage_colors(levels[changed] / self.levels)
+        for (row, col), color, alpha in zip(regions, colors, alphas):
+            (x1, y1), (x2, y2) = self.grid.get_region([row, col])
+            self.keep[y1:y2, x1:x2] = round((1 - alpha) * 255)
+            self.layer[y1:y2, x1:x2] = np.round(color * alpha)
+
+        return True
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """Blends the overlay into a frame of the grid, in place.
+
+        Args:
+            frame (np.ndarray): the image. Size: [height, width, 3]
+
+        Returns:
+            np.ndarray: the image, with the overlay.
+        """
+
+        cv2.multiply(frame, self.keep, frame, scale=1/255)
+        cv2.add(frame, self.layer, frame)
+        return frame
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""Content-addressed cache of the results of the DSP analysis.
+
+The results of a project are saved in 'Results/Cache', under a key that
+is a hash of everything they depend on: the audio file (a fingerprint of
+its contents, see audio_id), the position data, the timestamps, the grid,
+the calibration and the DSP parameters.
+The band energies per frame (dsp.FrameEnergy), the intermediate product
+every level is derived from, are saved there after every analysis, under
+a key without the grid, and memory-mapped from there: a new grid does not
+need to filter the audio again. Reopening a project that did not change
+finds its key and loads the spectra instead of running the analysis
+again. Changing any of the inputs changes the key, so stale results are
+never used.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+
+from . import file as fileutils
+from .dsp import FrameEnergy
+from .cube import spectrum_cube
+
+__all__ = ['audio_id', 'results_key', 'frames_key', 'load_results',
+           'save_results', 'load_frames', 'save_frames']
+
+# Bump it whenever the analysis changes, so old results are not used
+VERSION = 4
+
+# Results kept per project. The least recently used ones are removed
+MAX_ENTRIES = 8
+
+# Blocks of the audio file read for its fingerprint (see audio_id)
+SAMPLED_BLOCKS = 16
+BLOCK_SIZE = 4096
+
+
+def audio_id(audio, root: str = None) -> str:
+    """Identity of the audio of a project, for results_key and frames_key.
+
+    A file-backed audio (WavAudio) is identified by a fingerprint of its
+    contents: the size of the file, SAMPLED_BLOCKS blocks spread over it
+    (the header and the end included), its path relative to the project
+    and the view of it (range, gain...). Only those blocks are read, so it
+    costs the same for any length, and moving or copying the project
+    keeps it. An in-memory array is hashed.
+
+    Args:
+        audio: WavAudio or np.ndarray.
+        root (str, optional): Folder of the project. Defaults to None =>
+            only the name of the file.
+
+    Returns:
+        str: Hexadecimal digest.
+    """
+
+    digest = hashlib.blake2b(digest_size=20)
+
+    path = getattr(audio, 'path', None)
+    if path is None:
+        array = np.ascontiguousarray(audio)
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    else:
+        size = os.path.getsize(path)
+        name = (os.path.relpath(path, root) if root is not None else
+                os.path.basename(path))
+        digest.update(json.dumps([name.replace(os.sep, '/'), size,
+                                  audio.view], sort_keys=True).encode())
+
+        offsets = np.linspace(0, max(size - BLOCK_SIZE, 0), SAMPLED_BLOCKS)
+        with open(path, 'rb') as f:
+            for offset in np.unique(offsets.astype(np.int64)):
+                f.seek(int(offset))
+                digest.update(f.read(BLOCK_SIZE))
+
+    return digest.hexdigest()
+
+
+def _hash_array(digest, array) -> None:
+    array = np.ascontiguousarray(array, dtype=float)
+    digest.update(str(array.shape).encode())
+    digest.update(array.tobytes())
+
+
+def _key(model, calibration: dict, grid: bool, audio: str,
+         params: dict) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+
+    if audio is None:
+        audio = audio_id(model.audio_data)
+    digest.update(audio.encode())
+    _hash_array(digest, model.data_x)
+    _hash_array(digest, model.data_y)
+    _hash_array(digest, model.data_t)
+    if model.audio_times is not None:
+        _hash_array(digest, model.audio_times[0])
+        _hash_array(digest, model.audio_times[1])
+
+    settings = {
+        'version': VERSION,
+        'calibration': [float(calibration['expected']),
+                        float(calibration['actual'])],
+        'fs': int(model.audio_fs),
+        'fps': float(model.fps),
+        'freq_range': [float(f) for f in model.freq_range],
+        **params
+    }
+
+    if grid:
+        settings['grid'] = [*map(int, model.grid.size_of_frame),
+                            int(model.grid.number_of_rows),
+                            int(model.grid.number_of_cols),
+                            int(model.grid.padding)]
+
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+
+    return digest.hexdigest()
+
+
+def results_key(model, calibration: dict, audio: str = None,
+                **params) -> str:
+    """Key of the results of a project.
+
+    It must be computed before the DSP pipeline modifies the model (mixing
+    down, trimming, interpolating the position...).
+
+    Args:
+        model (DisplayResultsModel): Model with the audio, the position
+            data, the grid and the frequency range of the project.
+        calibration (dict): 'expected' and 'actual' calibration levels.
+        audio (str, optional): audio_id of model.audio_data, when it is
+            already known (e.g., for several keys). Defaults to None =>
+            computed here.
+        **params: Any other (JSON serializable) parameter of the analysis.
+
+    Returns:
+        str: Hexadecimal digest.
+    """
+
+    return _key(model, calibration, True, audio, params)
+
+
+def frames_key(model, calibration: dict, audio: str = None,
+               **params) -> str:
+    """Key of the band energies per frame of a project (see
+    dsp.FrameEnergy). Same as results_key, but they do not depend on the
+    grid."""
+
+    return _key(model, calibration, False, audio,
+                {'frames': True, **params})
+
+
+def cache_dir(project_path: str) -> str:
+    return os.path.join(project_path, 'Results', 'Cache')
+
+
+def touch(path: str, key: str) -> None:
+    """Marks the entry under key as used now, so prune keeps the entries
+    used last (not the ones written last)."""
+
+    try:
+        os.utime(os.path.join(path, f'{key}.json'))
+    except OSError:
+        pass
+
+
+def load_results(project_path: str, key: str):
+    """Results saved under key, if any.
+
+    Returns:
+        tuple: freq, spectrum (rows x cols x bands) and full band spectrum
+            (rows x cols), like DspThread.analyze_streaming. NaN for the
+            cells without audio. None if they are not in the cache.
+    """
+
+    try:
+        bundle = fileutils.load_bundle(cache_dir(project_path), key)
+    except (OSError, ValueError, KeyError):
+        # Incomplete or corrupted entry => analyze again
+        return None
+
+    if bundle is None:
+        return None
+
+    data, header = bundle
+    rows, cols = header['shape']
+    touch(cache_dir(project_path), key)
+
+    return (data['freq'], data['spectrum'].reshape(rows, cols, -1),
+            data['full_band'].reshape(rows, cols))
+
+
+def save_results(project_path: str, key: str, freq, spectrum,
+                 full_band_spec) -> None:
+    """Saves the results of a project under key.
+
+    Args:
+        project_path (str): Path to the project.
+        key (str): See results_key.
+        freq: Center frequencies of the bands.
+        spectrum: Spectrum of each cell, (rows x cols x bands) array or
+            (rows x cols) nested lists. The cells without audio are empty or
+            NaN (see cube.spectrum_cube).
+        full_band_spec: Full band level of each cell, (rows x cols).
+    """
+
+    full_band = np.array(full_band_spec, dtype=float)
+    rows, cols = full_band.shape
+    bands = len(freq)
+
+    sp = spectrum_cube(spectrum, bands)
+
+    path = cache_dir(project_path)
+    fileutils.save_bundle({'freq': np.asarray(freq, dtype=float),
+                           'spectrum': sp.reshape(rows*cols, bands),
+                           'full_band': full_band.ravel()},
+                          path, key, shape=[rows, cols])
+
+    prune(path)
+
+
+def load_frames(project_path: str, key: str):
+    """Band energies per frame saved under key, memory-mapped.
+
+    Returns:
+        dsp.FrameEnergy: None if they are not in the cache.
+    """
+
+    try:
+        frames = FrameEnergy.load(cache_dir(project_path), key, mmap=True)
+    except (OSError, ValueError, KeyError):
+        return None
+
+    if frames is not None:
+        touch(cache_dir(project_path), key)
+    return frames
+
+
+def save_frames(project_path: str, key: str, frames: FrameEnergy) -> None:
+    """Saves the band energies per frame of a project under key."""
+
+    path = cache_dir(project_path)
+    frames.save(path, key)
+
+    prune(path)
+
+
+def prune(path: str, max_entries: int = MAX_ENTRIES) -> None:
+    """Removes the least recently used entries of a cache folder (see
+    touch)."""
+
+    headers = [os.path.join(path, name) for name in os.listdir(path)
+               if name.endswith('.json')]
+    headers.sort(key=os.path.getmtime, reverse=True)
+
+    for header in headers[max_entries:]:
+        key = os.path.basename(header)[:-len('.json')]
+        # Header first: an entry without it is not used anymore
+        os.remove(header)
+        for name in os.listdir(path):
+            if name.startswith(key + '.'):
+                os.remove(os.path.join(path, name))
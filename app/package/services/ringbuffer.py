@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Preallocated ring buffer for audio blocks.
+
+It connects exactly one producer (the audio callback) with exactly one
+consumer (the thread that writes the file). The producer only moves the
+write index and the consumer only moves the read index, so no lock is
+needed: every index is published after the data it covers. Nothing is
+allocated per block.
+"""
+
+import threading
+import numpy as np
+
+__all__ = ['RingBuffer']
+
+
+class RingBuffer:
+    """Single-producer/single-consumer ring buffer of audio frames.
+
+    When the consumer falls behind and a block does not fit, the block is
+    dropped and counted as an overrun: the producer (a real-time audio
+    callback) never waits.
+
+    Args:
+        capacity (int): Frames the buffer can hold.
+        channels (int): Channels per frame.
+        dtype (optional): dtype of the samples. Defaults to np.float32.
+
+    Attributes:
+        overruns (int): Blocks dropped because the buffer was full.
+        dropped (int): Frames dropped because the buffer was full.
+    """
+
+    def __init__(self, capacity: int, channels: int, dtype=np.float32):
+        self.capacity = capacity
+        self._data = np.zeros((capacity, channels), dtype=dtype)
+        # Frames written and read since the start. Only the producer
+        # changes _write, only the consumer changes _read
+        self._write = 0
+        self._read = 0
+        self._data_ready = threading.Event()
+
+        self.overruns = 0
+        self.dropped = 0
+
+    def __len__(self):
+        """Frames available for the consumer."""
+        return self._write - self._read
+
+    def free(self) -> int:
+        """Frames available for the producer."""
+        return self.capacity - len(self)
+
+    # region Producer
+
+    def write(self, block: np.ndarray) -> bool:
+        """Copies a (frames x channels) block into the buffer.
+
+        Returns:
+            bool: False if it did not fit (it is dropped).
+        """
+        frames = len(block)
+        if frames > self.free():
+            self.overruns += 1
+            self.dropped += frames
+            return False
+
+        start = self._write % self.capacity
+        first = min(frames, self.capacity - start)
+        self._data[start:start+first] = block[:first]
+        self._data[:frames-first] = block[first:]
+
+        # Publish the frames only once they are copied
+        self._write += frames
+        self._data_ready.set()
+        return True
+
+    # endregion
+
+    # region Consumer
+
+    def wait(self, frames: int = 1, timeout: float = None) -> bool:
+        """Waits until there are at least frames available.
+
+        Returns:
+            bool: False if the timeout expired before.
+        """
+        while len(self) < frames:
+            self._data_ready.clear()
+            # The producer may have written between the check and clear
+            if len(self) >= frames:
+                break
+            if not self._data_ready.wait(timeout):
+                return False
+        return True
+
+    def peek(self, max_frames: int = None) -> list:
+        """Views of the frames available, oldest first, without copying
+        them. Up to two contiguous chunks (the data may wrap around).
+        Call advance once they are consumed."""
+        frames = len(self)
+        if max_frames is not None:
+            frames = min(frames, max_frames)
+
+        start = self._read % self.capacity
+        first = min(frames, self.capacity - start)
+
+        chunks = [self._data[start:start+first]]
+        if frames > first:
+            chunks.append(self._data[:frames-first])
+        return chunks
+
+    def advance(self, frames: int) -> None:
+        """Releases the oldest frames to the producer."""
+        self._read += min(frames, len(self))
+
+    def read(self, max_frames: int = None) -> np.ndarray:
+        """Copy of the frames available, oldest first."""
+        chunks = self.peek(max_frames)
+        data = np.concatenate(chunks)
+        self.advance(len(data))
+        return data
+
+    # endregion
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""Memory-mapped access to WAV files.
+
+The PCM data of the file is never loaded as a whole: it is memory-mapped
+and only the samples that are asked for are converted to float32. Slicing
+a :class:`WavAudio` (or mixing it down, or scaling it) returns a new view
+of the same file, so the DSP pipeline can trim and calibrate multi-hour
+recordings without allocating them.
+
+Supported formats: PCM int16, int24 and int32, and IEEE float32.
+"""
+
+import os
+import struct
+import numpy as np
+
+__all__ = ['WavAudio', 'read_header']
+
+# WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT and WAVE_FORMAT_EXTENSIBLE
+_PCM = 0x0001
+_FLOAT = 0x0003
+_EXTENSIBLE = 0xFFFE
+
+# (format, bits per sample) -> (numpy dtype of the raw data, full scale)
+_FORMATS = {
+    (_PCM, 16): (np.dtype('<i2'), 2**15),
+    (_PCM, 24): (np.dtype('u1'), 2**23),
+    (_PCM, 32): (np.dtype('<i4'), 2**31),
+    (_FLOAT, 32): (np.dtype('<f4'), 1),
+}
+
+
+def read_header(path: str) -> dict:
+    """Parses the RIFF header of a WAV file.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        dict: 'fs', 'channels', 'bits', 'format' (1 = PCM, 3 = float),
+            'offset' (position of the first sample in the file) and
+            'frames' (number of samples per channel).
+    """
+
+    file_size = os.path.getsize(path)
+
+    with open(path, 'rb') as f:
+        riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise Exception('Wav file format error! Not a RIFF/WAVE file.')
+
+        header = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise Exception('Wav file format error! No data chunk.')
+
+            chunk_id, size = struct.unpack('<4sI', chunk)
+
+            if chunk_id == b'fmt ':
+                fmt = f.read(size)
+                audio_format, channels, fs, _, block_align, bits = \
+                    struct.unpack('<HHIIHH', fmt[:16])
+                if audio_format == _EXTENSIBLE:
+                    # The actual format is the start of the SubFormat GUID
+                    audio_format = struct.unpack('<H', fmt[24:26])[0]
+
+                header = {'fs': fs,
+                          'channels': channels,
+                          'bits': bits,
+                          'format': audio_format,
+                          'block_align': block_align}
+
+            elif chunk_id == b'data':
+                if header is None:
+                    raise Exception('Wav file format error! No fmt chunk.')
+
+                # A recording that was not closed properly may have a wrong
+                # size => never go beyond the end of the file
+                offset = f.tell()
+                size = min(size, file_size - offset)
+                header['offset'] = offset
+                header['frames'] = size // header['block_align']
+                return header
+
+            else:
+                f.seek(size, os.SEEK_CUR)
+
+            # Chunks are word aligned
+            if size % 2:
+                f.seek(1, os.SEEK_CUR)
+
+
+class WavAudio:
+    """Lazy, float32 view of the audio of a WAV file.
+
+    It behaves like a read-only (frames, channels) array: slicing it with a
+    step of 1 returns another view (nothing is read), and the samples are
+    converted when it is turned into an array (np.asarray, np.concatenate,
+    ...). Mono views (see to_mono) are one-dimensional.
+
+    Attributes:
+        path (str): Path to the file.
+        fs (int): Sampling rate.
+        channels (int): Number of channels in the file.
+        bits (int): Bits per sample in the file.
+        gain (float): Factor applied to the samples when they are read.
+    """
+
+    dtype = np.dtype(np.float32)
+
+    def __init__(self, path: str):
+        header = read_header(path)
+
+        key = (header['format'], header['bits'])
+        if key not in _FORMATS:
+            raise Exception('Wav file format error! Not supported: ' +
+                            f'format {key[0]}, {key[1]} bits.')
+
+        if header['frames'] == 0:
+            raise Exception('Empty file!')
+
+        self.path = path
+        self.fs = header['fs']
+        self.channels = header['channels']
+        self.bits = header['bits']
+        self.gain = 1.0
+        self._format = header['format']
+        self._offset = header['offset']
+        self._frames = header['frames']
+        self._start = 0
+        self._stop = self._frames
+        self._mono = False
+        self._mix_gain = 1.0
+        self._map()
+
+    def _map(self):
+        raw_dtype, self._full_scale = _FORMATS[(self._format, self.bits)]
+        shape = (self._frames, self.channels)
+        if self.bits == 24:
+            shape += (3,)
+
+        self._data = np.memmap(self.path, dtype=raw_dtype, mode='r',
+                               offset=self._offset, shape=shape)
+
+    # Pickling (worker processes): the file is mapped again, not copied
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_data']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._map()
+
+    def __repr__(self):
+        return (f'WavAudio({self.path!r}, fs={self.fs}, ' +
+                f'shape={self.shape}, gain={self.gain})')
+
+    def __len__(self):
+        return self._stop - self._start
+
+    @property
+    def view(self) -> dict:
+        """Which samples of the file this view reads, and how (see
+        results_cache.audio_id)."""
+        return {'start': self._start, 'stop': self._stop,
+                'mono': self._mono, 'mix_gain': self._mix_gain,
+                'gain': self.gain}
+
+    @property
+    def shape(self):
+        if self._mono:
+            return (len(self),)
+        return (len(self), self.channels)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def _view(self, **changes):
+        view = object.__new__(WavAudio)
+        view.__dict__.update(self.__dict__)
+        view.__dict__.update(changes)
+        return view
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError('WavAudio only supports slices with step 1')
+
+        start, stop, _ = key.indices(len(self))
+        stop = max(start, stop)
+        return self._view(_start=self._start + start,
+                          _stop=self._start + stop)
+
+    def to_mono(self, gain: float = 1.0):
+        """View of the sum of all the channels, scaled by gain."""
+        return self._view(_mono=True, _mix_gain=gain * self._mix_gain)
+
+    def scaled(self, gain: float):
+        """View of the audio multiplied by gain."""
+        return self._view(gain=self.gain * gain)
+
+    def read(self) -> np.ndarray:
+        """Converts the samples of this view to float32."""
+        raw = self._data[self._start:self._stop]
+
+        if self.bits == 24:
+            # Little-endian 3-byte samples => sign-extended int32
+            raw = raw.astype(np.int32)
+            raw = ((raw[..., 0] << 8) | (raw[..., 1] << 16) |
+                   (raw[..., 2] << 24)) >> 8
+
+        data = raw.astype(np.float32)
+        scale = self.gain / self._full_scale
+
+        if self._mono:
+            data = np.sum(data, axis=1)
+            scale *= self._mix_gain
+
+        if scale != 1:
+            data *= np.float32(scale)
+
+        return data
+
+    def __array__(self, dtype=None, copy=None):
+        data = self.read()
+        if dtype is not None:
+            data = data.astype(dtype)
+        return data
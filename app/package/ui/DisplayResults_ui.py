@@ -166,6 +166,46 @@ class Ui_MainWindow(object):
 
         self.horizontalLayout_8.addWidget(self.grid_config)
 
+        self.label_rows = QLabel(self.frame_9)
+        self.label_rows.setObjectName(u"label_rows")
+
+        self.horizontalLayout_8.addWidget(self.label_rows)
+
+        self.rows_sb = QSpinBox(self.frame_9)
+        self.rows_sb.setObjectName(u"rows_sb")
+        self.rows_sb.setMinimum(1)
+        self.rows_sb.setMaximum(20)
+
+        self.horizontalLayout_8.addWidget(self.rows_sb)
+
+        self.label_cols = QLabel(self.frame_9)
+        self.label_cols.setObjectName(u"label_cols")
+
+        self.horizontalLayout_8.addWidget(self.label_cols)
+
+        self.cols_sb = QSpinBox(self.frame_9)
+        self.cols_sb.setObjectName(u"cols_sb")
+        self.cols_sb.setMinimum(1)
+        self.cols_sb.setMaximum(20)
+
+        self.horizontalLayout_8.addWidget(self.cols_sb)
+
+        self.label_pad = QLabel(self.frame_9)
+        self.label_pad.setObjectName(u"label_pad")
+
+        self.horizontalLayout_8.addWidget(self.label_pad)
+
+        self.pad_sb = QSpinBox(self.frame_9)
+        self.pad_sb.setObjectName(u"pad_sb")
+        self.pad_sb.setMaximum(200)
+
+        self.horizontalLayout_8.addWidget(self.pad_sb)
+
+        self.regrid_button = QPushButton(self.frame_9)
+        self.regrid_button.setObjectName(u"regrid_button")
+
+        self.horizontalLayout_8.addWidget(self.regrid_button)
+
 
         self.verticalLayout_2.addWidget(self.frame_9)
 
@@ -249,6 +289,10 @@ class Ui_MainWindow(object):
         self.pr_name.setText(QCoreApplication.translate("MainWindow", u"TextLabel", None))
         self.label_4.setText(QCoreApplication.translate("MainWindow", u"Grid Config:", None))
         self.grid_config.setText(QCoreApplication.translate("MainWindow", u"TextLabel", None))
+        self.label_rows.setText(QCoreApplication.translate("MainWindow", u"Rows", None))
+        self.label_cols.setText(QCoreApplication.translate("MainWindow", u"Cols", None))
+        self.label_pad.setText(QCoreApplication.translate("MainWindow", u"Padding", None))
+        self.regrid_button.setText(QCoreApplication.translate("MainWindow", u"Apply", None))
         self.label_6.setText(QCoreApplication.translate("MainWindow", u"Sample Rate and Frequency Range: ", None))
         self.audio_info.setText(QCoreApplication.translate("MainWindow", u"TextLabel", None))
         self.menuArchive.setTitle(QCoreApplication.translate("MainWindow", u"Archive", None))
@@ -135,6 +135,8 @@ class DataAcquisitionView(QMainWindow, DataAcquisition_ui):
         micThread.started.connect(micWorker.run)
 
         micWorker.update_volume.connect(self.handle_new_audio)
+        micWorker.buffer_overrun.connect(self.handle_buffer_overrun)
+        micWorker.input_overflow.connect(self.handle_input_overflow)
         micWorker.finished.connect(self.handle_rec_ended)
 
         micWorker.finished.connect(micThread.quit)
@@ -171,6 +173,7 @@ class DataAcquisitionView(QMainWindow, DataAcquisition_ui):
     def save_positon_data(self, value):
         ActualProjectModel.data_x = value["x_data"]
         ActualProjectModel.data_y = value["y_data"]
+        ActualProjectModel.data_t = np.asarray(value["t_data"], dtype=float)
         ActualProjectModel.grid = self._model.get_grid_as_list()
 
         # Write data to disk
@@ -178,10 +181,11 @@ class DataAcquisitionView(QMainWindow, DataAcquisition_ui):
                             'Position Data')
         fileutils.mkdir(path)
 
-        fileutils.save_np_to_txt(value["x_data"], path, file_name="data.x")
-        fileutils.save_np_to_txt(value["y_data"], path, file_name="data.y")
-        fileutils.save_np_to_txt(
-            self._model.get_grid_as_list(), path, file_name='grid.config')
+        fileutils.save_bundle({'x': np.asarray(value["x_data"], dtype=float),
+                               'y': np.asarray(value["y_data"], dtype=float),
+                               't': ActualProjectModel.data_t},
+                              path, 'position',
+                              grid=self._model.get_grid_as_list())
 
     def handle_mic_recording_changed(self, rec):
         if rec:
@@ -229,16 +233,25 @@ class DataAcquisitionView(QMainWindow, DataAcquisition_ui):
         # self.q.put(value)
         pass
 
+    @Slot(int)
+    def handle_buffer_overrun(self, count: int):
+        self.statusbar.showMessage(
+            f'Audio lost: the disk can not keep up ({count} blocks)')
+
+    @Slot(int)
+    def handle_input_overflow(self, count: int):
+        self.statusbar.showMessage(
+            f'Audio lost: input overflow ({count} blocks)')
+
     @ Slot(tuple)
     def save_camera_characteristica(self, value: tuple) -> None:
         print('[Data Acquisition] Saving camera characteristics to disk...')
         print(f'Value: {value}')
-        array = np.array(value, dtype=object)
-
         path = os.path.join(ActualProjectModel.project_location,
                             'Position Data')
-        fileutils.save_np_to_txt(
-            array, path, file_name='camera.data')
+        fileutils.save_bundle({}, path, 'camera',
+                              frame_size=[int(value[0]), int(value[1])],
+                              fps=float(value[2]))
 
     @Slot(float)
     def handle_rows_changed(self, value):
@@ -9,6 +9,9 @@ from PySide2.QtWidgets import QMainWindow, QProgressBar
 
 from ..services.grid import Grid
 from ..services import imbasic as imb
+from ..services import heatmap
+from ..services.blit import BarBlitter
+from ..services.cube import plot_limits
 from ..services.DspThread import DspThread
 from ..controllers.DisplayResultsController import DisplayResultsController
 from ..models.ActualProjectModel import ActualProjectModel
@@ -91,6 +94,7 @@ class DisplayResultsView(QMainWindow, DisplayResults_ui):
 
     def connect_to_controller(self):
         self.freq_cb.currentIndexChanged.connect(self.handle_octave_change)
+        self.regrid_button.clicked.connect(self.handle_regrid)
         self.actionOpen_Project.triggered.connect(self.new_project)
         self.actionQuit.triggered.connect(self._controller.quit)
 
@@ -118,7 +122,12 @@ class DisplayResultsView(QMainWindow, DisplayResults_ui):
         self.active_row, self.active_col = None, None
         # self.max_db, self.min_db = 0, 100
         self.active_spl = None
+        # Index of the band of active_spl: 0 => full band
+        self.active_band = None
+        self.renderer = heatmap.MapRenderer(self.create_color_map())
         self.spl_bar = None
+        # Updates of the bars of spl_bar (see services.blit)
+        self.blitter = None
         self.sc = None
 
     # region Create Threads
@@ -126,6 +135,8 @@ class DisplayResultsView(QMainWindow, DisplayResults_ui):
     def create_thread(self):
         # Create worker and thread
         thread = QThread()
+        # Keeps the band energies of every frame, so the grid can be
+        # changed later without filtering the audio again
         worker = DspThread()
         worker.moveToThread(thread)
 
@@ -145,6 +156,28 @@ class DisplayResultsView(QMainWindow, DisplayResults_ui):
         thread.finished.connect(self.stop_dsp)
         return thread
 
+    def create_regrid_thread(self, grid_info: list):
+        # Create worker and thread
+        thread = QThread()
+        worker = DspThread()
+        worker.moveToThread(thread)
+
+        thread.started.connect(
+            lambda: worker.regrid(self._model, grid_info))
+        thread.started.connect(self.start_loading)
+        worker.update_status.connect(self.handle_update_status)
+
+        worker.finished.connect(lambda: self._controller.select_row(0))
+        worker.finished.connect(lambda: self._controller.select_col(0))
+        worker.finished.connect(self.show_project_info)
+        worker.finished.connect(thread.quit)
+        worker.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        thread.finished.connect(self.stop_dsp)
+        thread.finished.connect(
+            lambda: self.regrid_button.setEnabled(True))
+        return thread
+
     def create_loading_thread(self):
         # Create worker and thread
         thread = QThread()
@@ -196,6 +229,17 @@ class DisplayResultsView(QMainWindow, DisplayResults_ui):
 
         self.loading_thread.start()
 
+    def handle_regrid(self):
+        if len(self._model.spectrum) == 0:
+            return
+
+        grid_info = [self.rows_sb.value(), self.cols_sb.value(),
+                     self.pad_sb.value()]
+
+        self.regrid_button.setEnabled(False)
+        self.regrid_thread = self.create_regrid_thread(grid_info)
+        self.regrid_thread.start()
+
     def new_project(self):
         # self.sc.ax.cla()
         # self.sc.ax.remove()
@@ -236,6 +280,10 @@ class DisplayResultsView(QMainWindow, DisplayResults_ui):
         self.num_of_cells = grid.number_of_cols * \
             grid.number_of_rows
 
+        self.rows_sb.setValue(grid.number_of_rows)
+        self.cols_sb.setValue(grid.number_of_cols)
+        self.pad_sb.setValue(grid.padding)
+
     @Slot(list)
     def handle_update_status(self, value: int) -> None:
         # self.progressBar.setValue((value+1)/total_grids*100)
@@ -247,20 +295,27 @@ class DisplayResultsView(QMainWindow, DisplayResults_ui):
         """Updates the image_label with a new opencv image"""
         if cv_img is None:
             return
-        self.img = cv_img.copy()
-        cv_img = self._model.grid.draw_grid(cv_img)
-
-        cv_img = self.draw_map(cv_img)
+        if cv_img is not self.img:
+            self.img = cv_img.copy()
+            self.renderer.set_background(self.img)
+
+        # Background with the grid and map of the band, at the size it is
+        # displayed (see heatmap.MapRenderer)
+        cv_img = self.renderer.render(self._model.grid, self.IMG_WIDTH,
+                                      self.active_band, self.active_spl,
+                                      self._model.min_db,
+                                      self._model.max_db)
+        self.scale_factor = self.renderer.scale_factor
 
         if self.active_col is not None:
             pt1, pt2 = self._model.grid.get_region([self.active_row,
                                                     self.active_col])
+            pt1 = [int(p * self.scale_factor) for p in pt1]
+            pt2 = [int(p * self.scale_factor) for p in pt2]
+            thickness = max(round(4 * self.scale_factor), 1)
             cv_img = imb.draw_border(cv_img, pt1, pt2,
                                      color=(255, 255, 0),
-                                     thickness=4)
-
-        cv_img, self.scale_factor = imb.resize(cv_img, width=self.IMG_WIDTH,
-                                               return_scale_factor=True)
+                                     thickness=thickness)
 
         qt_img = self.convert_cv_qt(cv_img)
         self.bg_img_label.setPixmap(qt_img)
@@ -269,30 +324,7 @@ class DisplayResultsView(QMainWindow, DisplayResults_ui):
 
     @staticmethod
     def create_color_map(color0=(255, 0, 0), color1=(0, 0, 255)):
-        LUT = np.linspace(color0, color1, 100, dtype=np.uint8)
-        return LUT
-
-    def draw_map(self, img):
-        if self.active_spl is None:
-            return img
-
-        spl = self.active_spl
-        spl = np.array(spl, dtype=int)
-        min = self._model.min_db
-        max = self._model.max_db
-        lut = self.create_color_map()
-
-        for irow, row in enumerate(spl):
-            for icol, value in enumerate(row):
-                pt1, pt2 = self._model.grid.get_region([irow, icol])
-
-                index = int((value-min)*len(lut) / (max-min)) - 1
-                index = np.clip(index, 0, 99)
-                img = imb.draw_filled_rectangle(img,
-                                                pt1, pt2,
-                                                lut[index],
-                                                0.6)
-        return img
+        return heatmap.create_color_map(color0, color1)
 
     def handle_grid_clicked(self, event):
         """The (x,y) position of the event it is NOT in reference with
@@ -355,21 +387,23 @@ class DisplayResultsView(QMainWindow, DisplayResults_ui):
             self.log('Error len(sp) != len(freq)')
 
     def redraw(self, freq, spectrum):
-        if self.spl_bar is not None:
-            if len(self.spl_bar.patches) > 0:
-                for ii, val in enumerate(spectrum):
-                    self.spl_bar.patches[ii].set_height(val)
-                self.sc.draw()
+        if self.blitter is not None:
+            if len(self.spl_bar.patches) == len(spectrum):
+                # Only the bars change: blit them over the cached axes
+                self.blitter.update(spectrum)
                 return
+            self.blitter.disconnect()
 
         self.sc.ax.cla()  # Clear the canvas.
 
         self.spl_bar = self.sc.ax.bar(
             freq, spectrum, width=np.array(freq)*1/6)
+        self.blitter = BarBlitter(self.sc, self.sc.ax, self.spl_bar)
 
         self.sc.ax.set_xscale('log')
-        self.sc.ax.set_ylim(np.array(self._model.spectrum).min()*0.9,
-                            np.array(self._model.spectrum).max()*1.1)
+        self.sc.ax.set_ylim(*plot_limits(
+            self._model.band_min, self._model.band_max,
+            (self._model.min_db, self._model.max_db)))
         self.sc.ax.set_xlabel(r'Frequency [Hz]')
         self.sc.ax.set_ylabel('Level [dB]')
 
@@ -408,19 +442,23 @@ class DisplayResultsView(QMainWindow, DisplayResults_ui):
     @Slot(object)
     def handle_full_band_spec_changed(self, value):
         self.active_spl = value
+        self.active_band = 0
+        self.renderer.clear_maps()
 
     @Slot(object)
     def handle_spectrum_changed(self, value):
-        pass
+        self.renderer.clear_maps()
+        # New limits of the bar chart => set it up again on next redraw
+        if self.blitter is not None:
+            self.blitter.disconnect()
+            self.blitter = None
 
     def handle_octave_change(self, index):
         if len(self._model.spectrum) == 0:
             return
 
-        if index == 0:
-            self.active_spl = self._model.full_band_spec
-        else:
-            self.active_spl = self._model.spectrum[:, :, index-1]
+        self.active_spl = self._model.band(index)
+        self.active_band = index
 
         self.display_image(self.img)
 
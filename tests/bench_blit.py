@@ -0,0 +1,63 @@
+"""Benchmark: updating the spectrum bar chart of DisplayResultsView.
+
+Compares, for a sweep of selections over the cells of a grid:
+ - Setting the heights of the bars and drawing the whole figure (as
+   DisplayResultsView.redraw used to do).
+ - services.blit.BarBlitter: only the bars, over the cached axes.
+
+Usage: python -m tests.bench_blit
+"""
+
+import time
+import numpy as np
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from app.package.services.blit import BarBlitter
+
+bands = 30
+cells = 200
+
+
+def bar_chart(freq, spl):
+    fig = Figure(tight_layout=True)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.grid(which='both')
+    bars = ax.bar(freq, spl, width=freq/6)
+    ax.set_xscale('log')
+    ax.set_ylim(30, 100)
+    ax.set_xlabel(r'Frequency [Hz]')
+    ax.set_ylabel('Level [dB]')
+    return canvas, ax, bars
+
+
+def main():
+    freq = np.geomspace(25, 20000, bands)
+    spl = np.random.uniform(40, 90, (cells, bands))
+
+    canvas, ax, bars = bar_chart(freq, spl[0])
+    canvas.draw()
+    t = time.perf_counter()
+    for heights in spl:
+        for patch, height in zip(bars.patches, heights):
+            patch.set_height(height)
+        canvas.draw()
+    t_draw = (time.perf_counter() - t) / cells
+
+    canvas, ax, bars = bar_chart(freq, spl[0])
+    blitter = BarBlitter(canvas, ax, bars)
+    canvas.draw()
+    t = time.perf_counter()
+    for heights in spl:
+        blitter.update(heights)
+    t_blit = (time.perf_counter() - t) / cells
+
+    print(f'{bands} bands, {cells} cells selected. ms per selection:')
+    print(f'  full draw: {t_draw*1e3:7.2f} ({1/t_draw:6.0f} fps)')
+    print(f'  blit:      {t_blit*1e3:7.2f} ({1/t_blit:6.0f} fps)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Benchmark: total filtering time of a long recording.
+
+Compares the multirate decimation tree of OctaveFilterBank with
+decimating the full-rate signal independently for every band.
+
+Usage: python -m tests.bench_decimation
+"""
+
+import time
+import numpy as np
+
+from app.package.services import PyOctaveBand
+from tests.test_filterbank import per_band_spl
+
+fs = 48000
+win_size = 2**16
+duration = 60  # s
+
+
+def main():
+    audio = np.random.rand(duration * fs) * 2 - 1
+    bank = PyOctaveBand.get_filterbank(fs, 3, 6, [12, 20000])
+    starts = range(0, len(audio) - win_size, win_size // 2)
+
+    t = time.perf_counter()
+    before = [per_band_spl(audio[i:i+win_size], fs) for i in starts]
+    t_before = time.perf_counter() - t
+
+    t = time.perf_counter()
+    after = [bank.spl(audio[i:i+win_size]) for i in starts]
+    t_after = time.perf_counter() - t
+
+    diff = np.abs(np.array(after) - np.array(before)).max()
+
+    print(f'{duration}s of audio, {len(starts)} windows of {win_size}')
+    print(f' - Per-band decimation: {round(t_before, 2)} s')
+    print(f' - Decimation tree:     {round(t_after, 2)} s')
+    print(f' - Speed-up: x{round(t_before/t_after, 2)}')
+    print(f' - Max. difference: {round(diff, 3)} dB')
+
+
+if __name__ == '__main__':
+    main()
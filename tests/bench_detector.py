@@ -0,0 +1,133 @@
+"""Benchmark: HoughCircles vs connected components to find the marker.
+
+Both detectors search the whole frame, on the mask of get_scaled_mask
+(the 700 px wide mask of get_mask):
+ - Hough: get_circles, with the votes scaled as MarkerTracker does.
+ - Blobs: get_blobs.
+
+Accuracy:
+ - Synthetic frames: a marker with a known center, blurred and with
+   noise. Error between the center found and the real one.
+ - tests/imgs: the images have no ground truth, so they are shifted by
+   known offsets. Error between the center found in the shifted image
+   and the one found in the original plus the offset.
+
+The latency is that of the detector alone: both share the mask.
+
+Usage: python -m tests.bench_detector
+"""
+
+import os
+import time
+import cv2
+import numpy as np
+
+from app.package.services.mask import (TRACKING_COLOR, get_scaled_mask,
+                                       get_circles, get_blobs)
+
+size = (1080, 1920)
+num_of_frames = 50
+num_of_shifts = 10
+
+
+def hough(mask, scale):
+    return get_circles(mask, dp=3, minDist=350*scale, votes=100*scale)
+
+
+def blobs(mask, scale):
+    return get_blobs(mask, minArea=100*scale**2)[0]
+
+
+detectors = {'Hough': hough, 'Blobs': blobs}
+
+
+def detect(detector, frame):
+    """Center found in frame (full resolution) and time spent by the
+    detector (without the mask), in ms."""
+    scale = 700 / frame.shape[1]
+    mask = get_scaled_mask(frame, scale, 1, 25)
+
+    t = time.perf_counter()
+    circles = detector(mask, scale)
+    elapsed = (time.perf_counter() - t) * 1e3
+
+    if circles is None:
+        return None, elapsed
+    # As MarkerTracker.search
+    return (circles[0, 0, :2] + 0.5) / scale - 0.5, elapsed
+
+
+def synthetic():
+    """Frames with a marker, and its center."""
+    rng = np.random.default_rng(0)
+    for _ in range(num_of_frames):
+        center = rng.uniform((200, 200), (size[1] - 200, size[0] - 200))
+        r = rng.uniform(20, 120)
+
+        frame = np.full((*size, 3), 90, dtype=np.uint8)
+        # 4 bits of sub-pixel shift
+        cv2.circle(frame, tuple(np.round(center*16).astype(int)),
+                   int(r*16), TRACKING_COLOR, -1, cv2.LINE_AA, shift=4)
+        frame = cv2.GaussianBlur(frame, (5, 5), 0)
+        noise = rng.normal(0, 6, frame.shape)
+        frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+        yield frame, center
+
+
+def shifted():
+    """Shifted images of tests/imgs, and the offset."""
+    rng = np.random.default_rng(0)
+    folder = os.path.join('tests', 'imgs')
+    for name in ('esfera 1.jpg', 'esfera 2.jpg'):
+        img = cv2.imread(os.path.join(folder, name))
+        h, w = img.shape[:2]
+        yield img, None
+        for _ in range(num_of_shifts):
+            offset = rng.uniform(-20, 20, 2)
+            M = np.float32([[1, 0, offset[0]], [0, 1, offset[1]]])
+            yield cv2.warpAffine(img, M, (w, h),
+                                 borderMode=cv2.BORDER_REPLICATE), offset
+
+
+def run(detector, frames, reference=False):
+    errors, times, misses = [], [], 0
+    origin = None
+    for frame, truth in frames:
+        center, elapsed = detect(detector, frame)
+        times.append(elapsed)
+
+        if reference and truth is None:
+            # Original image: the reference for its shifted copies
+            origin = center
+            continue
+        if reference:
+            truth = None if origin is None else origin + truth
+
+        if center is None or truth is None:
+            misses += 1
+        else:
+            errors.append(np.hypot(*(center - truth)))
+
+    return np.array(errors), np.array(times), misses
+
+
+def report(name, errors, times, misses):
+    error = (f'{np.mean(errors):.2f} / {np.max(errors):.2f} px'
+             if len(errors) else '-')
+    print(f' - {name}: error (mean / max) {error}, misses {misses}, '
+          f'{np.median(times):.2f} ms per frame (median)')
+
+
+def main():
+    print(f'Synthetic {size[1]}x{size[0]} frames ({num_of_frames}):')
+    for name, detector in detectors.items():
+        report(name, *run(detector, synthetic()))
+
+    print(f'tests/imgs, shifted {num_of_shifts} times:')
+    for name, detector in detectors.items():
+        report(name, *run(detector, shifted(), reference=True))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Benchmark: locating 10^6 points in a Grid.
+
+Compares calling Grid.locate_point for every point with a single
+Grid.locate_points call.
+
+Usage: python -m tests.bench_grid
+"""
+
+import time
+import numpy as np
+
+from app.package.services.grid import Grid
+
+num_of_points = 10**6
+
+
+def main():
+    grid = Grid([1080, 1920], 20, 20, 40)
+    xs = np.random.rand(num_of_points) * 2000 - 40
+    ys = np.random.rand(num_of_points) * 1200 - 60
+    xs[::100] = np.nan
+
+    t = time.perf_counter()
+    for point in zip(xs, ys):
+        grid.locate_point(point)
+    t_scalar = time.perf_counter() - t
+
+    t = time.perf_counter()
+    grid.locate_points(xs, ys)
+    t_vector = time.perf_counter() - t
+
+    print(f'{num_of_points} points, {grid}')
+    print(f' - locate_point (one by one): {round(t_scalar, 3)} s')
+    print(f' - locate_points:             {round(t_vector*1e3, 2)} ms')
+    print(f' - Speed-up: x{round(t_scalar/t_vector)}')
+
+
+if __name__ == '__main__':
+    main()
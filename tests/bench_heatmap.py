@@ -0,0 +1,78 @@
+"""Benchmark: rendering the level map of DisplayResultsView.
+
+Compares, for several grids:
+ - One blended rectangle per cell on the full resolution image, with the
+   grid, resized to the display size (as draw_map used to do).
+ - heatmap.draw_map at the display size.
+ - heatmap.MapRenderer, switching between bands already rendered (the
+   base layer and the maps are cached).
+
+Usage: python -m tests.bench_heatmap
+"""
+
+import time
+import numpy as np
+
+from app.package.services import imbasic as imb
+from app.package.services import heatmap
+from app.package.services.grid import Grid
+
+size = (1080, 1920)
+display_width = 350
+repetitions = 10
+
+
+def draw_cells(img, spl, grid, lut, min_db, max_db):
+    for irow, row in enumerate(spl):
+        for icol, value in enumerate(row):
+            if np.isnan(value):
+                continue
+            pt1, pt2 = grid.get_region([irow, icol])
+            index = int((value-min_db)*len(lut) / (max_db-min_db)) - 1
+            index = np.clip(index, 0, len(lut) - 1)
+            img = imb.draw_filled_rectangle(img, pt1, pt2, lut[index], 0.6)
+    return img
+
+
+def main():
+    img = np.random.randint(0, 256, (*size, 3), dtype=np.uint8)
+    lut = heatmap.create_color_map()
+
+    print(f'{size[1]}x{size[0]} image, displayed {display_width} px wide. '
+          'ms per render:')
+    for n in (5, 20, 50):
+        grid = Grid(size, n, n, padding=40)
+        spl = np.random.uniform(40, 90, (n, n))
+
+        t = time.perf_counter()
+        for _ in range(repetitions):
+            imb.resize(draw_cells(grid.draw_grid(img.copy()), spl, grid,
+                                  lut, 40, 90),
+                       width=display_width)
+        t_cells = (time.perf_counter() - t) / repetitions
+
+        t = time.perf_counter()
+        for _ in range(repetitions):
+            heatmap.draw_map(imb.resize(img, width=display_width), spl,
+                             grid, lut, 40, 90)
+        t_map = (time.perf_counter() - t) / repetitions
+
+        renderer = heatmap.MapRenderer(lut)
+        renderer.set_background(img)
+        bands = [np.random.uniform(40, 90, (n, n)) for _ in range(3)]
+        for band, spl in enumerate(bands):
+            renderer.render(grid, display_width, band, spl, 40, 90)
+
+        t = time.perf_counter()
+        for i in range(repetitions):
+            band = i % len(bands)
+            renderer.render(grid, display_width, band, bands[band], 40, 90)
+        t_cached = (time.perf_counter() - t) / repetitions
+
+        print(f' - {n}x{n} grid: rectangles {t_cells*1e3:.1f}, '
+              f'heatmap.draw_map {t_map*1e3:.2f}, '
+              f'MapRenderer {t_cached*1e3:.2f}')
+
+
+if __name__ == '__main__':
+    main()
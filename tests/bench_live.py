@@ -0,0 +1,84 @@
+"""Benchmark: live analysis of the recording while scanning.
+
+Feeds services.live.LiveSpectrum with a minute of 48 kHz stereo audio on
+a 4x4 grid, with the positions of the camera at 30 fps, delivered late
+as CameraThread does. For blocks of the size of the audio device and of
+the writes of MicWorker, it prints the time per second of audio and the
+real-time factor of:
+ - add: the analysis itself (the thread of the analysis).
+ - put: what the recorder waits for (a copy into the queue), fed in
+   real time for paced seconds, and the samples dropped because the
+   analysis fell behind.
+
+Usage: python -m tests.bench_live
+"""
+
+import time
+import numpy as np
+
+from app.package.services.live import LiveSpectrum
+
+fs = 48000
+seconds = 60
+paced = 10
+fps = 30
+# Positions known this late (frames between the capture and the tracking)
+lag = 8 / fps
+rows, cols = 4, 4
+# Blocks of the audio device, and MicWorker.write_chunk
+blocks = [512, 2**15]
+
+
+def feed(live, audio, block, method, real_time=False):
+    """Calls method (live.add or live.put) for every block, with the
+    positions known so far, as fast as possible or as they are recorded.
+    Returns the seconds spent in method."""
+    start = time.perf_counter() if real_time else 100.0
+    frames = np.arange(int(len(audio) / fs * fps))
+    cells = (frames // fps) % (rows * cols)
+    shown = 0
+    spent = 0
+
+    for first in range(0, len(audio), block):
+        now = start + first / fs
+        if real_time:
+            # The block is complete at the end of its last sample
+            time.sleep(max(now + block / fs - time.perf_counter(), 0))
+        while shown < len(frames) and frames[shown] / fps < now - lag:
+            live.set_cell(*divmod(cells[shown], cols),
+                          time=start + frames[shown] / fps)
+            shown += 1
+
+        t = time.perf_counter()
+        method(audio[first:first+block], now)
+        spent += time.perf_counter() - t
+
+    return spent
+
+
+def main():
+    audio = np.random.default_rng(0).uniform(
+        -0.5, 0.5, (seconds * fs, 2)).astype(np.float32)
+
+    print(f'{seconds} s of {fs} Hz stereo, {rows}x{cols} grid, '
+          f'positions at {fps} fps. ms per second of audio:')
+    for block in blocks:
+        live = LiveSpectrum(fs, [20, 20000], rows, cols)
+        t = time.perf_counter()
+        feed(live, audio, block, live.add)
+        live.flush()
+        t_add = (time.perf_counter() - t) / seconds
+
+        live = LiveSpectrum(fs, [20, 20000], rows, cols)
+        t_put = feed(live, audio[:paced*fs], block, live.put,
+                     real_time=True) / paced
+        live.stop()
+
+        print(f'  blocks of {block:5}: '
+              f'add {t_add*1e3:6.1f} ({1/t_add:5.1f}x real time), '
+              f'put {t_put*1e3:6.2f} ({1/t_put:7.0f}x), '
+              f'{live.dropped} samples dropped')
+
+
+if __name__ == '__main__':
+    main()
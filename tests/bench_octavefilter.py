@@ -0,0 +1,54 @@
+"""Benchmark: cost of one analysis window in PyOctaveBand.octavefilter.
+
+Compares designing the filter bank for every window (what octavefilter
+used to do) with the cached OctaveFilterBank.
+
+Usage: python -m tests.bench_octavefilter
+"""
+
+import time
+import numpy as np
+
+from app.package.services import PyOctaveBand
+
+fs = 48000
+win_size = 2**16
+repetitions = 20
+limits = [20, 20000]
+
+
+def bench(fn):
+    times = []
+    for _ in range(repetitions):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return np.median(times)
+
+
+def main():
+    window = np.random.rand(win_size) * 2 - 1
+
+    def design_every_time():
+        bank = PyOctaveBand.OctaveFilterBank(fs, 3, 6, limits)
+        bank.spl(window)
+
+    def design():
+        PyOctaveBand.OctaveFilterBank(fs, 3, 6, limits)
+
+    def cached():
+        PyOctaveBand.octavefilter(window, fs, 3, 6, limits)
+
+    before = bench(design_every_time)
+    only_design = bench(design)
+    after = bench(cached)
+
+    print(f'Window of {win_size} samples, fs = {fs}')
+    print(f' - Before (design per window): {round(before*1e3, 2)} ms')
+    print(f' - Design cost alone:          {round(only_design*1e3, 2)} ms')
+    print(f' - After (cached bank):        {round(after*1e3, 2)} ms')
+    print(f' - Speed-up: x{round(before/after, 2)}')
+
+
+if __name__ == '__main__':
+    main()
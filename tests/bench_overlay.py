@@ -0,0 +1,60 @@
+"""Benchmark: drawing the coverage overlay of CameraThread on 1080p frames.
+
+Compares one blended rectangle per region (imbasic.draw_filled_rectangle,
+as CameraThread used to do) with CoverageOverlay, for several grids. The
+coverage of one region grows every frame, as while recording.
+
+Usage: python -m tests.bench_overlay
+"""
+
+import time
+import numpy as np
+
+from app.package.services import imbasic as imb
+from app.package.services.grid import Grid
+from app.package.services.overlay import CoverageOverlay, coverage_colors
+
+size = (1080, 1920)
+num_of_frames = 30
+
+
+def draw_regions(frame, coverage, grid):
+    colors, alphas = coverage_colors(coverage)
+    for row in range(grid.number_of_rows):
+        for col in range(grid.number_of_cols):
+            pt1, pt2 = grid.get_region([row, col])
+            imb.draw_filled_rectangle(frame, pt1, pt2,
+                                      colors[row, col].tolist(),
+                                      alphas[row, col])
+    return frame
+
+
+def main():
+    frame = np.random.randint(0, 256, (*size, 3), dtype=np.uint8)
+
+    print(f'{size[1]}x{size[0]} frames, ms per frame:')
+    for n in (5, 20, 50):
+        grid = Grid(size, n, n, padding=40)
+        coverage = np.random.rand(n, n)
+        overlay = CoverageOverlay(grid)
+
+        t_loop, t_overlay = 0, 0
+        for i in range(num_of_frames):
+            coverage[i % n, i % n] += 0.05
+            coverage = np.clip(coverage, 0, 1)
+
+            t = time.perf_counter()
+            draw_regions(frame.copy(), coverage, grid)
+            t_loop += time.perf_counter() - t
+
+            t = time.perf_counter()
+            overlay.update(coverage)
+            overlay.apply(frame.copy())
+            t_overlay += time.perf_counter() - t
+
+        print(f' - {n}x{n} grid: rectangles {t_loop/num_of_frames*1e3:.1f}, '
+              f'CoverageOverlay {t_overlay/num_of_frames*1e3:.1f}')
+
+
+if __name__ == '__main__':
+    main()
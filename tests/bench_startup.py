@@ -0,0 +1,95 @@
+"""Benchmark: imports needed before the first window (NewProject) appears.
+
+Compares, each in a new interpreter with ``python -X importtime``:
+ - eager: every view imported up front (as app/__main__.py used to do).
+ - lazy: app/__main__.py and the NewProject view, the only one built at
+   startup (the rest are built on first use, see VIEWS in
+   app/__main__.py).
+
+For each one it prints the total import time and the heaviest top level
+imports, in the format of -X importtime (microseconds). Modules that
+cannot be imported (a missing optional device library...) are reported
+and skipped.
+
+Usage: python -m tests.bench_startup
+"""
+
+import re
+import sys
+import subprocess
+
+EAGER = ['app.__main__',
+         'app.package.views.MainWindow',
+         'app.package.views.NewProjectView',
+         'app.package.views.DataAcquisitionView',
+         'app.package.views.DisplayResultsView',
+         'app.package.views.Calibrate_view']
+
+LAZY = ['app.__main__',
+        'app.package.views.NewProjectView']
+
+# Heaviest top level imports shown
+top = 10
+
+SCRIPT = '''
+import sys, importlib
+for module in sys.argv[1:]:
+    try:
+        importlib.import_module(module)
+    except ImportError as e:
+        print(f'! {module}: {e}', file=sys.stderr)
+'''
+
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def importtime(modules: list) -> tuple:
+    """Runs the imports in a new interpreter.
+
+    Returns:
+        tuple: (self, cumulative, name) of every top level import, in
+            microseconds, and the import errors.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                             SCRIPT, *modules],
+                            capture_output=True, text=True)
+
+    imports, errors = [], []
+    for line in result.stderr.splitlines():
+        if line.startswith('! '):
+            errors.append(line[2:])
+            continue
+
+        match = LINE.match(line)
+        # Nested imports are indented (two spaces per level)
+        if match is not None and len(match.group(3)) == 1:
+            imports.append((int(match.group(1)), int(match.group(2)),
+                            match.group(4)))
+
+    return imports, errors
+
+
+def report(name: str, modules: list) -> int:
+    imports, errors = importtime(modules)
+    total = sum(cumulative for _, cumulative, _ in imports)
+
+    print(f'{name}: {total/1e3:.0f} ms, {len(imports)} top level imports')
+    print('import time: self [us] | cumulative | imported package')
+    for self_us, cumulative, module in sorted(imports, key=lambda i: i[1],
+                                              reverse=True)[:top]:
+        print(f'import time: {self_us:>9} | {cumulative:>10} | {module}')
+    for error in errors:
+        print(f'  not imported: {error}')
+    print()
+
+    return total
+
+
+def main():
+    eager = report('eager', EAGER)
+    lazy = report('lazy', LAZY)
+    print(f'lazy/eager: {lazy/eager:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark: locating the microphone marker in 1080p frames.
+
+Compares the full frame search (get_mask + get_circles, as CameraThread
+used to do) with MarkerTracker, for a marker moving across the frame and
+for the images in tests/imgs (upscaled to 1080p).
+
+Usage: python -m tests.bench_tracking
+"""
+
+import os
+import time
+import cv2
+import numpy as np
+
+from app.package.services.mask import (MarkerTracker, TRACKING_COLOR,
+                                       get_mask, get_circles)
+
+size = (1080, 1920)
+num_of_frames = 100
+fps = 30
+
+
+def moving_marker():
+    for i in range(num_of_frames):
+        frame = np.full((*size, 3), 90, dtype=np.uint8)
+        x = 200 + 15*i
+        y = 540 + int(300*np.sin(i/10))
+        cv2.circle(frame, (x, y), 40, TRACKING_COLOR, -1)
+        yield frame
+
+
+def images():
+    folder = os.path.join('tests', 'imgs')
+    for name in ('esfera 1.jpg', 'esfera 2.jpg'):
+        frame = cv2.resize(cv2.imread(os.path.join(folder, name)),
+                           size[::-1])
+        for _ in range(10):
+            yield frame
+
+
+def full_search(frame):
+    return get_circles(get_mask(frame, 1, 25), dp=3, minDist=350)
+
+
+def measure(locate, frames):
+    times = []
+    for frame in frames:
+        t = time.perf_counter()
+        locate(frame)
+        times.append(time.perf_counter() - t)
+    return np.array(times) * 1e3
+
+
+def main():
+    print(f'Frame: {size[1]}x{size[0]}, interval at {fps} fps: '
+          f'{round(1e3/fps, 1)} ms')
+
+    for name, frames in (('Moving marker', moving_marker),
+                         ('tests/imgs', images)):
+        full = measure(full_search, frames())
+        tracked = measure(MarkerTracker(1, 25, 3, 350).locate, frames())
+
+        print(f'{name} (ms per frame, median / max):')
+        print(f' - Full search:   {np.median(full):.1f} / {full.max():.1f}')
+        print(f' - MarkerTracker: {np.median(tracked):.1f} / '
+              f'{tracked.max():.1f}')
+
+
+if __name__ == '__main__':
+    main()
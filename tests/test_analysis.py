@@ -0,0 +1,267 @@
+import tempfile
+import numpy as np
+import unittest
+
+from app.package.services import dsp
+from app.package.services.DspThread import DspThread
+from app.package.services.grid import Grid
+from app.package.models.ActualProjectModel import ActualProjectModel
+from app.package.models.DisplayResultsModel import DisplayResultsModel
+
+
+class TestAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        ActualProjectModel.project_location = self.tmp.name
+
+        rng = np.random.default_rng(0)
+
+        self.model = DisplayResultsModel()
+        self.model.grid = Grid([100, 100], 2, 2, 0)
+        self.model.audio_fs = 48000
+        self.model.freq_range = [20, 20000]
+        self.model.audio_data = rng.random(10 * 2**16, dtype=np.float32) - .5
+
+        # One cell shorter than an analysis window
+        self.segments = {(0, 0): [(0, 2**16), (3 * 2**16, 5 * 2**16)],
+                         (0, 1): [(2**16, 3 * 2**16)],
+                         (1, 0): [(9 * 2**16, 9 * 2**16 + 1000)],
+                         (1, 1): [(5 * 2**16, 7 * 2**16),
+                                  (7 * 2**16, 9 * 2**16)]}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parallel_equals_serial(self):
+        serial = DspThread(workers=1)
+        parallel = DspThread(workers=2)
+
+        status = []
+        parallel.update_status.connect(status.append)
+
+        freq_s, spectrum_s = serial.analyze(self.model, self.segments)
+        freq_p, spectrum_p = parallel.analyze(self.model, self.segments)
+
+        np.testing.assert_array_equal(freq_s, freq_p)
+        self.assertEqual(status, [0, 1, 2, 3])
+        np.testing.assert_array_equal(spectrum_s.astype(float),
+                                      spectrum_p.astype(float))
+
+    def test_workers(self):
+        """No larger pool than cells with audio: one cell => no pool."""
+        pools = []
+
+        class Worker(DspThread):
+            def analyze_parallel(self, *args):
+                pools.append(args[-1])
+                return super().analyze_parallel(*args)
+
+        segments = {key: [] for key in self.segments}
+        segments[(0, 1)] = self.segments[(0, 1)]
+        freq, spectrum = Worker(workers=8).analyze(self.model, segments)
+        self.assertEqual(pools, [])
+        self.assertEqual(len(spectrum[0][1]), len(freq))
+
+        segments[(1, 1)] = self.segments[(1, 1)]
+        Worker(workers=8).analyze(self.model, segments)
+        self.assertEqual(pools, [2])
+
+    def test_ranges(self):
+        """Cells analyzed from sample ranges, as if their audio had been
+        concatenated."""
+        worker = DspThread(workers=1)
+        audio = self.model.audio_data
+
+        full_band = worker.get_full_band(self.model, self.segments)
+
+        for key, ranges in self.segments.items():
+            cell = np.concatenate([audio[s:e] for s, e in ranges])
+            np.testing.assert_array_equal(dsp.gather(audio, ranges), cell)
+            self.assertAlmostEqual(full_band[key[0]][key[1]],
+                                   20 * np.log10(np.std(cell) / 2e-5), 4)
+
+    def test_streaming(self):
+        """Block by block analysis vs. the cell by cell one. Two cells,
+        visited in two halves of the recording."""
+        model = self.model
+        model.fps = 30
+        frames = int(len(model.audio_data) / model.audio_fs * model.fps)
+        model.data_x = np.where(np.arange(frames) < frames // 2, 25., 75.)
+        model.data_y = np.full(frames, 25.)
+
+        worker = DspThread(workers=1)
+        segments = worker.segment_audio(model, worker.segment_video(model))
+        freq, spectrum = worker.analyze(model, segments)
+        full_band = worker.get_full_band(model, segments)
+
+        worker.block_size = 10000
+        freq_s, spectrum_s, full_band_s = worker.analyze_streaming(model)
+
+        np.testing.assert_array_equal(freq, freq_s)
+        for key in [(0, 0), (0, 1)]:
+            # Low bands are averaged over too few windows to compare
+            high = freq > 100
+            np.testing.assert_allclose(spectrum_s[key].astype(float)[high],
+                                       np.array(spectrum[key])[high],
+                                       atol=0.5)
+            self.assertAlmostEqual(full_band_s[key[0]][key[1]],
+                                   full_band[key[0]][key[1]], 2)
+        self.assertTrue(np.isnan(full_band_s[1][0]))
+
+    def test_streaming_contrast(self):
+        """Block by block vs. cell by cell, with a cell 20 dB quieter than
+        the other one, visited alternately. The filter transient at every
+        change of cell is left out (see dsp.settling_time), so the loud
+        cell does not leak into the quiet one."""
+        model = self.model
+        model.fps = 30
+        fs = model.audio_fs
+        stay = int(1.5 * fs)
+
+        samples = np.arange(len(model.audio_data))
+        model.audio_data = model.audio_data * np.where(
+            samples // stay % 2 == 0, 1, 0.1).astype(np.float32)
+
+        frames = int(len(model.audio_data) / fs * model.fps)
+        t = np.arange(frames) / model.fps
+        model.data_x = np.where(t // 1.5 % 2 == 0, 25., 75.)
+        model.data_y = np.full(frames, 25.)
+
+        worker = DspThread(workers=1)
+        segments = worker.segment_audio(model, worker.segment_video(model))
+        freq, spectrum = worker.analyze(model, segments)
+        freq_s, spectrum_s, _ = worker.analyze_streaming(model)
+
+        # Low bands are averaged over too few windows to compare
+        high = freq > 100
+        for key in [(0, 0), (0, 1)]:
+            np.testing.assert_allclose(spectrum_s[key][high],
+                                       np.array(spectrum[key])[high],
+                                       atol=0.75)
+
+        # Without leaving the transient out, the quiet cell is dominated
+        # by the loud one in the low bands
+        ids = worker.cell_of_frames(model.grid, model.data_x, model.data_y)
+        leaky = model.frame_energy.regroup(ids, 4).spl()[1]
+        self.assertGreater((leaky - np.array(spectrum[0, 1]))[high].max(), 3)
+
+    def test_regrid(self):
+        """A new grid from the energies of the frames vs. analyzing the
+        audio again with that grid."""
+        model = self.model
+        model.fps = 30
+        model.frame_size = [100, 100]
+        frames = int(len(model.audio_data) / model.audio_fs * model.fps)
+        model.data_x = np.linspace(10, 90, frames)
+        model.data_y = np.full(frames, 40.)
+
+        worker = DspThread(workers=1)
+        worker.analyze_streaming(model)
+
+        status = []
+        worker.update_status.connect(status.append)
+        worker.regrid(model, [1, 3, 0])
+        self.assertEqual(status, [])
+
+        expected = DisplayResultsModel()
+        expected.grid = Grid([100, 100], 1, 3, 0)
+        for name in ['audio_fs', 'fps', 'freq_range', 'audio_data',
+                     'data_x', 'data_y']:
+            setattr(expected, name, getattr(model, name))
+        freq, spectrum, full_band = worker.analyze_streaming(expected)
+
+        np.testing.assert_array_equal(model.freq, freq)
+        np.testing.assert_allclose(model.spectrum.astype(float),
+                                   spectrum.astype(float))
+        np.testing.assert_allclose(model.full_band_spec, full_band)
+
+        # Finer than the path: cells without audio
+        worker.regrid(model, [2, 3, 0])
+        self.assertTrue(np.isnan(model.full_band_spec[1]).all())
+        self.assertTrue(np.isnan(model.spectrum[1].astype(float)).all())
+
+    def test_regrid_without_frames(self):
+        """Without the energies of the frames (e.g., results from the
+        results cache), the first new grid computes them, and the next
+        ones only re-bin them."""
+        model = self.model
+        model.fps = 30
+        model.frame_size = [100, 100]
+        frames = int(len(model.audio_data) / model.audio_fs * model.fps)
+        model.data_x = np.linspace(10, 90, frames)
+        model.data_y = np.full(frames, 40.)
+
+        filtered = []
+
+        class Worker(DspThread):
+            def frame_energies(self, model):
+                filtered.append(model)
+                return super().frame_energies(model)
+
+        worker = Worker(workers=1)
+        worker.regrid(model, [1, 3, 0])
+        worker.regrid(model, [2, 2, 0])
+        self.assertEqual(len(filtered), 1)
+        self.assertEqual(model.frame_energy.power.shape[0], frames)
+
+        expected = DisplayResultsModel()
+        expected.grid = Grid([100, 100], 2, 2, 0)
+        for name in ['audio_fs', 'fps', 'freq_range', 'audio_data',
+                     'data_x', 'data_y']:
+            setattr(expected, name, getattr(model, name))
+        freq, spectrum, full_band = DspThread(
+            workers=1).analyze_streaming(expected)
+
+        np.testing.assert_allclose(model.spectrum.astype(float),
+                                   spectrum.astype(float))
+        np.testing.assert_allclose(model.full_band_spec, full_band)
+
+    def test_frame_starts(self):
+        fs, fps = 48000, 30
+        self.assertEqual(DspThread.frame_starts(3, fs, fps).tolist(),
+                         [0, 1600, 3200, 4800])
+
+        # Camera with jitter, started 0.5 s after the audio. Blocks of 512
+        # samples, in the same clock
+        rng = np.random.default_rng(1)
+        frame_times = 10.5 + np.cumsum(rng.uniform(0.02, 0.05, 300))
+        samples = np.arange(0, 20 * fs, 512)
+        audio_times = (samples, 10 + samples / fs)
+
+        starts = DspThread.frame_starts(300, fs, fps, frame_times,
+                                        audio_times)
+
+        expected = np.round((frame_times - 10) * fs)
+        np.testing.assert_array_equal(starts[:-1], expected)
+        self.assertEqual(len(starts), 301)
+
+        # Frames before the first block: from sample 0
+        starts = DspThread.frame_starts(300, fs, fps, frame_times - 10.6,
+                                        audio_times)
+        self.assertEqual(starts[0], 0)
+        self.assertTrue((np.diff(starts) >= 0).all())
+
+    def test_timestamps(self):
+        """Cells segmented from the timestamps, not from the average fps.
+        """
+        model = self.model
+        model.fps = 30
+        fs = model.audio_fs
+        # First half of the frames at 60 fps, second half at 20 fps
+        frame_times = np.concatenate((np.arange(100) / 60,
+                                      100/60 + np.arange(100) / 20))
+        model.data_t = frame_times
+        model.audio_times = (np.array([0]), np.array([0.]))
+        model.data_x = np.where(np.arange(200) < 100, 25., 75.)
+        model.data_y = np.full(200, 25.)
+
+        worker = DspThread(workers=1)
+        segments = worker.segment_audio(model, worker.segment_video(model))
+
+        self.assertEqual(segments[(0, 0)], [(0, round(100/60 * fs))])
+        self.assertEqual(segments[(0, 1)][0][0], round(100/60 * fs))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from app.package.services.blit import BarBlitter
+
+
+def bar_chart(freq, spl):
+    fig = Figure(figsize=(4, 3), dpi=80)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    # As in the stylesheet of the app: the bars, animated, are always
+    # drawn over the grid
+    ax.set_axisbelow(True)
+    ax.grid(which='both')
+    bars = ax.bar(freq, spl, width=freq/6)
+    ax.set_xscale('log')
+    ax.set_ylim(30, 100)
+    return canvas, ax, bars
+
+
+class TestBarBlitter(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.freq = np.geomspace(25, 20000, 30)
+        self.spl = rng.uniform(40, 90, (5, 30))
+        self.spl[3, 4] = np.nan
+
+    def test_same_as_draw(self):
+        canvas, ax, bars = bar_chart(self.freq, self.spl[0])
+        blitter = BarBlitter(canvas, ax, bars)
+        canvas.draw()
+
+        for spl in self.spl[1:]:
+            blitter.update(spl)
+
+            expected, _, _ = bar_chart(self.freq, spl)
+            expected.draw()
+
+            np.testing.assert_array_equal(np.asarray(canvas.buffer_rgba()),
+                                          np.asarray(expected.buffer_rgba()))
+
+        self.assertEqual(blitter.blits, len(self.spl) - 1)
+        self.assertEqual(blitter.draws, 0)
+
+    def test_draw_before_background(self):
+        canvas, ax, bars = bar_chart(self.freq, self.spl[0])
+        blitter = BarBlitter(canvas, ax, bars)
+
+        # No full draw yet => nothing to blit over
+        blitter.update(self.spl[1])
+        self.assertEqual(blitter.draws, 1)
+
+        blitter.update(self.spl[2])
+        self.assertEqual(blitter.blits, 1)
+
+    def test_disconnect(self):
+        canvas, ax, bars = bar_chart(self.freq, self.spl[0])
+        blitter = BarBlitter(canvas, ax, bars)
+        blitter.disconnect()
+        canvas.draw()
+
+        blitter.update(self.spl[1])
+        self.assertEqual(blitter.draws, 1)
+        self.assertEqual(blitter.blits, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
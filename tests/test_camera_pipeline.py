@@ -0,0 +1,112 @@
+import time
+import unittest
+import cv2
+import numpy as np
+
+from app.package.services.CameraThread import CameraThread
+from app.package.services.grid import Grid
+from app.package.services.live import LiveSpectrum
+from app.package.services.mask import TRACKING_COLOR
+
+size = (720, 1280)
+
+
+class FakeCamera:
+    """VideoCapture of frames with the marker at known positions. It
+    starts the recording on the first frame."""
+
+    def __init__(self, positions, on_start, fps=100):
+        self.positions = list(positions)
+        self.on_start = on_start
+        self.interval = 1/fps
+        self.grabbed = 0
+
+    def grab(self):
+        if self.grabbed == len(self.positions):
+            return False
+        if self.grabbed == 0:
+            self.on_start()
+        time.sleep(self.interval)
+        self.grabbed += 1
+        return True
+
+    def retrieve(self):
+        frame = np.full((*size, 3), 90, dtype=np.uint8)
+        x, y = self.positions[self.grabbed - 1]
+        cv2.circle(frame, (x, y), 40, TRACKING_COLOR, -1)
+        return True, frame
+
+    def release(self):
+        pass
+
+
+class SlowCameraThread(CameraThread):
+    """Its previews take longer than the interval between frames."""
+
+    def __init__(self, positions):
+        super().__init__()
+        self.setRows(4)
+        self.setCols(4)
+        self.setPadding(0)
+        self.camera = FakeCamera(positions, self.rec)
+
+    def setup_camera(self):
+        self.frame_size = np.array(size)
+        self._grid = Grid(self.frame_size, self.rows, self.cols,
+                          padding=self.padding)
+        return self.camera
+
+    def process_frame(self, frame):
+        time.sleep(0.05)
+        return super().process_frame(frame)
+
+
+class TestCameraPipeline(unittest.TestCase):
+
+    def test_no_position_lost(self):
+        positions = [(100 + 10*i, 200 + 5*i) for i in range(40)]
+        thread = SlowCameraThread(positions)
+        thread.live = LiveSpectrum(48000, [20, 20000], 4, 4)
+
+        previews = []
+        thread.update_frame.connect(previews.append)
+        results = []
+        thread.on_stop_recording.connect(results.append)
+        setups = []
+        thread.on_camera_caracteristics_detected.connect(setups.append)
+
+        thread.run()
+
+        # Every frame was tracked, in order, although most of the
+        # previews were skipped
+        data = results[0]
+        self.assertEqual(len(data['x_data']), len(positions))
+        np.testing.assert_allclose(data['x_data'], [p[0] for p in positions],
+                                   atol=6)
+        np.testing.assert_allclose(data['y_data'], [p[1] for p in positions],
+                                   atol=6)
+        self.assertTrue(np.all(np.diff(data['t_data']) > 0))
+        self.assertLess(len(previews), len(positions) / 2)
+
+        # The time between captures is added to the cell of every frame
+        t = data['t_data']
+        self.assertAlmostEqual(thread.times.sum(), t[-1] - t[0])
+        rows, cols = thread._grid.locate_points(data['x_data'][1:],
+                                                data['y_data'][1:])
+        self.assertEqual(set(zip(*np.nonzero(thread.times))),
+                         set(zip(rows, cols)))
+
+        # The live analysis knows the cell of every frame at its capture
+        # time, although the processing lags behind the capture
+        rows, cols = thread._grid.locate_points(data['x_data'],
+                                                data['y_data'])
+        np.testing.assert_array_equal(thread.live.cells_at(np.array(t)),
+                                      rows * 4 + cols)
+
+        # The frame rate is that of the capture, not of the processing
+        fps = setups[0][2]
+        self.assertGreater(fps, 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
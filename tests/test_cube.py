@@ -0,0 +1,70 @@
+import unittest
+import warnings
+import numpy as np
+
+from app.package.services.cube import (spectrum_cube, band_limits,
+                                       plot_limits)
+from app.package.models.DisplayResultsModel import DisplayResultsModel
+
+
+class TestCube(unittest.TestCase):
+
+    def setUp(self):
+        # 2 x 2 cells, 3 bands. (0, 1) without audio
+        self.spectrum = [[[50., 60., 70.], []],
+                         [[40., 65., 80.], [45., np.nan, 75.]]]
+
+    def test_spectrum_cube(self):
+        cube = spectrum_cube(np.array(self.spectrum, dtype=object))
+
+        self.assertEqual(cube.dtype, np.float32)
+        self.assertEqual(cube.shape, (2, 2, 3))
+        self.assertTrue(np.isnan(cube[0, 1]).all())
+        np.testing.assert_array_equal(cube[1, 0], [40, 65, 80])
+
+        # Dense input
+        np.testing.assert_array_equal(spectrum_cube(cube), cube)
+        self.assertEqual(spectrum_cube([[[], []]], 3).shape, (1, 2, 3))
+
+    def test_band_limits(self):
+        low, high = band_limits(spectrum_cube(self.spectrum))
+        np.testing.assert_array_equal(low, [40, 60, 70])
+        np.testing.assert_array_equal(high, [50, 65, 80])
+
+        low, high = band_limits(np.full((2, 2, 1), np.nan))
+        self.assertTrue(np.isnan(low).all() and np.isnan(high).all())
+
+    def test_plot_limits(self):
+        low, high = plot_limits(*band_limits(spectrum_cube(self.spectrum)),
+                                (40, 90))
+        self.assertAlmostEqual(low, 36)
+        self.assertAlmostEqual(high, 88)
+
+        # No cell with audio
+        nan = np.full(3, np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            self.assertEqual(plot_limits(nan, nan, (40, 90)), (40, 90))
+            self.assertEqual(plot_limits([], [], (40, 90)), (40, 90))
+
+    def test_model(self):
+        model = DisplayResultsModel()
+        model.freq = [100, 200, 400]
+        model.spectrum = self.spectrum
+        model.full_band_spec = [[72., np.nan], [82., 77.]]
+
+        np.testing.assert_array_equal(model.valid,
+                                      [[True, False], [True, True]])
+        np.testing.assert_array_equal(model.band(2), [[60, np.nan],
+                                                      [65, np.nan]])
+        self.assertIs(model.band(0), model.full_band_spec)
+        np.testing.assert_array_equal(model.band_max, [50, 65, 80])
+
+        # Widened to the levels (40 - 82 dB), never narrowed
+        self.assertEqual((model.min_db, model.max_db), (40, 90))
+        model.full_band_spec = [[95.5, np.nan], [30.2, 77.]]
+        self.assertEqual((model.min_db, model.max_db), (30, 96))
+
+
+if __name__ == '__main__':
+    unittest.main()
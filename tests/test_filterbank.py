@@ -0,0 +1,83 @@
+import numpy as np
+import unittest
+
+from scipy import signal
+
+from app.package.services import PyOctaveBand
+
+
+def per_band_spl(x, fs, fraction=3, order=6, limits=[12, 20000]):
+    """Reference: every band decimates the full-rate signal on its own,
+    with the largest integer factor allowed (up to 50)."""
+    freq, freq_d, freq_u = PyOctaveBand._genfreqs(limits, fraction, fs)
+    factor = np.floor((fs / 2.1) / np.array(freq_u)).astype(int)
+    factor = np.clip(factor, 1, 50)
+    sos = PyOctaveBand._buttersosfilter(freq, freq_d, freq_u, fs, order,
+                                        factor)
+
+    spl = []
+    for idx in range(len(freq)):
+        sd = x
+        if factor[idx] > 1:
+            sd = signal.decimate(x, factor[idx], ftype='fir')
+        y = signal.sosfilt(sos[idx], sd)
+        spl.append(20 * np.log10(np.std(y) / 2e-5))
+    return np.array(spl)
+
+
+class TestFilterBank(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = 48000
+        self.x = np.random.default_rng(0).random(2**14) * 2 - 1
+
+    def test_cache(self):
+        bank_a = PyOctaveBand.get_filterbank(self.fs, 3, 6, [12, 20000])
+        bank_b = PyOctaveBand.get_filterbank(self.fs, 3, 6, (12, 20000))
+        bank_c = PyOctaveBand.get_filterbank(self.fs, 1, 6, [12, 20000])
+
+        self.assertIs(bank_a, bank_b)
+        self.assertIsNot(bank_a, bank_c)
+
+    def test_octavefilter_wrapper(self):
+        spl, freq = PyOctaveBand.octavefilter(self.x, self.fs, 3, 6,
+                                              [20, 20000])
+        bank = PyOctaveBand.OctaveFilterBank(self.fs, 3, 6, [20, 20000])
+
+        self.assertEqual(freq, bank.freq)
+        self.assertEqual(len(spl), len(bank))
+        np.testing.assert_array_almost_equal(spl, bank.spl(self.x))
+
+    def test_decimation_tree(self):
+        """Decimation tree vs. independent per-band decimation. See
+        OctaveFilterBank._decimationtree for the tolerance."""
+        x = np.random.default_rng(1).random(2**16) * 2 - 1
+        bank = PyOctaveBand.get_filterbank(self.fs, 3, 6, [12, 20000])
+
+        self.assertTrue((np.log2(bank.factor) % 1 == 0).all())
+        np.testing.assert_allclose(bank.spl(x), per_band_spl(x, self.fs),
+                                   atol=0.5)
+
+    def test_stream(self):
+        """Filtering in blocks must not depend on the block size, and must
+        give the same levels as filtering the whole signal at once."""
+        x = np.random.default_rng(2).random(48000 * 10) * 2 - 1
+        bank = PyOctaveBand.get_filterbank(self.fs, 3, 6, [20, 20000])
+
+        energies = []
+        for block_size in [4096, 10007]:
+            stream = PyOctaveBand.OctaveFilterStream(bank)
+            energy, count = 0, 0
+            for i in range(0, len(x), block_size):
+                block = x[i:i+block_size]
+                e, c = stream.energy(block, np.zeros(len(block), int), 1)
+                energy, count = energy + e, count + c
+            energies.append(energy)
+
+        np.testing.assert_allclose(energies[0], energies[1])
+        spl = 10 * np.log10(energies[0] / count / 2e-5**2)[0]
+        np.testing.assert_allclose(spl, bank.spl(x), atol=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -66,6 +66,26 @@ class TestGrid(unittest.TestCase):
                 f' Result: {actual}\n' +
                 f' Should have been in grid: {result}')
 
+    def test_locate_points(self):
+        """The vectorized version must agree with locate_point, and flag
+        the points out of the grid and the NaN ones."""
+        for grid in self.grids:
+            xs = np.array([0, 15, 150.5, 299, 300, np.nan, 45, -1])
+            ys = np.array([0, 15, 200.2, 399, 400, 30, np.nan, 50])
+
+            rows, cols = grid.locate_points(xs, ys)
+
+            for x, y, row, col in zip(xs, ys, rows, cols):
+                result = grid.locate_point([x, y])
+                if result is None:
+                    self.assertEqual(row, Grid.OUTSIDE)
+                    self.assertEqual(col, Grid.OUTSIDE)
+                else:
+                    np.testing.assert_array_equal(result, [row, col])
+
+            self.assertEqual(rows[5], Grid.OUTSIDE)
+            self.assertEqual(cols[6], Grid.OUTSIDE)
+
     def test_regions(self):
         tests = [{
             'grid': Grid([300, 100], 3, 1, 0),
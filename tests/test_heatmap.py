@@ -0,0 +1,114 @@
+import unittest
+import numpy as np
+
+from app.package.services import imbasic as imb
+from app.package.services import heatmap
+from app.package.services.grid import Grid
+
+
+def draw_cells(img, spl, grid, lut, min_db, max_db):
+    """Reference: one blended rectangle per cell, in full resolution."""
+    for irow, row in enumerate(spl):
+        for icol, value in enumerate(row):
+            if np.isnan(value):
+                continue
+            pt1, pt2 = grid.get_region([irow, icol])
+            index = int((value-min_db)*len(lut) / (max_db-min_db)) - 1
+            index = np.clip(index, 0, len(lut) - 1)
+            img = imb.draw_filled_rectangle(img, pt1, pt2, lut[index], 0.6)
+    return img
+
+
+class TestHeatmap(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.grid = Grid([300, 500], 6, 7, padding=13)
+        self.img = rng.integers(0, 256, (300, 500, 3), dtype=np.uint8)
+        self.spl = rng.uniform(40, 90, (6, 7))
+        self.spl[2, 3] = np.nan
+        self.lut = heatmap.create_color_map()
+
+    def test_same_as_rectangles(self):
+        expected = draw_cells(self.img.copy(), self.spl, self.grid,
+                              self.lut, 40, 90)
+        result = heatmap.draw_map(self.img.copy(), self.spl, self.grid,
+                                  self.lut, 40, 90)
+
+        diff = np.abs(result.astype(int) - expected.astype(int))
+        self.assertLessEqual(diff.max(), 1)
+
+    def test_resized(self):
+        small, sf = imb.resize(self.img, width=200, return_scale_factor=True)
+        result = heatmap.draw_map(small.copy(), self.spl, self.grid,
+                                  self.lut, 40, 90)
+
+        # Pixels are colored as the cell under them (see locate_point)
+        rows, cols = heatmap.pixel_cells(self.grid, small.shape)
+        for y, x in [(10, 10), (60, 100), (57, 92), (110, 190)]:
+            cell = self.grid.locate_point([(x + 0.5)/sf, (y + 0.5)/sf])
+            if cell is None:
+                self.assertIn(Grid.OUTSIDE, (rows[y], cols[x]))
+                np.testing.assert_array_equal(result[y, x], small[y, x])
+            else:
+                self.assertEqual((rows[y], cols[x]), tuple(cell))
+
+    def test_nan(self):
+        result = heatmap.draw_map(self.img.copy(), self.spl, self.grid,
+                                  self.lut, 40, 90)
+        (x1, y1), (x2, y2) = self.grid.get_region([2, 3])
+        np.testing.assert_array_equal(result[y1:y2, x1:x2],
+                                      self.img[y1:y2, x1:x2])
+        # Padding zone
+        np.testing.assert_array_equal(result[:13], self.img[:13])
+
+
+class TestMapRenderer(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.grid = Grid([300, 500], 6, 7, padding=13)
+        self.img = rng.integers(0, 256, (300, 500, 3), dtype=np.uint8)
+        self.spectrum = rng.uniform(40, 90, (6, 7, 3))
+        self.renderer = heatmap.MapRenderer(heatmap.create_color_map())
+        self.renderer.set_background(self.img)
+
+    def test_render(self):
+        result = self.renderer.render(self.grid, 200, 1,
+                                      self.spectrum[:, :, 0], 40, 90)
+
+        base = imb.resize(self.img, width=200)
+        self.grid.draw_scaled_grid(base)
+        expected = heatmap.draw_map(base, self.spectrum[:, :, 0], self.grid,
+                                    self.renderer.lut, 40, 90)
+
+        np.testing.assert_array_equal(result, expected)
+        self.assertAlmostEqual(self.renderer.scale_factor, 200/500)
+
+    def test_cache(self):
+        base = self.renderer.base(self.grid, 200)
+        for band in range(3):
+            self.renderer.render(self.grid, 200, band,
+                                 self.spectrum[:, :, band], 40, 90)
+        self.assertIs(self.renderer.base(self.grid, 200), base)
+        self.assertEqual(len(self.renderer._maps), 3)
+
+        # Memoized: other levels under the same key are not drawn
+        again = self.renderer.render(self.grid, 200, 0,
+                                     self.spectrum[:, :, 1], 40, 90)
+        first = self.renderer.render(self.grid, 200, 0,
+                                     self.spectrum[:, :, 0], 40, 90)
+        np.testing.assert_array_equal(again, first)
+
+        self.renderer.clear_maps()
+        self.assertEqual(len(self.renderer._maps), 0)
+
+        # Resize and new grid => new base layer
+        self.assertIsNot(self.renderer.base(self.grid, 300), base)
+        base = self.renderer.base(self.grid, 300)
+        self.grid.config(3, 3, pad=0)
+        self.assertIsNot(self.renderer.base(self.grid, 300), base)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import time
+import threading
+import numpy as np
+import unittest
+
+from app.package.services import dsp
+from app.package.services.live import LiveSpectrum, calibration_gain
+from app.package.models.ActualProjectModel import ActualProjectModel
+
+
+class TestLiveSpectrum(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = 48000
+        self.limits = [20, 20000]
+        self.block = 512
+        # Four seconds of stereo audio, one second per cell of a 2x2 grid
+        self.audio = np.random.default_rng(0).uniform(
+            -0.5, 0.5, (4 * self.fs, 2)).astype(np.float32)
+        self.cells = np.arange(len(self.audio)) // self.fs
+
+    def test_live_equals_offline(self):
+        live = LiveSpectrum(self.fs, self.limits, 2, 2, gain=0.5)
+
+        start = time.perf_counter()
+        for first in range(0, len(self.audio), self.block):
+            # The camera moves the microphone to the next cell
+            live.set_cell(*divmod(self.cells[first], 2))
+            live.add(self.audio[first:first+self.block])
+        live.flush()
+        elapsed = time.perf_counter() - start
+
+        # Faster than real time
+        self.assertLess(elapsed, len(self.audio) / self.fs)
+
+        # Every block belongs to the cell where it starts
+        labels = self.cells[np.arange(len(self.audio)) //
+                            self.block * self.block]
+        offline = dsp.BandEnergy(self.fs, self.limits, 4)
+        offline.add(self.audio.astype(float).sum(axis=1) * 0.5, labels)
+
+        self.assertEqual(live.freq, offline.freq)
+        np.testing.assert_allclose(live.spl(),
+                                   offline.spl().reshape(2, 2, -1),
+                                   atol=1e-6)
+        np.testing.assert_allclose(live.full_band(),
+                                   offline.full_band().reshape(2, 2),
+                                   atol=1e-6)
+        np.testing.assert_allclose(live.seconds().sum(), 4)
+
+    def test_timed(self):
+        live = LiveSpectrum(self.fs, self.limits, 2, 2)
+        start = 100.0
+        chunk = 2**15
+        fps = 30
+
+        # Positions at 30 fps, delivered 0.3 s late; audio in chunks
+        # longer than a block, across the changes of cell
+        frames = np.arange(4 * fps)
+        shown = 0
+        for first in range(0, len(self.audio), chunk):
+            now = start + first / self.fs
+            while shown < len(frames) and frames[shown] / fps < now - 0.3:
+                live.set_cell(*divmod(frames[shown] // fps, 2),
+                              time=start + frames[shown] / fps)
+                shown += 1
+            live.add(self.audio[first:first+chunk], now)
+
+        for frame in frames[shown:]:
+            live.set_cell(*divmod(frame // fps, 2), time=start + frame / fps)
+        live.flush()
+
+        # Every sample belongs to the cell at its time
+        offline = dsp.BandEnergy(self.fs, self.limits, 4)
+        offline.add(self.audio.astype(float).sum(axis=1), self.cells)
+
+        np.testing.assert_allclose(live.spl(),
+                                   offline.spl().reshape(2, 2, -1),
+                                   atol=1e-6)
+        np.testing.assert_allclose(live.seconds(), np.ones((2, 2)))
+
+    def test_thread(self):
+        """Blocks queued from a buffer the recorder reuses, analyzed in
+        the thread of the analysis, faster than real time."""
+        live = LiveSpectrum(self.fs, self.limits, 2, 2)
+        start = 100.0
+        chunk = 2**15
+        fps = 30
+
+        for frame in range(4 * fps):
+            live.set_cell(*divmod(frame // fps, 2), time=start + frame / fps)
+
+        buffer = np.empty((chunk, 2), dtype=np.float32)
+        began = time.perf_counter()
+        for first in range(0, len(self.audio), chunk):
+            block = self.audio[first:first+chunk]
+            buffer[:len(block)] = block
+            self.assertTrue(live.put(buffer[:len(block)],
+                                     start + first / self.fs))
+            buffer[:] = 0
+        live.stop()
+        elapsed = time.perf_counter() - began
+
+        self.assertLess(elapsed, len(self.audio) / self.fs)
+        self.assertEqual(live.dropped, 0)
+        offline = dsp.BandEnergy(self.fs, self.limits, 4)
+        offline.add(self.audio.astype(float).sum(axis=1), self.cells)
+        np.testing.assert_allclose(live.spl(),
+                                   offline.spl().reshape(2, 2, -1),
+                                   atol=1e-6)
+
+    def test_drop(self):
+        """A full queue drops the blocks of the analysis, without
+        waiting."""
+        release = threading.Event()
+
+        class SlowLive(LiveSpectrum):
+            queue_size = 2
+
+            def add(self, block, time=None):
+                release.wait()
+                super().add(block, time)
+
+        live = SlowLive(self.fs, self.limits, 2, 2)
+        live.set_cell(0, 0)
+        queued = [live.put(self.audio[i*self.block:(i+1)*self.block])
+                  for i in range(10)]
+        self.assertFalse(all(queued))
+        self.assertEqual(live.dropped, queued.count(False) * self.block)
+
+        release.set()
+        live.stop()
+        self.assertAlmostEqual(live.seconds()[0, 0],
+                               sum(queued) * self.block / self.fs)
+
+    def test_before_first_position(self):
+        live = LiveSpectrum(self.fs, self.limits, 2, 2)
+        # Its cell is not known yet => it waits
+        live.add(self.audio[:self.fs//2], 10.0)
+        self.assertEqual(live.seconds().sum(), 0)
+
+        live.set_cell(1, 0, time=10.25)
+        live.flush()
+        np.testing.assert_allclose(live.seconds(), [[0, 0], [0.25, 0]])
+
+    def test_outside(self):
+        live = LiveSpectrum(self.fs, self.limits, 2, 2)
+        live.set_cell(0, 1)
+        live.add(self.audio[:self.fs])
+        live.set_cell(None, None)
+        live.add(self.audio[self.fs:])
+        live.flush()
+
+        levels = live.full_band()
+        self.assertTrue(np.isfinite(levels[0, 1]))
+        self.assertEqual(np.isnan(levels).sum(), 3)
+
+    def test_calibration_gain(self):
+        ActualProjectModel.calibration = {'actual': 90, 'expected': 94}
+        try:
+            calibration = np.power(10, 4/20)
+            self.assertAlmostEqual(calibration_gain(1), calibration)
+            self.assertAlmostEqual(calibration_gain(2),
+                                   calibration * np.power(10, -6/20))
+        finally:
+            ActualProjectModel.calibration = {'actual': -1, 'expected': -1}
+
+
+if __name__ == '__main__':
+    unittest.main()
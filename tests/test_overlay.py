@@ -0,0 +1,71 @@
+import unittest
+import numpy as np
+
+from app.package.services import imbasic as imb
+from app.package.services.grid import Grid
+from app.package.services.overlay import CoverageOverlay, coverage_colors
+
+
+def draw_regions(frame, coverage, grid):
+    """Reference: one blended rectangle per region."""
+    colors, alphas = coverage_colors(coverage)
+    for row in range(grid.number_of_rows):
+        for col in range(grid.number_of_cols):
+            pt1, pt2 = grid.get_region([row, col])
+            imb.draw_filled_rectangle(frame, pt1, pt2,
+                                      colors[row, col].tolist(),
+                                      alphas[row, col])
+    return frame
+
+
+class TestCoverageOverlay(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.grid = Grid([360, 640], 7, 9, padding=20)
+        self.frame = rng.integers(0, 256, (360, 640, 3), dtype=np.uint8)
+        self.coverage = rng.integers(0, 51, (7, 9)) / 50
+
+    def test_same_as_rectangles(self):
+        expected = draw_regions(self.frame.copy(), self.coverage, self.grid)
+
+        overlay = CoverageOverlay(self.grid)
+        self.assertTrue(overlay.update(self.coverage))
+        result = overlay.apply(self.frame.copy())
+
+        diff = np.abs(result.astype(int) - expected.astype(int))
+        self.assertLessEqual(diff.max(), 2)
+        # Padding zone untouched
+        np.testing.assert_array_equal(result[:20], self.frame[:20])
+
+    def test_update(self):
+        overlay = CoverageOverlay(self.grid)
+        overlay.update(self.coverage)
+        layer = overlay.layer.copy()
+
+        # Below the quantization step => nothing to redraw
+        self.assertFalse(overlay.update(self.coverage + 0.001))
+
+        self.coverage[3, 4] = 1 - self.coverage[3, 4]
+        self.assertTrue(overlay.update(self.coverage))
+        (x1, y1), (x2, y2) = self.grid.get_region([3, 4])
+        changed = np.any(overlay.layer != layer, axis=2)
+        self.assertTrue(changed[y1:y2, x1:x2].all())
+        changed[y1:y2, x1:x2] = False
+        self.assertFalse(changed.any())
+
+    def test_new_grid(self):
+        overlay = CoverageOverlay(self.grid)
+        overlay.update(self.coverage)
+
+        self.grid.config(3, 3, pad=0)
+        coverage = np.zeros((3, 3))
+        overlay.update(coverage)
+        expected = draw_regions(self.frame.copy(), coverage, self.grid)
+        result = overlay.apply(self.frame.copy())
+        self.assertLessEqual(np.abs(result.astype(int) -
+                                    expected.astype(int)).max(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import numpy as np
+import unittest
+
+from app.package.services import file as fileutils
+from app.package.services.load_project import LoadFilesWorker
+from app.package.models.DisplayResultsModel import DisplayResultsModel
+
+
+class TestProjectFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp.name, 'Position Data')
+        self.x = np.array([np.nan, 1.5, 2, 3])
+        self.y = np.array([4, 5, 6.5, np.nan])
+        self.t = np.array([0.1, 0.13, 0.17, 0.2])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def load(self):
+        worker = LoadFilesWorker()
+        received = []
+        worker.send_data.connect(received.append)
+        worker.send_grid.connect(received.append)
+        worker.load_position_data(self.tmp.name)
+
+        model = DisplayResultsModel()
+        worker.load_frame_size(self.tmp.name, model)
+        return received, model
+
+    def test_bundle(self):
+        fileutils.save_bundle({'x': self.x, 'y': self.y}, self.data_dir,
+                              'position', grid=[2, 3, 10])
+
+        data, header = fileutils.load_bundle(self.data_dir, 'position',
+                                             mmap=True)
+        self.assertIsInstance(data['x'], np.memmap)
+        np.testing.assert_array_equal(data['y'], self.y)
+        self.assertEqual(header, {'grid': [2, 3, 10]})
+        self.assertIsNone(fileutils.load_bundle(self.data_dir, 'other'))
+
+    def test_load_binary_and_text(self):
+        fileutils.save_bundle({'x': self.x, 'y': self.y, 't': self.t},
+                              self.data_dir, 'position', grid=[2, 3, 10])
+        fileutils.save_bundle({}, self.data_dir, 'camera',
+                              frame_size=[480, 640], fps=29.5)
+        binary, binary_model = self.load()
+
+        for name in os.listdir(self.data_dir):
+            os.remove(os.path.join(self.data_dir, name))
+
+        fileutils.save_np_to_txt(self.x, self.data_dir, 'data.x')
+        fileutils.save_np_to_txt(self.y, self.data_dir, 'data.y')
+        fileutils.save_np_to_txt([2, 3, 10], self.data_dir, 'grid.config')
+        fileutils.save_np_to_txt([480, 640, 29.5], self.data_dir,
+                                 'camera.data')
+        text, text_model = self.load()
+
+        for (x, y, _), model in [(binary[0], binary_model),
+                                 (text[0], text_model)]:
+            np.testing.assert_array_equal(x, self.x)
+            np.testing.assert_array_equal(y, self.y)
+            self.assertEqual(model.frame_size, [480, 640])
+            self.assertEqual(model.fps, 29.5)
+        # Only binary projects have timestamps
+        np.testing.assert_array_equal(binary[0][2], self.t)
+        self.assertEqual(len(text[0][2]), 0)
+        self.assertEqual(list(binary[1]), [2, 3, 10])
+        self.assertEqual(list(text[1]), [2, 3, 10])
+
+
+if __name__ == '__main__':
+    unittest.main()
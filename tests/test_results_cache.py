@@ -0,0 +1,210 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import unittest
+
+from scipy.io import wavfile
+
+from app.package.services import results_cache
+from app.package.services.DspThread import DspThread
+from app.package.services.grid import Grid
+from app.package.services.wav import WavAudio
+from app.package.models.ActualProjectModel import ActualProjectModel
+from app.package.models.DisplayResultsModel import DisplayResultsModel
+
+
+class CountingDspThread(DspThread):
+
+    filtered = 0
+
+    def frame_energies(self, model):
+        self.filtered += 1
+        return super().frame_energies(model)
+
+
+class TestResultsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        ActualProjectModel.project_location = self.tmp.name
+        ActualProjectModel.calibration = {'actual': -1, 'expected': -1}
+
+        self.fs = 48000
+        self.path = os.path.join(self.tmp.name, 'audio.wav')
+        audio = np.random.default_rng(0).uniform(-0.5, 0.5,
+                                                 (8 * self.fs, 2))
+        wavfile.write(self.path, self.fs, (audio * 2**15).astype(np.int16))
+
+        # Two seconds in every cell
+        self.data_x = np.repeat([25., 75., 25., 75.], 60)
+        self.data_y = np.repeat([25., 25., 75., 75.], 60)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def model(self):
+        model = DisplayResultsModel()
+        model.grid = Grid([100, 100], 2, 2, 0)
+        model.audio_data = WavAudio(self.path)
+        model.audio_fs = self.fs
+        model.fps = 30
+        model.freq_range = [20, 20000]
+        model.data_x = self.data_x.copy()
+        model.data_y = self.data_y.copy()
+        return model
+
+    def test_reopen(self):
+        worker = CountingDspThread(workers=1)
+
+        analyzed = self.model()
+        worker.process(analyzed)
+        cached = self.model()
+        worker.process(cached)
+
+        self.assertEqual(worker.filtered, 1)
+        np.testing.assert_array_equal(analyzed.freq, cached.freq)
+        np.testing.assert_array_equal(analyzed.spectrum.astype(float),
+                                      cached.spectrum.astype(float))
+        np.testing.assert_array_equal(analyzed.full_band_spec,
+                                      cached.full_band_spec)
+
+        # Other position => analyzed again
+        self.data_x[0] = 75.
+        worker.process(self.model())
+        self.assertEqual(worker.filtered, 2)
+
+    def test_new_grid(self):
+        """Reopening with another grid re-bins the cached frames."""
+        worker = CountingDspThread(workers=1)
+        worker.process(self.model())
+
+        model = self.model()
+        model.grid = Grid([100, 100], 1, 2, 0)
+        worker.process(model)
+        self.assertEqual(worker.filtered, 1)
+        self.assertIsInstance(model.frame_energy.power, np.memmap)
+
+        expected = self.model()
+        expected.grid = Grid([100, 100], 1, 2, 0)
+        DspThread(workers=1, cache=False).process(expected)
+        np.testing.assert_allclose(model.spectrum.astype(float),
+                                   expected.spectrum.astype(float),
+                                   rtol=1e-6)
+        self.assertEqual(model.frame_energy.power.shape,
+                         (len(model.data_x), len(model.freq)))
+
+    def test_frames_stage(self):
+        """Every analysis leaves the band energies of the frames in the
+        project, memory-mapped, even without using the cache."""
+        model = self.model()
+        DspThread(workers=1, cache=False).process(model)
+        self.assertIsInstance(model.frame_energy.power, np.memmap)
+        self.assertEqual(model.frame_energy.power.dtype, np.float32)
+
+        # Results in the cache, frames not (e.g., pruned) => computed
+        worker = CountingDspThread(workers=1)
+        worker.process(self.model())
+        path = results_cache.cache_dir(self.tmp.name)
+        frames = results_cache.frames_key(self.model(),
+                                          ActualProjectModel.calibration)
+        os.remove(os.path.join(path, f'{frames}.json'))
+
+        model = self.model()
+        worker.process(model)
+        self.assertEqual(worker.filtered, 1)
+        self.assertIsInstance(model.frame_energy.power, np.memmap)
+
+    def test_key(self):
+        calibration = {'actual': 90, 'expected': 94}
+        key = results_cache.results_key(self.model(), calibration)
+
+        self.assertEqual(
+            key, results_cache.results_key(self.model(), calibration))
+        audio = results_cache.audio_id(self.model().audio_data)
+        self.assertEqual(key, results_cache.results_key(
+            self.model(), calibration, audio))
+
+        changes = [lambda m: setattr(m, 'grid', Grid([100, 100], 2, 3, 0)),
+                   lambda m: setattr(m, 'freq_range', [20, 10000]),
+                   lambda m: m.data_y.__setitem__(3, 0.)]
+        for change in changes:
+            model = self.model()
+            change(model)
+            self.assertNotEqual(
+                key, results_cache.results_key(model, calibration))
+
+        self.assertNotEqual(key, results_cache.results_key(
+            self.model(), {'actual': 91, 'expected': 94}))
+        self.assertNotEqual(key, results_cache.results_key(
+            self.model(), calibration, fraction=6))
+
+        # One byte of the recording
+        with open(self.path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b'\x01')
+        self.assertNotEqual(
+            key, results_cache.results_key(self.model(), calibration))
+
+    def test_audio_id(self):
+        """Fingerprint of the contents: it follows the project when it is
+        moved, not the modification time, and the views of it differ."""
+        audio = WavAudio(self.path)
+        first = results_cache.audio_id(audio, self.tmp.name)
+
+        self.assertNotEqual(first, results_cache.audio_id(audio[1:]))
+        self.assertNotEqual(first, results_cache.audio_id(audio[:-1]))
+        self.assertNotEqual(first, results_cache.audio_id(audio.scaled(2)))
+        self.assertNotEqual(first, results_cache.audio_id(audio.to_mono()))
+
+        # Project copied somewhere else, with a new modification time
+        with tempfile.TemporaryDirectory() as moved:
+            path = shutil.copy(self.path, moved)
+            self.assertEqual(first, results_cache.audio_id(WavAudio(path),
+                                                           moved))
+
+        # Rewritten with the same size and modification time
+        stat = os.stat(self.path)
+        with open(self.path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b'\x01')
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertNotEqual(first, results_cache.audio_id(audio,
+                                                          self.tmp.name))
+
+    def test_prune(self):
+        spectrum = [[[1., 2.], []]]
+        for ii in range(3):
+            results_cache.save_results(self.tmp.name, f'key{ii}', [1, 2],
+                                       spectrum, [[1., np.nan]])
+            path = results_cache.cache_dir(self.tmp.name)
+            os.utime(os.path.join(path, f'key{ii}.json'), (ii, ii))
+
+        results_cache.prune(path, max_entries=2)
+
+        self.assertIsNone(results_cache.load_results(self.tmp.name, 'key0'))
+        self.assertEqual(sorted(os.listdir(path))[0], 'key1.freq.npy')
+        freq, sp, full_band = results_cache.load_results(self.tmp.name,
+                                                         'key2')
+        np.testing.assert_array_equal(sp[0].astype(float),
+                                      [[1., 2.], [np.nan, np.nan]])
+
+    def test_prune_used(self):
+        """A cache hit keeps the entry, although it was written first."""
+        path = results_cache.cache_dir(self.tmp.name)
+        for ii in range(3):
+            results_cache.save_results(self.tmp.name, f'key{ii}', [1, 2],
+                                       [[[1., 2.]]], [[1.]])
+            os.utime(os.path.join(path, f'key{ii}.json'), (ii, ii))
+
+        self.assertIsNotNone(results_cache.load_results(self.tmp.name,
+                                                        'key0'))
+        results_cache.prune(path, max_entries=2)
+
+        self.assertIsNone(results_cache.load_results(self.tmp.name, 'key1'))
+        self.assertIsNotNone(results_cache.load_results(self.tmp.name,
+                                                        'key0'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import threading
+import numpy as np
+import unittest
+
+from app.package.services.ringbuffer import RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.signal = np.arange(2000, dtype=np.float32).reshape(1000, 2)
+
+    def test_wrap_around(self):
+        ring = RingBuffer(300, 2)
+
+        out = []
+        for start in range(0, 1000, 100):
+            self.assertTrue(ring.write(self.signal[start:start+100]))
+            if len(ring) >= 250:
+                chunks = ring.peek(250)
+                self.assertLessEqual(len(chunks), 2)
+                out.extend(np.copy(chunk) for chunk in chunks)
+                ring.advance(250)
+        out.append(ring.read())
+
+        np.testing.assert_array_equal(np.concatenate(out), self.signal)
+        self.assertEqual(ring.overruns, 0)
+
+    def test_overrun(self):
+        ring = RingBuffer(250, 2)
+
+        written = [ring.write(self.signal[start:start+100])
+                   for start in range(0, 400, 100)]
+
+        self.assertEqual(written, [True, True, False, False])
+        self.assertEqual(ring.overruns, 2)
+        self.assertEqual(ring.dropped, 200)
+        np.testing.assert_array_equal(ring.read(), self.signal[:200])
+
+        # Room again
+        self.assertTrue(ring.write(self.signal[400:500]))
+
+    def test_threads(self):
+        """One producer, one consumer: every frame arrives once, in order.
+        """
+        ring = RingBuffer(128, 2)
+        signal = np.arange(2 * 10**4, dtype=np.float32).reshape(-1, 2)
+        blocks = np.array_split(signal, 200)
+
+        def produce():
+            for block in blocks:
+                while not ring.write(block):
+                    pass
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+
+        out = []
+        received = 0
+        while received < len(signal):
+            if ring.wait(1, timeout=1):
+                data = ring.read()
+                out.append(data)
+                received += len(data)
+        producer.join()
+
+        np.testing.assert_array_equal(np.concatenate(out), signal)
+
+
+if __name__ == '__main__':
+    unittest.main()
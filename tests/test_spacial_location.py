@@ -37,6 +37,26 @@ class TestSpatialSegmentation(unittest.TestCase):
         _ = worker.segment_video(model)
         # self.log(d)
 
+    def test_consecutive_frames(self):
+        """Runs of consecutive frames per cell, skipping the frames outside
+        of the grid and the ones without position."""
+        data_x = [1, 1, 4, 4, 1, 9, np.nan, 1, 4, 4]
+        data_y = [1, 1, 1, 4, 1, 1, np.nan, 1, 4, 4]
+
+        model = DisplayResultsModel()
+        worker = DspThread()
+        model.data_x = data_x
+        model.data_y = data_y
+        model.grid = Grid([6, 6], 2, 2, 0)
+        model.fps = 1
+
+        d = worker.segment_video(model)
+
+        self.assertEqual(d, {(0, 0): [[0, 1], [4, 4], [7, 7]],
+                             (0, 1): [[2, 2]],
+                             (1, 0): [],
+                             (1, 1): [[3, 3], [8, 9]]})
+
 
 if __name__ == '__main__':
     unittest.main()
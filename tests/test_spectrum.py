@@ -0,0 +1,101 @@
+import tempfile
+import numpy as np
+import unittest
+
+from scipy import signal
+
+from app.package.services import dsp, PyOctaveBand
+
+
+class TestSpectrum(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = 48000
+        self.limits = [20, 20000]
+        self.audio = np.random.default_rng(0).random(5 * 2**16) * 2 - 1
+
+    def test_batch_equals_window_by_window(self):
+        win_size = 2**16
+        window = signal.windows.hann(win_size)
+        bank = PyOctaveBand.get_filterbank(self.fs, 3, 6, self.limits)
+
+        spls = []
+        i = 0
+        while i + win_size < len(self.audio):
+            spls.append(bank.spl(self.audio[i:i+win_size] * window))
+            i += win_size // 2
+
+        spl, freq = dsp.get_spectrum(self.audio, self.fs, self.limits)
+
+        self.assertEqual(freq, bank.freq)
+        self.assertEqual(len(spls), dsp._get_num_of_windows(
+            len(self.audio), win_size, 0.5))
+        np.testing.assert_array_equal(spl, np.mean(spls, 0))
+
+    def test_frame_energy(self):
+        """Frames summed into groups vs. accumulating the groups directly.
+        """
+        frame = 1600
+        frames = np.arange(len(self.audio)) // frame
+        num_of_frames = frames[-1] + 1
+        groups = np.arange(num_of_frames) % 3 - 1
+
+        by_frame = dsp.BandEnergy(self.fs, self.limits, num_of_frames)
+        by_group = dsp.BandEnergy(self.fs, self.limits, 2)
+        for start in range(0, len(self.audio), 10000):
+            block = self.audio[start:start+10000]
+            by_frame.add(block, frames[start:start+10000])
+            by_group.add(block, groups[frames[start:start+10000]])
+
+        energy = dsp.FrameEnergy.from_band_energy(by_frame)
+        self.assertEqual(energy.power.shape, (num_of_frames, len(energy.freq)))
+        self.assertEqual(energy.power.dtype, np.float32)
+
+        regrouped = energy.regroup(groups, 2)
+        np.testing.assert_allclose(regrouped.spl(), by_group.spl(), atol=0.05)
+        np.testing.assert_allclose(regrouped.full_band(),
+                                   by_group.full_band())
+
+        # Time-limited view
+        first = energy[:10].regroup(np.zeros(10, dtype=int), 1)
+        self.assertEqual(first.count[0], 10 * frame)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            energy.save(tmp, 'frames')
+            loaded = dsp.FrameEnergy.load(tmp, 'frames')
+            self.assertIsInstance(loaded.power, np.memmap)
+            np.testing.assert_array_equal(loaded.power, energy.power)
+            np.testing.assert_array_equal(loaded.regroup(groups, 2).spl(),
+                                          regrouped.spl())
+            self.assertEqual(loaded.freq, energy.freq)
+            del loaded
+
+    def test_settle(self):
+        """Frames after a change of group left out of the band power."""
+        power = np.array([[1, 10], [2, 20], [3, 30],
+                          [4, 40], [5, 50], [6, 60]], dtype=np.float32)
+        ones = np.ones(6)
+        energy = dsp.FrameEnergy([100, 1000], power, ones, ones, ones)
+        groups = np.array([0, 0, 0, 1, 1, -1])
+
+        regrouped = energy.regroup(groups, 2, settle=[0, 1])
+        np.testing.assert_allclose(regrouped.power, [[2, 25], [4.5, 50]])
+        np.testing.assert_array_equal(regrouped.count, [3, 2])
+
+        # Every frame of group 1 in the settling time => all of them
+        regrouped = energy.regroup(groups, 2, settle=[0, 2])
+        np.testing.assert_allclose(regrouped.power, [[2, 30], [4.5, 45]])
+
+    def test_settling_time(self):
+        settle = dsp.settling_time(48000, [20, 20000])
+
+        self.assertEqual(len(settle), len(dsp.BandEnergy(
+            48000, [20, 20000], 1).freq))
+        # The lower the band, the longer it rings
+        self.assertGreater(settle[0], 0.2)
+        self.assertLess(settle[-1], 0.01)
+        self.assertGreater(settle[:10].min(), settle[-10:].max())
+
+
+if __name__ == '__main__':
+    unittest.main()
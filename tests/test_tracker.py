@@ -0,0 +1,91 @@
+import unittest
+import cv2
+import numpy as np
+
+from app.package.services.mask import (MarkerTracker, TRACKING_COLOR,
+                                       get_blobs)
+
+size = (1080, 1920)
+
+
+def make_frame(x=None, y=None, r=40):
+    frame = np.full((*size, 3), 90, dtype=np.uint8)
+    if x is not None:
+        cv2.circle(frame, (x, y), r, TRACKING_COLOR, -1)
+    return frame
+
+
+class TestMarkerTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = MarkerTracker(1, 25, dp=3, minDist=350)
+
+    def assertFound(self, circles, x, y, tol=15):
+        self.assertIsNotNone(circles)
+        cx, cy, _ = circles[0, 0]
+        self.assertLess(np.hypot(cx - x, cy - y), tol)
+
+    def test_track(self):
+        for i in range(30):
+            x, y = 300 + 40*i, 540 + int(200*np.sin(i/5))
+            circles = self.tracker.locate(make_frame(x, y))
+            self.assertFound(circles, x, y)
+
+            # Tracked: the marker stays in the region of interest
+            if i > 0:
+                x0, y0, x1, y1 = self.tracker.get_roi(size)
+                self.assertTrue(x0 <= x < x1 and y0 <= y < y1)
+
+    def test_lost(self):
+        self.assertFound(self.tracker.locate(make_frame(400, 300)), 400, 300)
+
+        # Out of the region of interest => full frame search
+        self.assertFound(self.tracker.locate(
+            make_frame(1500, 800)), 1500, 800)
+
+        self.assertIsNone(self.tracker.locate(make_frame()))
+        self.assertIsNone(self.tracker.position)
+
+        self.assertFound(self.tracker.locate(make_frame(900, 500)), 900, 500)
+
+
+class TestBlobTracker(TestMarkerTracker):
+
+    def setUp(self):
+        self.tracker = MarkerTracker(1, 25, detector='blobs')
+
+    def test_confidence(self):
+        self.tracker.locate(make_frame(900, 500))
+        self.assertGreater(self.tracker.confidence[0], 0.9)
+
+        self.tracker.locate(make_frame())
+        self.assertIsNone(self.tracker.confidence)
+
+
+class TestBlobs(unittest.TestCase):
+
+    def test_blobs(self):
+        mask = np.zeros((300, 400), dtype=np.uint8)
+        # Disc centered at (100.25, 80.5), with 2 bits of sub-pixel shift
+        cv2.circle(mask, (401, 322), 30*4, 255, -1, shift=2)
+        cv2.line(mask, (250, 200), (390, 280), 255, 5)
+        mask[10:12, 10:12] = 255
+
+        circles, confidence = get_blobs(mask, minArea=10)
+
+        self.assertEqual(circles.shape, (1, 2, 3))
+        np.testing.assert_allclose(circles[0, 0, :2], [100.25, 80.5],
+                                   atol=0.1)
+        self.assertAlmostEqual(circles[0, 0, 2], 30, delta=1)
+        self.assertGreater(confidence[0], 0.95)
+        self.assertLess(confidence[1], 0.2)
+
+        self.assertEqual(get_blobs(np.zeros_like(mask)), (None, None))
+
+    def test_unknown_detector(self):
+        with self.assertRaises(ValueError):
+            MarkerTracker(detector='circles')
+
+
+if __name__ == '__main__':
+    unittest.main()
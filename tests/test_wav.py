@@ -0,0 +1,84 @@
+import os
+import pickle
+import tempfile
+import numpy as np
+import unittest
+
+from scipy.io import wavfile
+
+from app.package.services.wav import WavAudio
+
+
+def write_24_bits(path, fs, data):
+    """scipy can not write 24-bit PCM"""
+    frames, channels = data.shape
+    raw = data.astype('<i4').view(np.uint8).reshape(frames, channels, 4)
+    pcm = raw[..., :3].tobytes()
+
+    header = b'RIFF' + (36 + len(pcm)).to_bytes(4, 'little') + b'WAVE'
+    header += b'fmt ' + (16).to_bytes(4, 'little')
+    header += (1).to_bytes(2, 'little') + channels.to_bytes(2, 'little')
+    header += fs.to_bytes(4, 'little')
+    header += (fs * channels * 3).to_bytes(4, 'little')
+    header += (channels * 3).to_bytes(2, 'little') + (24).to_bytes(2, 'little')
+    header += b'data' + len(pcm).to_bytes(4, 'little')
+
+    with open(path, 'wb') as f:
+        f.write(header + pcm)
+
+
+class TestWav(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fs = 48000
+        self.signal = np.random.default_rng(0).uniform(-0.9, 0.9, (1000, 2))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, bits):
+        path = os.path.join(self.tmp.name, name)
+        if bits == 'float':
+            data = self.signal.astype(np.float32)
+            wavfile.write(path, self.fs, data)
+            return path, data
+
+        full_scale = 2**(bits - 1)
+        data = np.round(self.signal * full_scale).astype(np.int32)
+        if bits == 16:
+            wavfile.write(path, self.fs, data.astype(np.int16))
+        elif bits == 32:
+            wavfile.write(path, self.fs, data)
+        else:
+            write_24_bits(path, self.fs, data)
+        return path, (data / full_scale).astype(np.float32)
+
+    def test_formats(self):
+        for bits in [16, 24, 32, 'float']:
+            path, expected = self.write(f'{bits}.wav', bits)
+            audio = WavAudio(path)
+
+            self.assertEqual(audio.fs, self.fs)
+            self.assertEqual(audio.shape, (1000, 2))
+            np.testing.assert_allclose(np.asarray(audio), expected,
+                                       rtol=1e-6, err_msg=f'{bits} bits')
+
+    def test_views(self):
+        path, expected = self.write('16.wav', 16)
+        audio = WavAudio(path)
+
+        mono = audio[100:-100].to_mono(0.5).scaled(2)
+        self.assertEqual(mono.shape, (800,))
+        np.testing.assert_allclose(mono[10:20],
+                                   expected[110:120].sum(axis=1), rtol=1e-6)
+
+        restored = pickle.loads(pickle.dumps(mono))
+        np.testing.assert_array_equal(restored, mono)
+
+        with self.assertRaises(TypeError):
+            audio[::2]
+
+
+if __name__ == '__main__':
+    unittest.main()